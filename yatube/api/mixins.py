@@ -1,12 +1,294 @@
-from rest_framework.exceptions import PermissionDenied
+from django.conf import settings as s
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import (
+    APIException, PermissionDenied, ValidationError
+)
 from rest_framework.mixins import (
     DestroyModelMixin, CreateModelMixin,
     ListModelMixin, RetrieveModelMixin, UpdateModelMixin
 )
+from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from posts import sync
+from posts.cache import conditional_response
+from posts.importer import bulk_insert
+from posts.models import Tombstone
+from posts.signals import bulk_created, bulk_updated
+from .fast import RowSerializer, UnsupportedField
+
+UPDATE_FORBIDDEN = 'Изменение чужого контента запрещено!'
+DELETE_FORBIDDEN = 'Удаление чужого контента запрещено!'
+NOT_FOUND = 'Объект не найден.'
+
+
+class SyncTokenExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Токен устарел, нужна полная синхронизация.'
+    default_code = 'sync_token_expired'
+
+
+class SparseFieldsMixin:
+    """``?fields=id,text``: отдаёт только эти поля и читает только их
+    колонки через ``only()``."""
+
+    def get_requested_fields(self):
+        if hasattr(self, '_requested_fields'):
+            return self._requested_fields
+        declared = list(self.get_serializer_class()().fields)
+        raw = self.request.query_params.get('fields')
+        fields = declared
+        if raw:
+            fields = [name.strip() for name in raw.split(',') if name.strip()]
+            unknown = sorted(set(fields) - set(declared))
+            if unknown:
+                raise ValidationError(
+                    {'fields': [f'Неизвестные поля: {", ".join(unknown)}']}
+                )
+        self._requested_fields = fields
+        return fields
+
+    def get_extra_columns(self):
+        """Колонки помимо полей сериализатора: ключи сортировки."""
+        ordering = getattr(self.paginator, 'ordering', ())
+        return [field.lstrip('-') for field in ordering]
+
+    def get_serializer(self, *args, **kwargs):
+        if self.request.method == 'GET':
+            kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method != 'GET':
+            return queryset
+        columns = {'pk'}
+        columns.update(self.get_serializer_class().columns(
+            self.get_requested_fields()
+        ))
+        columns.update(self.get_extra_columns())
+        related = {
+            column.rsplit('__', 1)[0] for column in columns if '__' in column
+        }
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+
+class SyncMixin:
+    """``<список>/sync/?since=<токен>``: только изменённое и удалённое.
+
+    Ответ содержит изменённые объекты, id удалённых и токен для
+    следующего запроса; пока ``has_more`` истинно, клиент повторяет
+    запрос с новым токеном сразу. Вид надгробий задаёт ``sync_kind``.
+    """
+
+    sync_field = 'updated'
+    sync_kind = None
+
+    def get_sync_tombstones(self):
+        return Tombstone.objects.filter(kind=self.sync_kind)
+
+    def get_extra_columns(self):
+        columns = super().get_extra_columns()
+        if self.action == 'sync':
+            columns.append(self.sync_field)
+        return columns
+
+    @action(detail=False)
+    def sync(self, request, *args, **kwargs):
+        try:
+            result = sync.changes(
+                self.get_queryset(),
+                self.get_sync_tombstones(),
+                request.query_params.get('since'),
+                self.paginator.get_page_size(request),
+                self.sync_field,
+            )
+        except sync.TokenExpired:
+            raise SyncTokenExpired()
+        except sync.SyncError as error:
+            raise ValidationError({'since': [str(error)]})
+        return Response({
+            'changed': self.get_serializer(result.changed, many=True).data,
+            'deleted': result.deleted,
+            'next': result.token,
+            'has_more': result.has_more,
+        })
+
+
+class ConditionalMixin:
+    """ETag, Last-Modified и 304 для list и retrieve по версиям кеша."""
+
+    def get_cache_scopes(self):
+        return None
+
+    def conditional(self, handler, request, *args, **kwargs):
+        scopes = self.get_cache_scopes()
+        if not scopes:
+            return handler(request, *args, **kwargs)
+        return conditional_response(
+            request, scopes, lambda: handler(request, *args, **kwargs),
+            vary=('Authorization', 'Cookie'),
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+
+class FastListMixin:
+    """Список через ``values()`` и RowSerializer, если поля это позволяют."""
+
+    def list(self, request, *args, **kwargs):
+        if not s.API_FAST_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+        try:
+            serializer = RowSerializer(self.get_serializer())
+        except UnsupportedField:
+            return super().list(request, *args, **kwargs)
+        ordering = getattr(self.paginator, 'ordering', ())
+        columns = dict.fromkeys([
+            *serializer.columns, *(field.lstrip('-') for field in ordering)
+        ])
+        rows = self.filter_queryset(self.get_queryset()).values(*columns)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(serializer.many(rows.iterator()))
+        return self.get_paginated_response(serializer.many(page))
+
+
+class BatchMixin:
+    """Пакетные create/update/delete по адресу ``<список>/batch/``.
+
+    Весь пакет проверяется целиком и пишется одной транзакцией через
+    bulk-операции; ошибки возвращаются списком, выровненным по входным
+    объектам.
+    """
+
+    def get_save_kwargs(self):
+        return {'author': self.request.user}
+
+    def before_batch_update(self, instances):
+        pass
+
+    def get_batch(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError('Ожидается непустой список.')
+        if len(items) > s.API_BATCH_MAX_SIZE:
+            raise ValidationError(
+                f'Не больше {s.API_BATCH_MAX_SIZE} объектов за запрос.'
+            )
+        return items
+
+    def get_batch_instances(self, items, message):
+        """Находит объекты пакета и проверяет, что они принадлежат автору."""
+        ids = [item.get('id') if isinstance(item, dict) else item
+               for item in items]
+        if not all(isinstance(pk, int) for pk in ids):
+            raise ValidationError('У каждого объекта должен быть целый id.')
+        if len(set(ids)) != len(ids):
+            raise ValidationError('id в пакете не должны повторяться.')
+        found = self.get_queryset().in_bulk(ids)
+        errors, code = [], None
+        for pk in ids:
+            instance = found.get(pk)
+            if instance is None:
+                errors.append({'id': [NOT_FOUND]})
+                code = code or status.HTTP_404_NOT_FOUND
+            elif instance.author_id != self.request.user.id:
+                errors.append({'detail': message})
+                code = status.HTTP_403_FORBIDDEN
+            else:
+                errors.append({})
+        return [found.get(pk) for pk in ids], errors, code
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def batch(self, request, *args, **kwargs):
+        items = self.get_batch(request)
+        if request.method == 'POST':
+            return self.batch_create(items)
+        if request.method == 'PATCH':
+            return self.batch_update(items)
+        return self.batch_destroy(items)
+
+    def batch_create(self, items):
+        serializer = self.get_serializer(data=items, many=True)
+        serializer.is_valid(raise_exception=True)
+        model = serializer.child.Meta.model
+        extra = self.get_save_kwargs()
+        objs = [model(**data, **extra) for data in serializer.validated_data]
+        with transaction.atomic():
+            bulk_insert(model, objs)
+            bulk_created.send(sender=model, objects=objs)
+        return Response(
+            self.get_serializer(objs, many=True).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    def batch_update(self, items):
+        instances, errors, code = self.get_batch_instances(
+            items, UPDATE_FORBIDDEN
+        )
+        serializers = []
+        for index, (instance, item) in enumerate(zip(instances, items)):
+            if errors[index]:
+                continue
+            serializer = self.get_serializer(instance, data=item, partial=True)
+            if serializer.is_valid():
+                serializers.append(serializer)
+            else:
+                errors[index] = serializer.errors
+                code = code or status.HTTP_400_BAD_REQUEST
+        if code is not None:
+            return Response(errors, status=code)
+        self.before_batch_update(instances)
+        fields = set()
+        for serializer in serializers:
+            for attr, value in serializer.validated_data.items():
+                setattr(serializer.instance, attr, value)
+                fields.add(attr)
+        model = type(instances[0])
+        if fields:
+            # bulk_update не вызывает pre_save, поэтому auto_now ставим сами.
+            now = timezone.now()
+            for field in model._meta.concrete_fields:
+                if getattr(field, 'auto_now', False):
+                    for instance in instances:
+                        setattr(instance, field.attname, now)
+                    fields.add(field.name)
+        with transaction.atomic():
+            if fields:
+                model.objects.bulk_update(instances, fields)
+            bulk_updated.send(sender=model, objects=instances, fields=fields)
+        return Response(self.get_serializer(instances, many=True).data)
+
+    def batch_destroy(self, items):
+        instances, errors, code = self.get_batch_instances(
+            items, DELETE_FORBIDDEN
+        )
+        if code is not None:
+            return Response(errors, status=code)
+        with transaction.atomic():
+            self.get_queryset().filter(
+                pk__in=[instance.pk for instance in instances]
+            ).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
 class CustomModelMixin(
+    ConditionalMixin,
+    FastListMixin,
+    SyncMixin,
+    SparseFieldsMixin,
+    BatchMixin,
     DestroyModelMixin,
     CreateModelMixin,
     ListModelMixin,
@@ -14,12 +296,15 @@ class CustomModelMixin(
     UpdateModelMixin,
     GenericViewSet,
 ):
+    def perform_create(self, serializer):
+        serializer.save(**self.get_save_kwargs())
+
     def perform_update(self, serializer):
         if serializer.instance.author != self.request.user:
-            raise PermissionDenied('Изменение чужого контента запрещено!')
+            raise PermissionDenied(UPDATE_FORBIDDEN)
         super().perform_update(serializer)
 
     def perform_destroy(self, instance):
         if instance.author != self.request.user:
-            raise PermissionDenied('Удаление чужого контента запрещено!')
+            raise PermissionDenied(DELETE_FORBIDDEN)
         super().perform_destroy(instance)
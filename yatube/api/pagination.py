@@ -0,0 +1,23 @@
+from django.conf import settings as s
+from rest_framework.pagination import CursorPagination
+
+
+class ApiCursorPagination(CursorPagination):
+    """Курсорная пагинация: страница по индексу, без COUNT и OFFSET."""
+
+    ordering = ('-id',)
+    page_size = s.API_PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = s.API_MAX_PAGE_SIZE
+
+
+class PostCursorPagination(ApiCursorPagination):
+    ordering = ('-pub_date', '-id')
+
+
+class CommentCursorPagination(ApiCursorPagination):
+    ordering = ('-created', '-id')
+
+
+class GroupCursorPagination(ApiCursorPagination):
+    ordering = ('id',)
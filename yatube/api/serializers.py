@@ -3,7 +3,34 @@ from rest_framework import serializers
 from posts.models import Comment, Group, Post
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Оставляет в сериализаторе только поля из аргумента ``fields``."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @staticmethod
+    def column(field):
+        """Колонка модели, из которой читается поле, или None."""
+        if field.source == '*':
+            return None
+        column = field.source.replace('.', '__')
+        if isinstance(field, serializers.SlugRelatedField):
+            column = f'{column}__{field.slug_field}'
+        return column
+
+    @classmethod
+    def columns(cls, fields):
+        """Колонки модели, которые нужны для вывода полей ``fields``."""
+        declared = cls().fields
+        columns = (cls.column(declared[name]) for name in fields)
+        return [column for column in columns if column is not None]
+
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         slug_field='username',
         many=False,
@@ -16,7 +43,7 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'created', 'author', 'post')
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         slug_field='username',
         many=False,
@@ -29,7 +56,15 @@ class PostSerializer(serializers.ModelSerializer):
         read_only_fields = ('author', 'pub_date', 'id')
 
 
-class GroupSerializer(serializers.ModelSerializer):
+class PostSearchSerializer(PostSerializer):
+    rank = serializers.FloatField(read_only=True)
+    headline = serializers.CharField(read_only=True)
+
+    class Meta(PostSerializer.Meta):
+        fields = PostSerializer.Meta.fields + ('rank', 'headline')
+
+
+class GroupSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Group
         fields = ('id', 'title', 'slug', 'description')
@@ -0,0 +1,428 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from posts.models import Comment, FeedEntry, Follow, Group, Post, Tombstone
+
+User = get_user_model()
+
+
+class BatchEndpointsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer')
+        self.stranger = User.objects.create_user(username='stranger')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = '/api/v1/posts/batch/'
+
+    def test_batch_create(self):
+        response = self.client.post(self.url, [
+            {'text': 'Первый'},
+            {'text': 'Второй', 'group': self.group.id},
+        ], format='json')
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(
+            [item['text'] for item in response.data], ['Первый', 'Второй']
+        )
+        self.assertTrue(all(item['id'] for item in response.data))
+        self.assertEqual(response.data[1]['author'], 'writer')
+        self.assertEqual(Post.objects.filter(author=self.user).count(), 2)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.stats.posts_count, 2)
+        self.assertEqual(FeedEntry.objects.filter(user=self.reader).count(), 2)
+
+    def test_batch_create_is_all_or_nothing(self):
+        response = self.client.post(
+            self.url, [{'text': 'Пост'}, {'group': self.group.id}],
+            format='json',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('text', response.data[1])
+        self.assertFalse(Post.objects.exists())
+
+    def test_batch_update(self):
+        first = Post.objects.create(author=self.user, text='Один')
+        second = Post.objects.create(author=self.user, text='Два')
+        response = self.client.patch(self.url, [
+            {'id': first.id, 'text': 'Один!'},
+            {'id': second.id, 'group': self.group.id},
+        ], format='json')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.text, 'Один!')
+        self.assertEqual(second.group, self.group)
+
+    def test_batch_update_checks_ownership(self):
+        own = Post.objects.create(author=self.user, text='Свой')
+        alien = Post.objects.create(author=self.stranger, text='Чужой')
+        response = self.client.patch(self.url, [
+            {'id': own.id, 'text': 'Изменён'},
+            {'id': alien.id, 'text': 'Изменён'},
+        ], format='json')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        self.assertEqual(response.data[0], {})
+        self.assertEqual(
+            response.data[1]['detail'], 'Изменение чужого контента запрещено!'
+        )
+        own.refresh_from_db()
+        self.assertEqual(own.text, 'Свой')
+
+    def test_batch_delete(self):
+        posts = [
+            Post.objects.create(author=self.user, text=f'Пост {index}')
+            for index in range(3)
+        ]
+        alien = Post.objects.create(author=self.stranger, text='Чужой')
+        response = self.client.delete(
+            self.url, [posts[0].id, alien.id], format='json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        response = self.client.delete(
+            self.url, [posts[0].id, 10 ** 6], format='json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.delete(
+            self.url, [post.id for post in posts[:2]], format='json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        self.assertEqual(
+            list(Post.objects.filter(author=self.user)), [posts[2]]
+        )
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.stats.posts_count, 1)
+
+    def test_batch_comments(self):
+        post = Post.objects.create(author=self.stranger, text='Пост')
+        url = f'/api/v1/posts/{post.id}/comments/batch/'
+        response = self.client.post(
+            url, [{'text': 'Раз'}, {'text': 'Два'}], format='json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        self.assertEqual(
+            set(Comment.objects.values_list('author__username', flat=True)),
+            {'writer'},
+        )
+
+    def test_batch_validation(self):
+        for payload in ({'text': 'Не список'}, [], [{'text': 'x'}] * 501):
+            with self.subTest(size=len(payload)):
+                response = self.client.post(self.url, payload, format='json')
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST
+                )
+        response = self.client.patch(
+            self.url, [{'id': 1}, {'id': 1}], format='json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class PaginationAndFieldsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer')
+        self.posts = [
+            Post.objects.create(author=self.user, text=f'Пост {index}')
+            for index in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cursor_pagination_walks_all_posts(self):
+        url, seen = '/api/v1/posts/?limit=2', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [post.id for post in reversed(self.posts)])
+
+    def test_limit_is_capped(self):
+        response = self.client.get('/api/v1/posts/', {'limit': 1000})
+        self.assertEqual(len(response.data['results']), 5)
+        response = self.client.get('/api/v1/posts/', {'limit': 3})
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_sparse_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '/api/v1/posts/', {'fields': 'id,text'}
+            )
+        self.assertEqual(
+            response.data['results'][0],
+            {'id': self.posts[-1].id, 'text': 'Пост 4'},
+        )
+        sql = queries.captured_queries[-1]['sql']
+        self.assertNotIn('image_variants', sql)
+        self.assertNotIn('auth_user', sql)
+
+    def test_sparse_fields_on_detail_and_comments(self):
+        post = self.posts[0]
+        Comment.objects.create(post=post, author=self.user, text='Коммент')
+        response = self.client.get(
+            f'/api/v1/posts/{post.id}/', {'fields': 'author'}
+        )
+        self.assertEqual(response.data, {'author': 'writer'})
+        response = self.client.get(
+            f'/api/v1/posts/{post.id}/comments/', {'fields': 'text,author'}
+        )
+        self.assertEqual(
+            response.data['results'], [{'text': 'Коммент', 'author': 'writer'}]
+        )
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/v1/groups/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class FastSerializationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='writer', first_name='Имя'
+        )
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.user, group=group, image='posts/photo.jpg',
+            text='Юникод, "кавычки" и\u2028разделитель строк',
+        )
+        Post.objects.create(author=self.user, text='Без группы')
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_output_matches_model_serializers(self):
+        urls = [
+            '/api/v1/posts/',
+            '/api/v1/posts/?fields=id,image,pub_date',
+            f'/api/v1/posts/{self.post.id}/comments/',
+            '/api/v1/groups/',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with override_settings(API_FAST_SERIALIZATION=False):
+                    expected = self.client.get(url)
+                actual = self.client.get(url)
+                self.assertEqual(actual.status_code, HTTPStatus.OK)
+                self.assertEqual(actual.content, expected.content)
+
+    def test_list_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.client.get('/api/v1/posts/')
+
+
+class ConditionalApiTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        cache.clear()
+
+    def assertNotModified(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        with self.assertNumQueries(0):
+            repeated = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(repeated.status_code, HTTPStatus.NOT_MODIFIED)
+        return response['ETag']
+
+    def test_not_modified(self):
+        for url in (
+            '/api/v1/posts/',
+            f'/api/v1/posts/{self.post.id}/',
+            f'/api/v1/posts/{self.post.id}/comments/',
+            '/api/v1/groups/',
+        ):
+            with self.subTest(url=url):
+                self.assertNotModified(url)
+
+    def test_new_comment_changes_validator(self):
+        url = f'/api/v1/posts/{self.post.id}/comments/'
+        etag = self.assertNotModified(url)
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_token_client_without_cookies_gets_not_modified(self):
+        token = Token.objects.create(user=self.user)
+        headers = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+        url = '/api/v1/posts/'
+        response = APIClient().get(url, **headers)
+        self.assertNotIn('csrftoken', response.cookies)
+        repeated = APIClient().get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'], **headers
+        )
+        self.assertEqual(repeated.status_code, HTTPStatus.NOT_MODIFIED)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncApiTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer')
+        self.posts = [
+            Post.objects.create(author=self.user, text=f'Пост {index}')
+            for index in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = '/api/v1/posts/sync/'
+
+    def sync(self, url, token=None, **params):
+        if token:
+            params['since'] = token
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.data
+
+    def test_initial_sync_returns_everything(self):
+        data = self.sync(self.url)
+        self.assertEqual(
+            [item['id'] for item in data['changed']],
+            [post.id for post in self.posts],
+        )
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['has_more'])
+        self.assertTrue(data['next'])
+
+    def test_delta_contains_only_changes(self):
+        token = self.sync(self.url)['next']
+        first, second, _ = self.posts
+        deleted_id = second.id
+        first.text = 'Изменён'
+        first.save()
+        second.delete()
+        created = Post.objects.create(author=self.user, text='Новый')
+        data = self.sync(self.url, token)
+        self.assertEqual(
+            [item['id'] for item in data['changed']], [first.id, created.id]
+        )
+        self.assertEqual(data['changed'][0]['text'], 'Изменён')
+        self.assertEqual(data['deleted'], [deleted_id])
+        empty = self.sync(self.url, data['next'])
+        self.assertEqual((empty['changed'], empty['deleted']), ([], []))
+
+    def test_poll_cost_does_not_depend_on_table_size(self):
+        token = self.sync(self.url)['next']
+        Post.objects.bulk_create(
+            Post(author=self.user, text='Старый') for _ in range(50)
+        )
+        token = self.sync(self.url, token, limit=100)['next']
+        with self.assertNumQueries(2):
+            data = self.sync(self.url, token)
+        self.assertEqual(data['changed'], [])
+
+    def test_has_more_pages_through_changes(self):
+        token, seen = None, []
+        while True:
+            data = self.sync(self.url, token, limit=1)
+            seen.extend(item['id'] for item in data['changed'])
+            token = data['next']
+            if not data['has_more']:
+                break
+        self.assertEqual(seen, [post.id for post in self.posts])
+
+    def test_batch_update_appears_in_delta(self):
+        token = self.sync(self.url)['next']
+        post = self.posts[0]
+        response = self.client.patch('/api/v1/posts/batch/', [
+            {'id': post.id, 'text': 'Пакетом'},
+        ], format='json')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        data = self.sync(self.url, token)
+        self.assertEqual([item['id'] for item in data['changed']], [post.id])
+
+    def test_group_deletion_appears_in_delta(self):
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        post = self.posts[0]
+        post.group = group
+        post.save()
+        token = self.sync(self.url)['next']
+        group.delete()
+        data = self.sync(self.url, token)
+        self.assertEqual([item['id'] for item in data['changed']], [post.id])
+        self.assertIsNone(data['changed'][0]['group'])
+
+    def test_renamed_author_appears_in_delta(self):
+        post = self.posts[0]
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий'
+        )
+        token = self.sync(self.url)['next']
+        comments_url = f'/api/v1/posts/{post.id}/comments/sync/'
+        comments_token = self.sync(comments_url)['next']
+        self.user.username = 'renamed'
+        self.user.save()
+        data = self.sync(self.url, token)
+        self.assertEqual(
+            [item['author'] for item in data['changed']], ['renamed'] * 3
+        )
+        data = self.sync(comments_url, comments_token)
+        self.assertEqual(
+            [item['id'] for item in data['changed']], [comment.id]
+        )
+
+    def test_comment_sync(self):
+        post = self.posts[0]
+        url = f'/api/v1/posts/{post.id}/comments/sync/'
+        comments = [
+            Comment.objects.create(post=post, author=self.user, text=text)
+            for text in ('Раз', 'Два')
+        ]
+        Comment.objects.create(
+            post=self.posts[1], author=self.user, text='Чужой пост'
+        )
+        token = self.sync(url)['next']
+        comment_id = comments[0].id
+        comments[0].delete()
+        comments[1].text = 'Два!'
+        comments[1].save()
+        data = self.sync(url, token)
+        self.assertEqual(
+            [item['text'] for item in data['changed']], ['Два!']
+        )
+        self.assertEqual(data['deleted'], [comment_id])
+
+    def test_cascade_delete_leaves_tombstones(self):
+        post = self.posts[0]
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий'
+        )
+        post_id = post.id
+        post.delete()
+        self.assertEqual(
+            set(Tombstone.objects.values_list('kind', 'object_id')),
+            {(Tombstone.POST, post_id), (Tombstone.COMMENT, comment.id)},
+        )
+
+    def test_invalid_token(self):
+        response = self.client.get(self.url, {'since': 'мусор'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_expired_token(self):
+        token = self.sync(self.url)['next']
+        with self.settings(SYNC_TOMBSTONE_DAYS=0):
+            response = self.client.get(self.url, {'since': token})
+        self.assertEqual(response.status_code, HTTPStatus.GONE)
@@ -1,31 +1,115 @@
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from rest_framework import viewsets
+from rest_framework import permissions, viewsets
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from .serializers import PostSerializer, GroupSerializer, CommentSerializer
-from posts.models import Group, Post
-from .mixins import CustomModelMixin
+from .serializers import (
+    PostSerializer, PostSearchSerializer, GroupSerializer, CommentSerializer
+)
+from posts import export
+from posts.cache import post_scopes
+from posts.models import Group, Post, Tombstone
+from search.utils import normalize_query, search_page
+from .mixins import (
+    ConditionalMixin, CustomModelMixin, FastListMixin, SparseFieldsMixin
+)
+from .pagination import (
+    CommentCursorPagination, GroupCursorPagination, PostCursorPagination
+)
 
 
 class PostViewSet(CustomModelMixin):
-    queryset = Post.objects.all()
+    queryset = Post.objects.for_api()
     serializer_class = PostSerializer
+    pagination_class = PostCursorPagination
+    sync_kind = Tombstone.POST
 
-    def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+    def get_cache_scopes(self):
+        if self.action == 'retrieve':
+            return [f'post:{self.kwargs["pk"]}', 'users']
+        return ['posts']
 
+    def before_batch_update(self, instances):
+        previous = Post.objects.filter(
+            id__in=[post.id for post in instances]
+        ).values_list('id', 'author__username', 'group__slug')
+        scopes = {pk: post_scopes(pk, *names) for pk, *names in previous}
+        for post in instances:
+            post._previous_scopes = scopes[post.id]
 
-class GroupViewSet(viewsets.ReadOnlyModelViewSet):
+
+class GroupViewSet(ConditionalMixin, FastListMixin, SparseFieldsMixin,
+                   viewsets.ReadOnlyModelViewSet):
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
+    pagination_class = GroupCursorPagination
+
+    def get_cache_scopes(self):
+        return ['groups']
 
 
 class CommentViewSet(CustomModelMixin):
     serializer_class = CommentSerializer
+    pagination_class = CommentCursorPagination
+    sync_kind = Tombstone.COMMENT
+
+    def get_cache_scopes(self):
+        return [f'post:{self.kwargs["post_id"]}', 'users']
 
     def get_queryset(self):
         post = get_object_or_404(Post, id=self.kwargs.get('post_id'))
-        return post.comments.all()
+        return post.comments.select_related('author')
 
-    def perform_create(self, serializer):
+    def get_sync_tombstones(self):
+        return super().get_sync_tombstones().filter(
+            post_id=self.kwargs.get('post_id')
+        )
+
+    def get_save_kwargs(self):
         post = get_object_or_404(Post, id=self.kwargs.get('post_id'))
-        serializer.save(author=self.request.user, post=post)
+        return {'author': self.request.user, 'post': post}
+
+
+class SearchViewSet(viewsets.ViewSet):
+    def list(self, request):
+        query = normalize_query(request.query_params.get('q', ''))
+        page = search_page(query, request.query_params.get('page'))
+        serializer = PostSearchSerializer(
+            page.object_list, many=True, context={'request': request}
+        )
+        return Response({
+            'query': query,
+            'page': page.number,
+            'has_next': page.has_next(),
+            'results': serializer.data,
+        })
+
+
+class ExportView(APIView):
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request, kind):
+        if kind not in export.EXPORTS:
+            raise NotFound(f'Неизвестная выгрузка: {kind}')
+        params = request.query_params
+        fmt = params.get('type', 'ndjson')
+        compress = params.get('gzip') in ('1', 'true')
+        filters = {
+            name: params.get(name)
+            for name in ('since', 'until', 'group', 'author')
+            if params.get(name)
+        }
+        try:
+            blocks = export.stream(kind, fmt, compress, **filters)
+        except export.ExportError as error:
+            raise ValidationError({'detail': str(error)})
+        content_type = 'application/gzip' if compress else export.FORMATS[fmt]
+        response = StreamingHttpResponse(blocks, content_type=content_type)
+        response['Content-Disposition'] = (
+            'attachment; filename="{}"'.format(
+                export.filename(kind, fmt, compress)
+            )
+        )
+        return response
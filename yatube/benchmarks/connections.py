@@ -0,0 +1,144 @@
+"""Запросы в секунду без постоянных соединений, с ними и с пулом.
+
+Запуск из каталога с manage.py::
+
+    python -m benchmarks.connections --requests 1000 --concurrency 32 \\
+        --connect-latency 5
+
+Каждый режим гоняется в отдельном процессе, потому что соединения
+настраиваются при импорте настроек:
+
+* close — DB_CONN_MAX_AGE=0, соединение открывается на каждый запрос;
+* persistent — CONN_MAX_AGE по умолчанию, соединение живёт в потоке;
+* pool — DB_POOL=1, соединения общие для потоков процесса.
+
+Страницы те же, что в benchmarks.http, под WSGI и под ASGI; база —
+временный файл SQLite, так что закрытие соединения настоящее.
+``--connect-latency`` добавляет задержку к каждому новому соединению и
+имитирует установку соединения с сетевой БД (TCP, TLS,
+аутентификация), которую и экономят постоянные соединения и пул. Для
+пула выводится его статистика после прогона.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from .http import PATHS, configure, populate, run_asgi, run_wsgi
+from .utils import BASE_DIR, setup_django, test_database
+
+MODES = {
+    'close': {'DB_CONN_MAX_AGE': '0'},
+    'persistent': {},
+    'pool': {'DB_POOL': '1'},
+}
+
+
+def add_connect_latency(seconds):
+    """Задержка перед каждым новым соединением с SQLite."""
+    from django.db.backends.sqlite3.base import DatabaseWrapper
+
+    get_new_connection = DatabaseWrapper.get_new_connection
+
+    def delayed(self, conn_params):
+        time.sleep(seconds)
+        return get_new_connection(self, conn_params)
+
+    DatabaseWrapper.get_new_connection = delayed
+
+
+def measure(options):
+    """Прогон в дочернем процессе; результат — JSON в stdout."""
+    setup_django()
+    configure()
+    from django.db import connection
+
+    from core.connections import pool_stats
+
+    with tempfile.TemporaryDirectory() as directory:
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            directory, 'test.sqlite3'
+        )
+        with test_database():
+            paths, cookie = populate(options.posts)
+            connection.close()
+            add_connect_latency(options.connect_latency / 1000)
+            results = {}
+            for mode, run in (('wsgi', run_wsgi), ('asgi', run_asgi)):
+                _, elapsed = run(
+                    [paths[name] for name in options.pages], cookie,
+                    options.requests, options.concurrency,
+                )
+                results[mode] = options.requests / elapsed
+            results['pool'] = pool_stats()
+    print(json.dumps(results))
+
+
+def spawn(mode, options):
+    env = dict(
+        os.environ, DEBUG='0', METRICS_ENABLED='0',
+        DB_ENGINE='django.db.backends.sqlite3',
+        DB_NAME=os.path.join(tempfile.gettempdir(), 'yatube.sqlite3'),
+        **MODES[mode],
+    )
+    env.pop('DB_REPLICAS', None)
+    args = [
+        sys.executable, '-m', 'benchmarks.connections', '--child',
+        '--requests', str(options.requests),
+        '--concurrency', str(options.concurrency),
+        '--connect-latency', str(options.connect_latency),
+        '--posts', str(options.posts), '--pages', *options.pages,
+    ]
+    output = subprocess.run(
+        args, env=env, cwd=BASE_DIR, check=True, stdout=subprocess.PIPE,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument(
+        '--connect-latency', type=float, default=5,
+        help='Задержка установки соединения, мс',
+    )
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument(
+        '--pages', nargs='+', choices=PATHS, default=['index', 'follow'],
+    )
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.child:
+        measure(options)
+        return
+
+    print(
+        f'{", ".join(options.pages)}: {options.requests} запросов, '
+        f'{options.concurrency} одновременно, '
+        f'соединение {options.connect_latency} мс'
+    )
+    print(f'{"mode":<16}{"wsgi rps":>10}{"asgi rps":>10}')
+    baseline = None
+    for mode in options.modes:
+        results = spawn(mode, options)
+        print(f'{mode:<16}{results["wsgi"]:>10.0f}{results["asgi"]:>10.0f}')
+        if baseline is None:
+            baseline = results
+        else:
+            print(
+                f'{"":<16}{results["wsgi"] / baseline["wsgi"]:>9.2f}x'
+                f'{results["asgi"] / baseline["asgi"]:>9.2f}x'
+            )
+        for alias, stats in results['pool'].items():
+            print(f'{"":<16}пул {alias}: {stats}')
+
+
+if __name__ == '__main__':
+    main()
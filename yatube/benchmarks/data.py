@@ -0,0 +1,126 @@
+"""Синтетические данные для нагрузочных сценариев.
+
+Пользователи, группы, степенной граф подписок, посты (часть — с
+картинками, для которых заранее готовы миниатюры и варианты) и
+комментарии. Популярность авторов тоже степенная: немногим авторам
+принадлежит большая часть постов и просмотров профилей. При одинаковом
+``seed`` набор данных один и тот же.
+"""
+import random
+from collections import namedtuple
+from datetime import timedelta
+
+from .feed import build_graph, rebuild_feeds
+from .images import make_photo
+
+Dataset = namedtuple(
+    'Dataset', 'usernames weights groups post_ids readers deep_cursors'
+)
+
+
+def author_weights(users):
+    return [1 / (rank + 1) for rank in range(users)]
+
+
+def save_photos(count, rng):
+    """Кладёт ``count`` картинок в хранилище и готовит их для шаблонов."""
+    from io import BytesIO
+
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import default_storage
+
+    names = []
+    for number in range(count):
+        buffer = BytesIO()
+        make_photo(rng, (1200, 800)).save(buffer, 'JPEG', quality=85)
+        names.append(default_storage.save(
+            f'posts/bench_{number}.jpg', ContentFile(buffer.getvalue())
+        ))
+    return names
+
+
+def generate(users=1000, groups=20, posts=20000, comments=20000,
+             follows=30, images=5, image_share=0.2, readers=50,
+             seed=42):
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.utils import timezone
+
+    from posts import images as post_images
+    from posts.counters import reconcile
+    from posts.models import Comment, Follow, Group, Post
+    from posts.utils import encode_cursor
+
+    rng = random.Random(seed)
+    User = get_user_model()
+    password = make_password(None)
+    User.objects.bulk_create(
+        (User(username=f'user{number}', password=password)
+         for number in range(users)),
+        batch_size=1000,
+    )
+    ids = list(User.objects.order_by('id').values_list('id', flat=True))
+    usernames = [f'user{number}' for number in range(users)]
+    weights = author_weights(users)
+
+    Group.objects.bulk_create(
+        Group(title=f'Группа {number}', slug=f'group-{number}',
+              description='Синтетическая группа')
+        for number in range(groups)
+    )
+    group_ids = list(Group.objects.order_by('id').values_list('id', flat=True))
+
+    Follow.objects.bulk_create(
+        (Follow(user_id=ids[user], author_id=ids[author])
+         for user, author in build_graph('power-law', users, follows, rng)),
+        batch_size=1000,
+    )
+
+    photos = save_photos(images, rng) if images else []
+    now = timezone.now()
+    authors = rng.choices(ids, weights=weights, k=posts)
+    Post.objects.bulk_create(
+        (Post(
+            author_id=author_id,
+            group_id=rng.choice(group_ids) if rng.random() < 0.5 else None,
+            text=f'Пост номер {number}. ' * rng.randint(1, 20),
+            image=(rng.choice(photos)
+                   if photos and rng.random() < image_share else ''),
+            pub_date=now - timedelta(seconds=(posts - number) * 60),
+        ) for number, author_id in enumerate(authors)),
+        batch_size=1000,
+    )
+    post_ids = list(Post.objects.order_by('id').values_list('id', flat=True))
+    for name in photos:
+        post_images.process(name)
+
+    Comment.objects.bulk_create(
+        (Comment(
+            post_id=rng.choice(post_ids),
+            author_id=rng.choice(ids),
+            text=f'Комментарий {number}',
+        ) for number in range(comments)),
+        batch_size=1000,
+    )
+    reconcile()
+    rebuild_feeds(settings.FEED_CELEBRITY_THRESHOLD)
+
+    # Курсоры страниц 10, 20, ... главной: так листает пользователь,
+    # дошедший до глубины по ссылкам «дальше».
+    positions = Post.objects.order_by('-pub_date', '-id').values_list(
+        'pub_date', 'id'
+    )
+    per_page = settings.OBJECTS_PER_PAGE
+    deep_cursors = [
+        encode_cursor(position)
+        for position in positions[per_page * 10 - 1::per_page * 10]
+    ]
+    return Dataset(
+        usernames=usernames,
+        weights=weights,
+        groups=[f'group-{number}' for number in range(groups)],
+        post_ids=post_ids,
+        readers=rng.sample(usernames, min(readers, users)),
+        deep_cursors=deep_cursors,
+    )
@@ -0,0 +1,171 @@
+"""Сравнение push, pull и гибридной ленты подписок.
+
+Запуск из каталога с manage.py::
+
+    python -m benchmarks.feed --users 1000 --follows 30
+
+Для каждого синтетического графа подписок (равномерного, степенного и
+с несколькими «звёздами») лента пересобирается под каждую стратегию,
+после чего замеряются p50/p95/p99 чтения первой и глубокой страницы
+follow_index и стоимость публикации поста.
+"""
+import argparse
+import random
+from collections import defaultdict
+
+from .utils import (
+    print_table, setup_django, summary, test_database, timed,
+)
+
+
+def build_graph(shape, users, follows, rng):
+    authors = list(range(users))
+    if shape == 'uniform':
+        weights = None
+    elif shape == 'power-law':
+        weights = [1 / (rank + 1) for rank in authors]
+    else:
+        weights = [users if rank < 5 else 1 for rank in authors]
+    graph = set()
+    for user in authors:
+        for author in rng.choices(authors, weights=weights, k=follows):
+            if author != user:
+                graph.add((user, author))
+    return sorted(graph)
+
+
+def populate(shape, options, rng):
+    from django.contrib.auth import get_user_model
+
+    from posts.counters import reconcile
+    from posts.models import Follow, Post
+
+    User = get_user_model()
+    User.objects.all().delete()
+    users = User.objects.bulk_create(
+        User(username=f'{shape}-{number}') for number in range(options.users)
+    )
+    ids = list(User.objects.order_by('id').values_list('id', flat=True))
+    Follow.objects.bulk_create(
+        (Follow(user_id=ids[user], author_id=ids[author])
+         for user, author in build_graph(
+             shape, len(users), options.follows, rng)),
+        batch_size=1000,
+    )
+    Post.objects.bulk_create(
+        (Post(author_id=rng.choice(ids), text=f'post {number}')
+         for number in range(options.posts)),
+        batch_size=1000,
+    )
+    reconcile()
+    return ids
+
+
+def rebuild_feeds(threshold):
+    from django.db.models import Count
+
+    from posts.models import FeedEntry, Follow, Post, UserStats
+
+    FeedEntry.objects.all().delete()
+    celebrities = set(
+        Follow.objects.values('author').annotate(
+            total=Count('id')
+        ).filter(total__gte=threshold).values_list('author', flat=True)
+    )
+    UserStats.objects.update(celebrity=False)
+    UserStats.objects.filter(user_id__in=celebrities).update(celebrity=True)
+    posts = defaultdict(list)
+    for post_id, author_id, pub_date in Post.objects.values_list(
+            'id', 'author_id', 'pub_date'):
+        posts[author_id].append((post_id, pub_date))
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post_id=post_id, author_id=author_id,
+                   pub_date=pub_date)
+         for user_id, author_id in Follow.objects.values_list(
+             'user_id', 'author_id')
+         if author_id not in celebrities
+         for post_id, pub_date in posts[author_id]),
+        batch_size=1000,
+    )
+
+
+def measure_reads(readers, depth):
+    from django.contrib.auth import get_user_model
+    from django.test import RequestFactory
+
+    from posts.feed import feed_page
+
+    factory = RequestFactory()
+    first, deep = [], []
+    for user in get_user_model().objects.filter(id__in=readers):
+        cursor = None
+        for page in range(depth):
+            request = factory.get('/follow/', {'cursor': cursor or ''})
+            page_obj = None
+
+            def read():
+                nonlocal page_obj
+                page_obj = feed_page(request, user)
+
+            elapsed = timed(read)
+            (first if page == 0 else deep).append(elapsed)
+            cursor = page_obj.next_cursor
+            if cursor is None:
+                break
+    return first, deep
+
+
+def measure_writes(ids, count, rng):
+    from posts.models import Post
+
+    return [
+        timed(Post.objects.create, author_id=rng.choice(ids), text='new')
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--follows', type=int, default=30)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--readers', type=int, default=200)
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--writes', type=int, default=100)
+    parser.add_argument(
+        '--threshold', type=int, default=None,
+        help='порог «звезды» для гибридной стратегии, по умолчанию 5%% '
+             'от числа пользователей',
+    )
+    parser.add_argument('--seed', type=int, default=42)
+    options = parser.parse_args()
+
+    setup_django()
+    from django.test.utils import override_settings
+
+    hybrid = options.threshold or max(2, options.users // 20)
+    strategies = {
+        'push': options.users + 1,
+        'pull': 0,
+        f'hybrid({hybrid})': hybrid,
+    }
+    with test_database():
+        for shape in ('uniform', 'power-law', 'celebrity'):
+            rng = random.Random(options.seed)
+            ids = populate(shape, options, rng)
+            readers = rng.sample(ids, min(options.readers, len(ids)))
+            rows = []
+            for name, threshold in strategies.items():
+                with override_settings(FEED_CELEBRITY_THRESHOLD=threshold):
+                    rebuild_feeds(threshold)
+                    first, deep = measure_reads(readers, options.depth)
+                    writes = measure_writes(ids, options.writes, rng)
+                rows.append((f'{name} first page', summary(first)))
+                if deep:
+                    rows.append((f'{name} deep pages', summary(deep)))
+                rows.append((f'{name} publish', summary(writes)))
+            print_table(f'{shape} graph', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""Пропускная способность страниц под WSGI и под ASGI.
+
+Запуск из каталога с manage.py::
+
+    python -m benchmarks.http --requests 2000 --concurrency 32 --latency 2
+
+Без ``--url`` оба обработчика Django гоняются в этом процессе на
+временной базе: WSGIHandler — пулом из ``--concurrency`` потоков, как
+потоковый воркер gunicorn, ASGIHandler — столькими же корутинами в
+одном цикле событий, как uvicorn. ``--latency`` добавляет задержку к
+каждому SQL-запросу и имитирует сетевую БД: именно там async-view с
+параллельными запросами выигрывают. debug_toolbar и DEBUG отключаются,
+как в продакшене.
+
+С ``--url`` нагрузка идёт по HTTP на уже запущенные серверы, например
+``gunicorn yatube.wsgi --threads 32`` и ``uvicorn yatube.asgi:application``::
+
+    python -m benchmarks.http --url http://127.0.0.1:8000 \\
+        http://127.0.0.1:8001 --cookie sessionid=...
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+from urllib.parse import urlsplit
+
+from .utils import print_table, setup_django, summary, test_database
+
+PATHS = ('index', 'group', 'profile', 'post', 'follow')
+
+
+def configure():
+    from django.conf import settings
+
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['*']
+    settings.MIDDLEWARE = [
+        name for name in settings.MIDDLEWARE if 'debug_toolbar' not in name
+    ]
+
+
+def populate(posts):
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+
+    from posts.models import Follow, Group, Post
+
+    User = get_user_model()
+    authors = [
+        User.objects.create_user(f'author{index}') for index in range(20)
+    ]
+    reader = User.objects.create_user('reader')
+    group = Group.objects.create(title='g', slug='g', description='g')
+    Post.objects.bulk_create(
+        Post(
+            author=authors[index % len(authors)],
+            group=group if index % 2 else None,
+            text=f'Пост номер {index}',
+        )
+        for index in range(posts)
+    )
+    for author in authors[:10]:
+        Follow.objects.create(user=reader, author=author)
+    post = Post.objects.order_by('-id').first()
+    client = Client()
+    client.force_login(reader)
+    return {
+        'index': '/',
+        'group': f'/group/{group.slug}/',
+        'profile': f'/profile/{authors[0].username}/',
+        'post': f'/posts/{post.id}/',
+        'follow': '/follow/',
+    }, f'sessionid={client.cookies["sessionid"].value}'
+
+
+def add_latency(seconds):
+    """Задержка перед каждым запросом на всех соединениях, в т.ч. будущих."""
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(delay)
+
+    connection_created.connect(install, weak=False)
+    connection.execute_wrappers.append(delay)
+
+
+def run_wsgi(paths, cookie, total, concurrency):
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.test import RequestFactory
+
+    handler = WSGIHandler()
+    factory = RequestFactory()
+
+    def request(path):
+        environ = factory._base_environ(
+            PATH_INFO=path, REQUEST_METHOD='GET', HTTP_COOKIE=cookie
+        )
+        statuses = []
+        started = time.perf_counter()
+        body = handler(environ, lambda status, headers: statuses.append(
+            status
+        ))
+        b''.join(body)
+        body.close()
+        if not statuses[0].startswith('200'):
+            raise SystemExit(f'{path}: {statuses[0]}')
+        return time.perf_counter() - started
+
+    targets = [path for _, path in zip(range(total), cycle(paths))]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        samples = list(executor.map(request, targets))
+    return samples, time.perf_counter() - started
+
+
+def run_asgi(paths, cookie, total, concurrency):
+    from core.asgi import ASGIHandler
+
+    handler = ASGIHandler()
+
+    async def request(path):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'},
+            'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'root_path': '', 'query_string': b'',
+            'headers': [(b'host', b'testserver'),
+                        (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        started = time.perf_counter()
+        await handler(scope, receive, send)
+        if messages[0]['status'] != 200:
+            raise SystemExit(f'{path}: {messages[0]["status"]}')
+        return time.perf_counter() - started
+
+    async def worker(queue, samples):
+        while queue:
+            samples.append(await request(queue.pop()))
+
+    async def main():
+        queue = [path for _, path in zip(range(total), cycle(paths))]
+        samples = []
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(worker(queue, samples) for _ in range(concurrency))
+        )
+        return samples, time.perf_counter() - started
+
+    return asyncio.run(main())
+
+
+def run_url(base, paths, cookie, total, concurrency):
+    url = urlsplit(base)
+
+    async def request(path):
+        started = time.perf_counter()
+        reader, writer = await asyncio.open_connection(
+            url.hostname, url.port or 80
+        )
+        writer.write((
+            f'GET {path} HTTP/1.0\r\nHost: {url.netloc}\r\n'
+            f'Cookie: {cookie}\r\n\r\n'
+        ).encode())
+        status = (await reader.readline()).split()[1]
+        await reader.read()
+        writer.close()
+        if status != b'200':
+            raise SystemExit(f'{path}: {status.decode()}')
+        return time.perf_counter() - started
+
+    async def worker(queue, samples):
+        while queue:
+            samples.append(await request(queue.pop()))
+
+    async def main():
+        queue = [path for _, path in zip(range(total), cycle(paths))]
+        samples = []
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(worker(queue, samples) for _ in range(concurrency))
+        )
+        return samples, time.perf_counter() - started
+
+    return asyncio.run(main())
+
+
+def report(title, results, total):
+    print_table(title, [
+        (name, summary(samples)) for name, (samples, _) in results.items()
+    ])
+    for name, (_, elapsed) in results.items():
+        print(f'{name}: {total / elapsed:.0f} запросов/с')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument(
+        '--latency', type=float, default=0,
+        help='Задержка каждого SQL-запроса, мс',
+    )
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--pages', nargs='+', choices=PATHS, default=PATHS)
+    parser.add_argument('--url', nargs='+', help='Адреса запущенных серверов')
+    parser.add_argument('--cookie', default='', help='Cookie для --url')
+    options = parser.parse_args()
+
+    if options.url:
+        paths = {
+            'index': '/', 'follow': '/follow/',
+        }
+        results = {
+            base: run_url(
+                base, [paths[name] for name in options.pages if name in paths],
+                options.cookie, options.requests, options.concurrency,
+            )
+            for base in options.url
+        }
+        report('Серверы', results, options.requests)
+        return
+
+    setup_django()
+    configure()
+    with test_database():
+        paths, cookie = populate(options.posts)
+        if options.latency:
+            add_latency(options.latency / 1000)
+        for name in options.pages:
+            results = {
+                mode: run(
+                    [paths[name]], cookie,
+                    options.requests, options.concurrency,
+                )
+                for mode, run in (('wsgi', run_wsgi), ('asgi', run_asgi))
+            }
+            report(
+                f'{name}, {options.concurrency} одновременно, '
+                f'задержка БД {options.latency} мс',
+                results, options.requests,
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Размер и скорость создания адаптивных вариантов картинок.
+
+Запуск из каталога с manage.py::
+
+    python -m benchmarks.images --images 24 --workers 4
+
+Генерирует синтетические фотографии, создаёт для них варианты
+последовательно и в пуле процессов и сравнивает размер каждого варианта
+с текущей миниатюрой 960x339 JPEG, которую отдают шаблоны.
+"""
+import argparse
+import multiprocessing
+import random
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from .utils import setup_django
+
+
+def make_photo(rng, size):
+    from PIL import Image, ImageDraw, ImageFilter
+
+    image = Image.effect_noise(size, rng.randint(20, 60)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        radius = rng.randint(50, 400)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.ellipse((x, y, x + radius, y + radius), fill=color)
+    return image.filter(ImageFilter.GaussianBlur(2))
+
+
+def baseline_bytes(image):
+    """Текущая миниатюра карточки: 960x339, JPEG, качество sorl."""
+    from PIL import Image, ImageOps
+    from sorl.thumbnail.conf import settings as thumbnail_settings
+
+    buffer = BytesIO()
+    ImageOps.fit(image, (960, 339), Image.LANCZOS).save(
+        buffer, 'JPEG', quality=thumbnail_settings.THUMBNAIL_QUALITY
+    )
+    return len(buffer.getvalue())
+
+
+def build(location, name):
+    from django.core.files.storage import FileSystemStorage
+
+    from posts import variants
+
+    return variants.build(name, storage=FileSystemStorage(location=location))
+
+
+def run(location, names, workers):
+    started = time.perf_counter()
+    if workers:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=setup_django,
+        ) as executor:
+            results = list(executor.map(build, [location] * len(names), names))
+    else:
+        results = [build(location, name) for name in names]
+    return results, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=24)
+    parser.add_argument('--width', type=int, default=2400)
+    parser.add_argument('--height', type=int, default=1600)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=42)
+    options = parser.parse_args()
+
+    setup_django()
+    from posts import variants
+
+    rng = random.Random(options.seed)
+    location = tempfile.mkdtemp()
+    try:
+        names, baseline = [], []
+        for number in range(options.images):
+            image = make_photo(rng, (options.width, options.height))
+            name = f'photo_{number}.jpg'
+            image.save(f'{location}/{name}', 'JPEG', quality=95)
+            names.append(name)
+            baseline.append(baseline_bytes(image))
+
+        print(f'Форматы: {", ".join(variants.supported_formats())}')
+        results, sequential = run(location, names, 0)
+        _, parallel = run(location, names, options.workers)
+        print(
+            f'\nПоследовательно: {options.images / sequential:.1f} картинок/с'
+            f'\nПул из {options.workers}: '
+            f'{options.images / parallel:.1f} картинок/с'
+        )
+
+        sizes = defaultdict(list)
+        for result in results:
+            for image_format, items in result.items():
+                for item in items:
+                    sizes[image_format, item['width']].append(item['bytes'])
+        average_baseline = sum(baseline) / len(baseline)
+        print(
+            f'\nБазовая миниатюра 960 JPEG: '
+            f'{average_baseline / 1024:.1f} KiB'
+        )
+        print(f'{"variant":<16}{"KiB":>10}{"saved":>10}')
+        for (image_format, width), values in sorted(sizes.items()):
+            average = sum(values) / len(values)
+            saved = 1 - average / average_baseline
+            print(
+                f'{f"{image_format} {width}w":<16}'
+                f'{average / 1024:>10.1f}{saved:>10.0%}'
+            )
+    finally:
+        shutil.rmtree(location, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
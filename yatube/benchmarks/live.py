@@ -0,0 +1,164 @@
+"""Нагрузочный стенд потоков SSE: тысячи одновременных подключений.
+
+Запуск из каталога с manage.py. Без ``--url`` приложение
+``yatube.asgi`` гоняется в этом же процессе без сети: подключения
+проходят маршрутизацию, подписку у брокера и кадрирование SSE, а
+события публикуются из отдельного потока, как это делают обработчики
+сигналов::
+
+    python -m benchmarks.live --connections 5000 --events 50
+
+С ``--url`` стенд открывает настоящие TCP-подключения к запущенному
+серверу (например, ``uvicorn yatube.asgi:application``). Публиковать в
+этом режиме имеет смысл только через общий брокер, то есть с
+``LIVE_BROKER=live.broker.RedisBroker`` у сервера и у стенда::
+
+    python -m benchmarks.live --url http://127.0.0.1:8000/events/posts/ \\
+        --connections 5000 --events 50
+
+Задержка — время от публикации (поле ``sent`` события) до получения
+клиентом, по всем парам «событие × подключение».
+"""
+import argparse
+import asyncio
+import json
+import resource
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .utils import print_table, setup_django, summary
+
+
+def publish(count, interval):
+    from live.broker import get_broker
+    from live.events import frame, post_channels
+
+    broker = get_broker()
+    for index in range(count):
+        time.sleep(interval)
+        broker.publish(post_channels('bench'), frame('post', {
+            'id': index, 'text': 'Нагрузка', 'author': 'bench',
+        }))
+
+
+def latency(data, received):
+    return received - json.loads(data)['sent']
+
+
+async def in_process(options):
+    from live.testing import StreamClient
+    from yatube.asgi import application
+
+    started = time.perf_counter()
+    clients = [
+        StreamClient(application, '/events/posts/')
+        for _ in range(options.connections)
+    ]
+    statuses = await asyncio.gather(*(client.start() for client in clients))
+    connected = time.perf_counter() - started
+    if set(statuses) != {200}:
+        raise SystemExit(f'Неожиданные статусы: {set(statuses)}')
+
+    async def consume(client):
+        samples = []
+        for _ in range(options.events):
+            _, data = await client.event(timeout=30)
+            samples.append(latency(data, time.time()))
+        return samples
+
+    publisher = threading.Thread(
+        target=publish, args=(options.events, options.interval)
+    )
+    consumers = asyncio.gather(*(consume(client) for client in clients))
+    publisher.start()
+    results = await consumers
+    publisher.join()
+    await asyncio.gather(*(client.close() for client in clients))
+    return connected, [sample for samples in results for sample in samples]
+
+
+async def over_network(options):
+    url = urlsplit(options.url)
+    request = (
+        f'GET {url.path} HTTP/1.0\r\nHost: {url.netloc}\r\n'
+        'Accept: text/event-stream\r\n\r\n'
+    ).encode()
+
+    async def connect():
+        reader, writer = await asyncio.open_connection(
+            url.hostname, url.port or 80
+        )
+        writer.write(request)
+        status = (await reader.readline()).split()[1]
+        if status != b'200':
+            raise SystemExit(f'Сервер ответил {status.decode()}')
+        while (await reader.readline()).strip():
+            pass
+        return reader, writer
+
+    async def consume(reader):
+        samples = []
+        while len(samples) < options.events:
+            line = await asyncio.wait_for(reader.readline(), 60)
+            if not line:
+                break
+            if line.startswith(b'data: '):
+                samples.append(latency(line[6:], time.time()))
+        return samples
+
+    started = time.perf_counter()
+    connections = []
+    for offset in range(0, options.connections, 500):
+        size = min(500, options.connections - offset)
+        connections += await asyncio.gather(
+            *(connect() for _ in range(size))
+        )
+    connected = time.perf_counter() - started
+    consumers = asyncio.gather(
+        *(consume(reader) for reader, _ in connections)
+    )
+    threading.Thread(
+        target=publish, args=(options.events, options.interval), daemon=True
+    ).start()
+    results = await consumers
+    for _, writer in connections:
+        writer.close()
+    return connected, [sample for samples in results for sample in samples]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument(
+        '--interval', type=float, default=0.05,
+        help='Пауза между публикациями, секунды',
+    )
+    parser.add_argument('--url', help='Адрес потока запущенного сервера')
+    options = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+
+    settings.LIVE_MAX_CONNECTIONS = max(
+        settings.LIVE_MAX_CONNECTIONS, options.connections
+    )
+    if options.url and settings.LIVE_BROKER == 'live.broker.LocalBroker':
+        print('LocalBroker не доходит до другого процесса: события должен '
+              'публиковать сервер, иначе используйте RedisBroker')
+    run = over_network if options.url else in_process
+    connected, samples = asyncio.run(run(options))
+    expected = options.connections * options.events
+    print(f'Подключений: {options.connections}, открыты за '
+          f'{connected:.2f} с; доставлено {len(samples)} из {expected}')
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f'Пиковая память процесса: {rss:.0f} МиБ')
+    if samples:
+        print_table('Задержка доставки', [('publish → client', summary(
+            samples
+        ))])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Обычные сериализаторы DRF против быстрого пути через values().
+
+Запуск из каталога с manage.py::
+
+    python -m benchmarks.serializers --rows 1000 10000 --repeat 10
+
+Для каждого размера выборки постов и комментариев замеряется полный
+цикл «запрос → словари → JSON» тремя способами: ModelSerializer без
+select_related (как было), ModelSerializer с select_related и
+RowSerializer с FastJSONRenderer. Перед замерами проверяется, что
+быстрый путь выдаёт те же байты.
+"""
+import argparse
+
+from .utils import print_table, setup_django, summary, test_database, timed
+
+
+def populate(rows):
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+
+    from posts.models import Comment, Group, Post
+
+    User = get_user_model()
+    User.objects.bulk_create(
+        (User(username=f'user{index}') for index in range(100)),
+        ignore_conflicts=True,
+    )
+    users = list(User.objects.order_by('id'))
+    group, _ = Group.objects.get_or_create(
+        slug='g', defaults={'title': 'g', 'description': 'g'}
+    )
+    now = timezone.now()
+    Post.objects.bulk_create(
+        (Post(
+            text=f'Пост номер {index} ' * 10,
+            author=users[index % len(users)],
+            group=group if index % 3 else None,
+            image='posts/photo.jpg' if index % 5 == 0 else '',
+            pub_date=now,
+        ) for index in range(rows)),
+        batch_size=1000,
+    )
+    post = Post.objects.order_by('id').first()
+    Comment.objects.bulk_create(
+        (Comment(
+            post=post,
+            author=users[index % len(users)],
+            text=f'Комментарий {index}',
+        ) for index in range(rows)),
+        batch_size=1000,
+    )
+
+
+def cases(request):
+    from rest_framework.renderers import JSONRenderer
+
+    from api.fast import FastJSONRenderer, RowSerializer
+    from api.serializers import CommentSerializer, PostSerializer
+    from posts.models import Comment, Post
+
+    context = {'request': request}
+    renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+
+    def drf(serializer_class, queryset):
+        def run():
+            data = serializer_class(queryset.all(), many=True,
+                                    context=context).data
+            return renderer.render(data)
+        return run
+
+    def fast(serializer_class, queryset):
+        row = RowSerializer(serializer_class(context=context))
+
+        def run():
+            rows = queryset.values(*row.columns)
+            return fast_renderer.render(row.many(rows.iterator()))
+        return run
+
+    for name, serializer_class, queryset in (
+        ('posts', PostSerializer, Post.objects.order_by('id')),
+        ('comments', CommentSerializer, Comment.objects.order_by('id')),
+    ):
+        yield name, {
+            'drf': drf(serializer_class, queryset),
+            'drf+select_related': drf(
+                serializer_class, queryset.select_related('author')
+            ),
+            'values+orjson': fast(serializer_class, queryset),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=10)
+    options = parser.parse_args()
+
+    setup_django()
+    from django.test import RequestFactory
+
+    from posts.models import Comment, Post
+
+    request = RequestFactory().get('/api/v1/posts/')
+    with test_database():
+        for rows in options.rows:
+            Comment.objects.all().delete()
+            Post.objects.all().delete()
+            populate(rows)
+            for name, runs in cases(request):
+                outputs = {case: run() for case, run in runs.items()}
+                if len(set(outputs.values())) != 1:
+                    raise SystemExit(f'{name}: вывод отличается')
+                table = []
+                for case, run in runs.items():
+                    samples = [timed(run) for _ in range(options.repeat)]
+                    table.append((case, summary(samples)))
+                print_table(f'{name}, {rows} строк', table)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""Нагрузочные сценарии yatube со сравнением с базовой линией.
+
+Запуск из каталога с manage.py::
+
+    python -m benchmarks.suite --requests 500 --concurrency 8
+    python -m benchmarks.suite --save benchmarks/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json
+
+На временной базе генерируются данные (см. benchmarks.data), затем
+каждый сценарий — анонимная главная, глубокое листание, профили,
+лента подписок, комментарии, список и создание постов через API —
+гоняется через WSGIHandler пулом потоков. Для сценария выводятся
+запросы в секунду, p50/p95/p99 и среднее число SQL-запросов на ответ.
+
+С ``--baseline`` результаты сравниваются с сохранённым файлом: рост
+среднего числа SQL-запросов больше чем на QUERY_SLACK — регрессия
+всегда, а время и пропускная способность — если ухудшились больше чем
+на ``--tolerance``. При регрессии скрипт
+завершается с кодом 1, поэтому его можно ставить в CI. Время зависит
+от машины, так что базовую линию стоит снимать там же, где сравнивать.
+"""
+import argparse
+import contextvars
+import json
+import random
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .http import configure
+from .utils import print_table, setup_django, summary, test_database
+
+Call = namedtuple('Call', 'method path data headers status')
+Result = namedtuple('Result', 'seconds queries')
+
+# Промахи кеша при параллельных запросах немного меняют среднее число
+# SQL от прогона к прогону; лишний запрос на каждый ответ даёт +1.
+QUERY_SLACK = 0.5
+
+# Список, а не поток: параллельные запросы async-view идут из пула, а
+# переменная контекста переходит туда вместе с sync_to_async.
+_queries = contextvars.ContextVar('queries')
+
+
+def count_queries(execute, sql, params, many, context):
+    executed = _queries.get(None)
+    if executed is not None:
+        executed.append(sql)
+    return execute(sql, params, many, context)
+
+
+def install_counter():
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(count_queries)
+
+    connection_created.connect(install, weak=False)
+    connection.execute_wrappers.append(count_queries)
+
+
+def credentials(dataset):
+    """Cookie сессии и CSRF и заголовок токена для каждого читателя."""
+    from django.contrib.auth import get_user_model
+    from django.middleware.csrf import get_token
+    from django.test import Client, RequestFactory
+    from rest_framework.authtoken.models import Token
+
+    sessions, tokens = {}, {}
+    for user in get_user_model().objects.filter(
+            username__in=dataset.readers):
+        client = Client()
+        client.force_login(user)
+        request = RequestFactory().get('/')
+        csrf_token = get_token(request)
+        sessions[user.username] = {
+            'HTTP_COOKIE': (
+                f'sessionid={client.cookies["sessionid"].value}; '
+                f'csrftoken={request.META["CSRF_COOKIE"]}'
+            ),
+            'HTTP_X_CSRFTOKEN': csrf_token,
+        }
+        token, _ = Token.objects.get_or_create(user=user)
+        tokens[user.username] = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+    return sessions, tokens
+
+
+def scenarios(dataset, sessions, tokens):
+    """Сценарий — функция, которая по генератору случайных чисел
+    возвращает следующий запрос виртуального пользователя."""
+
+    def author(rng):
+        return rng.choices(dataset.usernames, weights=dataset.weights)[0]
+
+    def reader(rng):
+        return rng.choice(dataset.readers)
+
+    def index(rng):
+        return Call('GET', '/', None, {}, 200)
+
+    def deep_pagination(rng):
+        cursor = rng.choice(dataset.deep_cursors)
+        return Call('GET', f'/?cursor={cursor}', None, {}, 200)
+
+    def profile(rng):
+        return Call('GET', f'/profile/{author(rng)}/', None, {}, 200)
+
+    def follow_feed(rng):
+        return Call('GET', '/follow/', None, sessions[reader(rng)], 200)
+
+    def comment(rng):
+        post_id = rng.choice(dataset.post_ids)
+        return Call(
+            'POST', f'/posts/{post_id}/comment/',
+            {'text': 'Нагрузочный комментарий'},
+            sessions[reader(rng)], 302,
+        )
+
+    def api_list(rng):
+        return Call('GET', '/api/v1/posts/', None, tokens[reader(rng)], 200)
+
+    def api_create(rng):
+        return Call(
+            'POST', '/api/v1/posts/', {'text': 'Пост из API'},
+            tokens[reader(rng)], 201,
+        )
+
+    return {
+        'index': (index, False),
+        'deep_pagination': (deep_pagination, False),
+        'profile': (profile, False),
+        'follow_feed': (follow_feed, False),
+        'comment': (comment, True),
+        'api_list': (api_list, False),
+        'api_create': (api_create, True),
+    }
+
+
+def run(scenario, total, concurrency, seed):
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.test import RequestFactory
+
+    handler = WSGIHandler()
+    factory = RequestFactory()
+    rng = random.Random(seed)
+    calls = [scenario(rng) for _ in range(total)]
+
+    def request(call):
+        if call.method == 'GET':
+            environ = factory.get(call.path, **call.headers).environ
+        elif call.path.startswith('/api/'):
+            environ = factory.post(
+                call.path, json.dumps(call.data),
+                content_type='application/json', **call.headers,
+            ).environ
+        else:
+            environ = factory.post(
+                call.path, call.data, **call.headers
+            ).environ
+        statuses = []
+        executed = []
+        _queries.set(executed)
+        started = time.perf_counter()
+        body = handler(environ, lambda status, headers: statuses.append(
+            status
+        ))
+        b''.join(body)
+        body.close()
+        elapsed = time.perf_counter() - started
+        if int(statuses[0].split()[0]) != call.status:
+            raise SystemExit(f'{call.method} {call.path}: {statuses[0]}')
+        return Result(elapsed, len(executed))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(request, calls))
+    elapsed = time.perf_counter() - started
+    stats = summary([result.seconds for result in results])
+    stats['rps'] = total / elapsed
+    stats['queries'] = sum(result.queries for result in results) / total
+    return stats
+
+
+def compare(results, baseline, tolerance):
+    """Строки сравнения и список регрессий."""
+    rows, regressions = [], []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append((name, 'нет в базовой линии'))
+            continue
+        changes = {
+            'p95': stats['p95'] / base['p95'] - 1,
+            'rps': stats['rps'] / base['rps'] - 1,
+            'queries': stats['queries'] - base['queries'],
+        }
+        failed = [
+            metric for metric, bad in (
+                ('p95', changes['p95'] > tolerance),
+                ('rps', changes['rps'] < -tolerance),
+                ('queries', changes['queries'] > QUERY_SLACK),
+            ) if bad
+        ]
+        if failed:
+            regressions.append((name, failed))
+        rows.append((
+            name,
+            f'p95 {changes["p95"]:+.0%}, rps {changes["rps"]:+.0%}, '
+            f'SQL {changes["queries"]:+.1f}'
+            + (f'  РЕГРЕССИЯ: {", ".join(failed)}' if failed else ''),
+        ))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--comments', type=int, default=20000)
+    parser.add_argument('--images', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument(
+        '--scenarios', nargs='+',
+        help='Только эти сценарии; по умолчанию все',
+    )
+    parser.add_argument('--save', help='Записать результаты в этот файл')
+    parser.add_argument('--baseline', help='Сравнить с этим файлом')
+    parser.add_argument(
+        '--tolerance', type=float, default=0.2,
+        help='Допустимое ухудшение времени и пропускной способности',
+    )
+    options = parser.parse_args()
+
+    setup_django()
+    configure()
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.db import connection
+
+    from . import data
+
+    settings.MEDIA_ROOT = tempfile.mkdtemp()
+    results = {}
+    try:
+        with test_database():
+            started = time.perf_counter()
+            dataset = data.generate(
+                users=options.users, posts=options.posts,
+                comments=options.comments, images=options.images,
+                seed=options.seed,
+            )
+            print(f'Данные готовы за {time.perf_counter() - started:.1f} с')
+            sessions, tokens = credentials(dataset)
+            install_counter()
+            for name, (scenario, writes) in scenarios(
+                    dataset, sessions, tokens).items():
+                if options.scenarios and name not in options.scenarios:
+                    continue
+                cache.clear()
+                # SQLite не пишет из нескольких потоков одновременно.
+                concurrency = options.concurrency
+                if writes and connection.vendor == 'sqlite':
+                    concurrency = 1
+                results[name] = run(
+                    scenario, options.requests, concurrency, options.seed
+                )
+    finally:
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    print_table(
+        f'{options.requests} запросов, {options.concurrency} потоков',
+        results.items(),
+    )
+    print(f'\n{"case":<32}{"rps":>10}{"SQL/req":>10}')
+    for name, stats in results.items():
+        print(f'{name:<32}{stats["rps"]:>10.0f}{stats["queries"]:>10.1f}')
+
+    if options.save:
+        with open(options.save, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if options.baseline:
+        with open(options.baseline) as source:
+            baseline = json.load(source)
+        rows, regressions = compare(results, baseline, options.tolerance)
+        print(f'\nСравнение с {options.baseline}')
+        for name, line in rows:
+            print(f'{name:<32}{line}')
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
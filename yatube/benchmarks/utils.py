@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """Поднимает временную тестовую базу, как это делает manage.py test."""
+    from django.db import connection
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def summary(samples):
+    """Сводка по замерам в миллисекундах."""
+    return {
+        'n': len(samples),
+        'p50': percentile(samples, 50) * 1000,
+        'p95': percentile(samples, 95) * 1000,
+        'p99': percentile(samples, 99) * 1000,
+    }
+
+
+def print_table(title, rows):
+    print(f'\n{title}')
+    print(f'{"case":<32}{"n":>6}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}')
+    for name, stats in rows:
+        print(
+            f'{name:<32}{stats["n"]:>6}{stats["p50"]:>10.2f}'
+            f'{stats["p95"]:>10.2f}{stats["p99"]:>10.2f}'
+        )
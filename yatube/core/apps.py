@@ -3,3 +3,15 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.core.signals import request_finished, request_started
+        from django.test.signals import setting_changed
+
+        from . import checks  # noqa: F401
+        from . import connections, metrics
+
+        request_started.connect(connections.check_idle_connections)
+        request_finished.connect(connections.mark_used)
+        metrics.configure()
+        setting_changed.connect(metrics.configure)
@@ -0,0 +1,57 @@
+"""ASGI-обработчик Django с потоковыми ответами из синхронного кода.
+
+ASGIHandler Django 3.2 перебирает ``streaming_content`` прямо в цикле
+событий, поэтому генератор, который читает базу (выгрузки
+``posts.export``), падает с SynchronousOnlyOperation, а клиент
+получает 200 с обрезанным телом. Здесь каждая часть ответа берётся в
+том же потоке, где выполнялось представление: серверный курсор и
+соединение остаются в одном потоке, а цикл событий не блокируется.
+"""
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers import asgi
+
+_DONE = object()
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            headers.append(
+                (b'Set-Cookie', cookie.output(header='').encode('ascii')
+                 .strip())
+            )
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+        parts = iter(response)
+        next_part = sync_to_async(next, thread_sensitive=True)
+        while True:
+            part = await next_part(parts, _DONE)
+            if part is _DONE:
+                break
+            for chunk, _ in self.chunk_bytes(part):
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def get_asgi_application():
+    """Как django.core.asgi.get_asgi_application, но с ASGIHandler выше."""
+    django.setup(set_prefix=False)
+    return ASGIHandler()
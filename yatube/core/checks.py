@@ -0,0 +1,23 @@
+from django.conf import settings as s
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches)
+def check_local_cache_timeouts(app_configs, **kwargs):
+    """Долгий кеш страниц и карточек требует общего для воркеров кеша."""
+    if not isinstance(caches['default'], LocMemCache):
+        return []
+    return [
+        Error(
+            f'{name} = {getattr(s, name)} с LocMemCache: изменения, '
+            f'сделанные в одном процессе, другие не увидят до истечения '
+            f'срока.',
+            hint='Задайте общий кеш через CACHE_BACKEND и CACHE_LOCATION '
+                 'или срок не больше LOCAL_CACHE_TIMEOUT.',
+            id='core.E001',
+        )
+        for name in ('PAGE_CACHE_TIMEOUT', 'CARD_CACHE_TIMEOUT')
+        if getattr(s, name) > s.LOCAL_CACHE_TIMEOUT
+    ]
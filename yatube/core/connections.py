@@ -0,0 +1,261 @@
+"""Постоянные соединения с БД: проверка перед использованием и пул.
+
+Django 3.2 держит соединение между запросами CONN_MAX_AGE секунд, но
+не проверяет его: оборванное сервером или балансировщиком соединение
+всплывает ошибкой в первом запросе. ``check_idle_connections`` перед
+каждым запросом проверяет соединения, простоявшие без дела дольше
+DB_HEALTH_CHECK_IDLE секунд, и закрывает оборванные — следующий
+запрос откроет новое.
+
+С DB_POOL=1 база подключается через бэкенды ``core.backends.*``:
+соединения не закрываются, а возвращаются в пул процесса, общий для
+всех потоков. Это нужно async-view и потоковым серверам, где потоков
+больше, чем имеет смысл держать соединений: поток берёт соединение
+только на время работы с базой. Пул открывает не больше DB_POOL_SIZE
+соединений, остальные потоки ждут до DB_POOL_TIMEOUT секунд.
+"""
+import threading
+import time
+from collections import deque
+
+from django.conf import settings as s
+from django.db import connections
+
+from .metrics import REGISTRY, Counter, Gauge, Histogram
+
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+def ping(connection):
+    """Проверка соединения драйвера DB-API."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SELECT 1')
+    finally:
+        cursor.close()
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений драйвера.
+
+    Свободные соединения выдаются последним пришедшим первым, чтобы
+    лишние простаивали и закрывались, а не держались все понемногу.
+    ``params`` — параметры подключения: если они сменились (например,
+    тестовый прогон переключился на тестовую базу), старые соединения
+    закрываются, а не выдаются снова.
+    """
+
+    def __init__(self, alias, size, timeout, check_idle):
+        self.alias = alias
+        self.size = size
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self.params = None
+        self.idle = deque()
+        self.opened = 0
+        self.in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.condition = threading.Condition()
+
+    def checkout(self, connect, params=None):
+        """Свободное соединение или новое от ``connect()``."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        stale = ()
+        timed_out = False
+        with self.condition:
+            if params != self.params:
+                stale, self.idle = self.idle, deque()
+                self.opened -= len(stale)
+                self.params = params
+            while not self.idle and self.opened >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    timed_out = True
+                    break
+                self.condition.wait(remaining)
+            if not timed_out:
+                if self.idle:
+                    connection, returned = self.idle.pop()
+                else:
+                    connection, returned = None, None
+                    self.opened += 1
+                self.in_use += 1
+                self.checkouts += 1
+        for stale_connection, _ in stale:
+            self.discard(stale_connection)
+        # Метрики пишутся только вне self.condition: Registry.render
+        # снимает датчики пула, а обратный порядок блокировок — взаимная
+        # блокировка при выгрузке /metrics/ под нагрузкой.
+        if timed_out:
+            with REGISTRY.lock:
+                POOL_TIMEOUTS.inc((self.alias,))
+            raise PoolTimeout(
+                f'Нет свободного соединения с {self.alias} '
+                f'за {self.timeout} с'
+            )
+        with REGISTRY.lock:
+            POOL_WAIT.observe((self.alias,), time.monotonic() - started)
+        try:
+            if connection is not None and (
+                    time.monotonic() - returned > self.check_idle):
+                try:
+                    ping(connection)
+                except Exception:
+                    self.discard(connection)
+                    connection = None
+            if connection is None:
+                connection = connect()
+        except Exception:
+            with self.condition:
+                self.opened -= 1
+                self.in_use -= 1
+                self.condition.notify()
+            raise
+        return connection
+
+    def checkin(self, connection, discard=False, params=None):
+        with self.condition:
+            self.in_use -= 1
+            discard = discard or params != self.params
+            if discard:
+                self.opened -= 1
+            else:
+                self.idle.append((connection, time.monotonic()))
+            self.condition.notify()
+        if discard:
+            self.discard(connection)
+
+    def discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Закрывает свободные соединения; выданные вернутся позже."""
+        with self.condition:
+            idle, self.idle = self.idle, deque()
+            self.opened -= len(idle)
+        for connection, _ in idle:
+            self.discard(connection)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'size': self.size,
+                'opened': self.opened,
+                'in_use': self.in_use,
+                'idle': len(self.idle),
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'saturation': self.in_use / self.size,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias):
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(
+                alias, s.DB_POOL_SIZE, s.DB_POOL_TIMEOUT,
+                s.DB_HEALTH_CHECK_IDLE,
+            )
+        return pool
+
+
+def pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.alias: pool.stats() for pool in pools}
+
+
+def _gauge(key):
+    return lambda: {
+        (alias, ): stats[key] for alias, stats in pool_stats().items()
+    }
+
+
+POOL_WAIT = Histogram(
+    'yatube_db_pool_wait_seconds', 'Ожидание соединения из пула.',
+    ('alias',), WAIT_BUCKETS,
+)
+POOL_TIMEOUTS = Counter(
+    'yatube_db_pool_timeouts_total', 'Соединение не дождались.', ('alias',),
+)
+REGISTRY.register(
+    POOL_WAIT,
+    POOL_TIMEOUTS,
+    Gauge('yatube_db_pool_size', 'Размер пула.', ('alias',), _gauge('size')),
+    Gauge(
+        'yatube_db_pool_connections', 'Открытые соединения пула.',
+        ('alias',), _gauge('opened'),
+    ),
+    Gauge(
+        'yatube_db_pool_in_use', 'Выданные соединения.',
+        ('alias',), _gauge('in_use'),
+    ),
+    Gauge(
+        'yatube_db_pool_saturation', 'Доля выданных соединений.',
+        ('alias',), _gauge('saturation'),
+    ),
+)
+
+
+class PooledDatabaseWrapperMixin:
+    """Для DatabaseWrapper: новое соединение берётся из пула, а close()
+    возвращает его туда. Соединение после ошибки или закрытое посреди
+    транзакции в пул не возвращается: во втором случае Django держит
+    на него ссылку до отката.
+    """
+
+    def get_new_connection(self, conn_params):
+        self.pool_params = conn_params
+        return get_pool(self.alias).checkout(
+            lambda: super(
+                PooledDatabaseWrapperMixin, self
+            ).get_new_connection(conn_params),
+            conn_params,
+        )
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = get_pool(self.alias)
+        discard = self.errors_occurred or self.in_atomic_block
+        if not discard:
+            try:
+                self.connection.rollback()
+            except Exception:
+                discard = True
+        pool.checkin(self.connection, discard, self.pool_params)
+
+
+def check_idle_connections(**kwargs):
+    """Получатель request_started: закрывает оборванные соединения."""
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        last_used = getattr(connection, 'last_used', now)
+        if now - last_used > s.DB_HEALTH_CHECK_IDLE:
+            if not connection.is_usable():
+                connection.close()
+
+
+def mark_used(**kwargs):
+    """Получатель request_finished: время последнего использования."""
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.last_used = now
@@ -0,0 +1,301 @@
+"""Метрики запросов: число и время SQL, время шаблонов, общая задержка.
+
+Наблюдения копятся в гистограммах процесса и отдаются в текстовом
+формате Prometheus; каждый воркер считает свои, поэтому сборщик должен
+опрашивать их по отдельности. Счётчик запросов ведётся всегда, а
+подробные замеры — только для доли METRICS_SAMPLE_RATE запросов.
+"""
+import bisect
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings as s
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+logger = logging.getLogger('yatube.metrics')
+
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _labels(names, values):
+    pairs = ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', r'\\').replace('"', r'\"'),
+        )
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}' if pairs else ''
+
+
+def _value(value):
+    """Значение как в prometheus_client: целые точно, дробные через
+    repr — формат :g оставляет 6 значащих цифр и портит rate()."""
+    if isinstance(value, int):
+        return str(value)
+    if value == float('inf'):
+        return '+Inf'
+    if value == float('-inf'):
+        return '-Inf'
+    if value != value:
+        return 'NaN'
+    return repr(float(value))
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self.values = {}
+
+    def inc(self, labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in sorted(self.values.items()):
+            yield self.name + _labels(self.label_names, labels), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels, buckets=SECONDS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self.buckets = buckets
+        self.values = {}
+
+    def observe(self, labels, value):
+        """Храним число наблюдений в каждой корзине, сумму и количество."""
+        counts = self.values.get(labels)
+        if counts is None:
+            counts = self.values[labels] = [0] * (len(self.buckets) + 3)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def samples(self):
+        names = (*self.label_names, 'le')
+        for labels, counts in sorted(self.values.items()):
+            total = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                total += count
+                yield (
+                    f'{self.name}_bucket' + _labels(names, (*labels, bound)),
+                    total,
+                )
+            suffix = _labels(self.label_names, labels)
+            yield f'{self.name}_sum{suffix}', counts[-2]
+            yield f'{self.name}_count{suffix}', counts[-1]
+
+
+class Gauge:
+    """Текущие значения; ``collect`` снимает их в момент выгрузки."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels, collect):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self.collect = collect
+        self.values = {}
+
+    def samples(self, values=None):
+        if values is None:
+            values = self.collect()
+        for labels, value in sorted(values.items()):
+            yield self.name + _labels(self.label_names, labels), value
+
+
+class Registry:
+    def __init__(self, *metrics):
+        self.metrics = {metric.name: metric for metric in metrics}
+        self.lock = threading.Lock()
+
+    def register(self, *metrics):
+        with self.lock:
+            for metric in metrics:
+                self.metrics[metric.name] = metric
+
+    def __getitem__(self, name):
+        return self.metrics[name]
+
+    def clear(self):
+        with self.lock:
+            for metric in self.metrics.values():
+                metric.values.clear()
+
+    def render(self):
+        # Датчики снимаются до self.lock: collect берёт чужие блокировки
+        # (пула соединений), под которыми пишутся метрики.
+        gauges = {
+            metric.name: metric.collect()
+            for metric in list(self.metrics.values())
+            if metric.kind == 'gauge'
+        }
+        lines = []
+        with self.lock:
+            for metric in self.metrics.values():
+                lines.append(f'# HELP {metric.name} {metric.documentation}')
+                lines.append(f'# TYPE {metric.name} {metric.kind}')
+                if metric.kind == 'gauge':
+                    samples = metric.samples(gauges.get(metric.name, {}))
+                else:
+                    samples = metric.samples()
+                lines.extend(
+                    f'{name} {_value(value)}' for name, value in samples
+                )
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry(
+    Counter(
+        'yatube_requests_total', 'Обработанные запросы.',
+        ('view', 'method', 'status'),
+    ),
+    Histogram(
+        'yatube_request_duration_seconds', 'Полное время ответа.', ('view',),
+    ),
+    Histogram(
+        'yatube_db_duration_seconds', 'Суммарное время SQL.', ('view',),
+    ),
+    Histogram(
+        'yatube_db_queries', 'Число SQL-запросов.', ('view',), QUERIES,
+    ),
+    Histogram(
+        'yatube_template_duration_seconds', 'Время рендеринга шаблонов.',
+        ('view',),
+    ),
+)
+
+_current = contextvars.ContextVar('metrics_collector', default=None)
+
+
+class Collector:
+    """Замеры одного запроса. Переменная контекста переходит в потоки
+    sync_to_async, так что учитываются и запросы async-view из пула."""
+
+    __slots__ = ('queries', 'template_time', 'rendering')
+
+    def __init__(self):
+        self.queries = []
+        self.template_time = 0.0
+        self.rendering = False
+
+
+def record_query(execute, sql, params, many, context):
+    collector = _current.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.queries.append(time.perf_counter() - started)
+
+
+def install_query_hook(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def remove_query_hook(connection):
+    if record_query in connection.execute_wrappers:
+        connection.execute_wrappers.remove(record_query)
+
+
+_render = Template.render
+
+
+def _timed_render(self, context):
+    """Считает только внешний шаблон: include и extends внутри него уже
+    входят в его время."""
+    collector = _current.get()
+    if collector is None or collector.rendering:
+        return _render(self, context)
+    collector.rendering = True
+    started = time.perf_counter()
+    try:
+        return _render(self, context)
+    finally:
+        collector.rendering = False
+        collector.template_time += time.perf_counter() - started
+
+
+def configure(setting=None, **kwargs):
+    """Ставит хуки по METRICS_ENABLED и METRICS_TEMPLATES или снимает их,
+    в том числе подмену Template.render. Вызывается из ready() и как
+    получатель setting_changed."""
+    if setting not in (None, 'METRICS_ENABLED', 'METRICS_TEMPLATES'):
+        return
+    enabled = s.METRICS_ENABLED
+    if enabled:
+        connection_created.connect(install_query_hook)
+    else:
+        connection_created.disconnect(install_query_hook)
+    for connection in connections.all():
+        if enabled:
+            install_query_hook(None, connection)
+        else:
+            remove_query_hook(connection)
+    if enabled and s.METRICS_TEMPLATES:
+        Template.render = _timed_render
+    else:
+        Template.render = _render
+
+
+class Measurement:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.collector = None
+        self.token = None
+        if random.random() < s.METRICS_SAMPLE_RATE:
+            self.collector = Collector()
+            self.token = _current.set(self.collector)
+
+    def finish(self, request, response):
+        duration = time.perf_counter() - self.started
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        with REGISTRY.lock:
+            REGISTRY['yatube_requests_total'].inc(
+                (view, request.method, response.status_code)
+            )
+            if self.collector is None:
+                return
+            _current.reset(self.token)
+            queries = self.collector.queries
+            db_time = sum(queries)
+            template_time = self.collector.template_time
+            labels = (view,)
+            REGISTRY['yatube_request_duration_seconds'].observe(
+                labels, duration
+            )
+            REGISTRY['yatube_db_duration_seconds'].observe(labels, db_time)
+            REGISTRY['yatube_db_queries'].observe(labels, len(queries))
+            REGISTRY['yatube_template_duration_seconds'].observe(
+                labels, template_time
+            )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'view': view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 2),
+                'db_ms': round(db_time * 1000, 2),
+                'queries': len(queries),
+                'template_ms': round(template_time * 1000, 2),
+            }, ensure_ascii=False))
@@ -0,0 +1,72 @@
+import asyncio
+
+from django.conf import settings as s
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics, replicas
+
+
+class WrappingMiddleware:
+    """Middleware вокруг всей цепочки: подкласс определяет
+    ``start(request)``, который вызывается до ответа, и
+    ``finish(request, response, state)`` с результатом ``start``.
+    Работает и в sync, и в async цепочке без переходов между ними; если
+    ``enabled()`` ложно, исключает себя из неё целиком.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not self.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так же помечает себя MiddlewareMixin.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def enabled(self):
+        return True
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.start(request)
+        response = self.get_response(request)
+        self.finish(request, response, state)
+        return response
+
+    async def __acall__(self, request):
+        state = self.start(request)
+        response = await self.get_response(request)
+        self.finish(request, response, state)
+        return response
+
+
+class RequestMetricsMiddleware(WrappingMiddleware):
+    """Замеряет каждый запрос; стоит первой, чтобы учесть всю цепочку."""
+
+    def enabled(self):
+        return s.METRICS_ENABLED
+
+    def start(self, request):
+        return metrics.Measurement()
+
+    def finish(self, request, response, measurement):
+        measurement.finish(request, response)
+
+
+class ReplicaMiddleware(WrappingMiddleware):
+    """Разрешает чтение с реплик для GET без недавних записей клиента.
+
+    Стоит до SessionMiddleware, чтобы сессия тоже читалась с реплики.
+    """
+
+    def enabled(self):
+        return bool(s.DATABASE_REPLICAS)
+
+    def start(self, request):
+        return replicas.begin(request)
+
+    def finish(self, request, response, state):
+        replicas.end(response, state)
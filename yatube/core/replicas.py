@@ -0,0 +1,153 @@
+"""Чтение с реплик и запись в основную базу.
+
+ReplicaMiddleware отмечает запросы, которым можно читать с реплики:
+безопасные методы без свежей записи этого клиента. ReplicaRouter
+отправляет такие чтения на одну из здоровых реплик из
+DATABASE_REPLICAS, а всё остальное — в default.
+
+Как только запрос что-то пишет (создание поста, комментарий, подписка
+и любая другая запись, включая сохранение сессии), его оставшиеся
+чтения идут в default, а клиент получает cookie, которая на
+REPLICA_PIN_SECONDS закрепляет за ним основную базу: так он видит
+собственные записи, даже пока реплика отстаёт.
+
+Отставание каждой реплики проверяется не чаще раза в
+REPLICA_LAG_CHECK_INTERVAL секунд; реплика, которая отстала больше
+REPLICA_MAX_LAG или не отвечает, не используется до следующей
+проверки.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings as s
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Реплика, с которой уже идёт переигрывание WAL, отстаёт на время с
+# последней переигранной транзакции; если переигрывать нечего, она
+# догнала основную базу, как бы давно ни была последняя запись.
+POSTGRES_LAG_SQL = '''
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery()
+            OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+        THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+'''
+
+
+class Routing:
+    """Состояние одного запроса; общее для потоков его async-view."""
+
+    __slots__ = ('allowed', 'alias', 'wrote')
+
+    def __init__(self, allowed):
+        self.allowed = allowed
+        self.alias = None
+        self.wrote = False
+
+    def replica(self):
+        if self.alias is None:
+            self.alias = choose_replica() or DEFAULT_DB_ALIAS
+        return self.alias
+
+
+_routing = contextvars.ContextVar('replica_routing', default=None)
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def replica_lag(alias):
+    """Отставание реплики в секундах."""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(POSTGRES_LAG_SQL)
+        return float(cursor.fetchone()[0] or 0)
+
+
+def is_healthy(alias):
+    now = time.monotonic()
+    with _health_lock:
+        checked = _health.get(alias)
+    if checked and now - checked[0] < s.REPLICA_LAG_CHECK_INTERVAL:
+        return checked[1]
+    try:
+        lag = replica_lag(alias)
+    except DatabaseError:
+        logger.warning('Реплика %s недоступна', alias, exc_info=True)
+        healthy = False
+    else:
+        healthy = lag <= s.REPLICA_MAX_LAG
+        if not healthy:
+            logger.warning('Реплика %s отстаёт на %.1f с', alias, lag)
+    with _health_lock:
+        _health[alias] = (now, healthy)
+    return healthy
+
+
+def reset_health():
+    with _health_lock:
+        _health.clear()
+
+
+def choose_replica():
+    healthy = [alias for alias in s.DATABASE_REPLICAS if is_healthy(alias)]
+    return random.choice(healthy) if healthy else None
+
+
+def is_pinned(request):
+    try:
+        until = float(request.COOKIES.get(s.REPLICA_PIN_COOKIE, 0))
+    except ValueError:
+        return False
+    return until > time.time()
+
+
+def begin(request):
+    allowed = request.method in SAFE_METHODS and not is_pinned(request)
+    state = Routing(allowed)
+    return state, _routing.set(state)
+
+
+def end(response, context):
+    state, token = context
+    _routing.reset(token)
+    if state.wrote:
+        response.set_cookie(
+            s.REPLICA_PIN_COOKIE,
+            str(int(time.time() + s.REPLICA_PIN_SECONDS)),
+            max_age=s.REPLICA_PIN_SECONDS,
+            httponly=True,
+            samesite='Lax',
+        )
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.allowed or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.replica()
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in s.DATABASE_REPLICAS
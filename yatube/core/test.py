@@ -1,6 +1,29 @@
+import json
+import threading
+import time
 from http import HTTPStatus
+from unittest import mock, skipUnless
 
-from django.test import TestCase
+from django.conf import settings as s
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings,
+)
+from django.template.base import Template
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+from . import checks, connections as pooling, metrics, replicas
+from .metrics import REGISTRY
+from .middleware import ReplicaMiddleware, RequestMetricsMiddleware
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +31,361 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class CacheCheckTest(SimpleTestCase):
+    def test_long_timeouts_need_shared_cache(self):
+        with override_settings(PAGE_CACHE_TIMEOUT=3600):
+            errors = checks.check_local_cache_timeouts(None)
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+        self.assertIn('PAGE_CACHE_TIMEOUT', errors[0].msg)
+        shared = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/tmp/yatube-check-cache',
+        }}
+        with override_settings(CACHES=shared, PAGE_CACHE_TIMEOUT=3600):
+            self.assertEqual(checks.check_local_cache_timeouts(None), [])
+
+    def test_default_settings_pass(self):
+        self.assertEqual(checks.check_local_cache_timeouts(None), [])
+
+
+@override_settings(
+    METRICS_ENABLED=True, METRICS_TEMPLATES=True, METRICS_SAMPLE_RATE=1,
+    METRICS_TOKEN='secret-token',
+)
+class RequestMetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        REGISTRY.clear()
+
+    def observed(self, metric, view):
+        return REGISTRY[metric].values.get((view,))
+
+    def test_page_is_measured(self):
+        with self.assertLogs('yatube.metrics', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        queries = self.observed('yatube_db_queries', 'posts:index')
+        self.assertEqual(queries[-1], 1)
+        self.assertGreater(queries[-2], 0)
+        templates = self.observed(
+            'yatube_template_duration_seconds', 'posts:index'
+        )
+        self.assertGreater(templates[-2], 0)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'posts:index')
+        self.assertEqual(line['status'], HTTPStatus.OK)
+        self.assertEqual(line['queries'], queries[-2])
+
+    def test_api_view_name(self):
+        self.client.force_login(self.user)
+        self.client.get('/api/v1/groups/')
+        self.assertIsNotNone(
+            self.observed('yatube_request_duration_seconds', 'groups-list')
+        )
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_request_is_only_counted(self):
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            REGISTRY['yatube_requests_total'].values,
+            {('posts:index', 'GET', HTTPStatus.OK): 1},
+        )
+        self.assertIsNone(
+            self.observed('yatube_request_duration_seconds', 'posts:index')
+        )
+
+    def test_exposition(self):
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret-token'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        text = response.content.decode()
+        self.assertIn('# TYPE yatube_db_queries histogram', text)
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 1',
+            text,
+        )
+        self.assertIn(
+            'yatube_db_queries_bucket{view="posts:index",le="+Inf"} 1', text
+        )
+
+    def test_large_values_are_exact(self):
+        registry = metrics.Registry(
+            metrics.Counter('big_total', 'Много.', ('kind',))
+        )
+        registry['big_total'].inc(('int',), 1234567)
+        registry['big_total'].inc(('float',), 1234567.125)
+        text = registry.render()
+        self.assertIn('big_total{kind="int"} 1234567\n', text)
+        self.assertIn('big_total{kind="float"} 1234567.125\n', text)
+
+    def test_exposition_is_private(self):
+        url = reverse('metrics')
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'},
+                        {'HTTP_AUTHORIZATION': 'secret-token'}):
+            with self.subTest(headers=headers):
+                response = self.client.get(url, REMOTE_ADDR='127.0.0.1',
+                                           **headers)
+                self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        with override_settings(METRICS_TOKEN=''):
+            response = self.client.get(url, HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
+
+    def test_disabled(self):
+        with override_settings(METRICS_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                RequestMetricsMiddleware(lambda request: None)
+            self.assertIs(Template.render, metrics._render)
+            self.assertNotIn(
+                metrics.record_query, connections['default'].execute_wrappers
+            )
+            response = self.client.get(reverse('metrics'))
+            self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIs(Template.render, metrics._timed_render)
+        with override_settings(METRICS_TEMPLATES=False):
+            self.assertIs(Template.render, metrics._render)
+
+
+@override_settings(DATABASE_REPLICAS=['replica0', 'replica1'])
+class ReplicaRoutingTest(SimpleTestCase):
+    def setUp(self):
+        replicas.reset_health()
+        self.factory = RequestFactory()
+        self.router = replicas.ReplicaRouter()
+        lag = mock.patch.object(replicas, 'replica_lag', return_value=0)
+        self.lag = lag.start()
+        self.addCleanup(lag.stop)
+
+    def route(self, request, write=False):
+        """Базы, куда роутер отправил чтение до и после записи."""
+        used = []
+
+        def view(request):
+            used.append(self.router.db_for_read(Post))
+            if write:
+                self.router.db_for_write(Post)
+                used.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view)(request)
+        return used, response
+
+    def test_get_reads_from_replica(self):
+        used, response = self.route(self.factory.get('/'))
+        self.assertIn(used[0], s.DATABASE_REPLICAS)
+        self.assertNotIn(s.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_write_pins_client_to_primary(self):
+        used, response = self.route(self.factory.get('/'), write=True)
+        self.assertEqual(used[1], 'default')
+        cookie = response.cookies[s.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], s.REPLICA_PIN_SECONDS)
+        request = self.factory.get('/')
+        request.COOKIES[s.REPLICA_PIN_COOKIE] = cookie.value
+        used, _ = self.route(request)
+        self.assertEqual(used, ['default'])
+
+    def test_expired_pin_is_ignored(self):
+        request = self.factory.get('/')
+        request.COOKIES[s.REPLICA_PIN_COOKIE] = str(int(time.time()) - 1)
+        used, _ = self.route(request)
+        self.assertIn(used[0], s.DATABASE_REPLICAS)
+
+    def test_unsafe_method_uses_primary(self):
+        used, response = self.route(self.factory.post('/'), write=True)
+        self.assertEqual(used, ['default', 'default'])
+        self.assertIn(s.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_lagging_replica_is_skipped(self):
+        self.lag.side_effect = lambda alias: {'replica0': 60}.get(alias, 0)
+        for _ in range(10):
+            used, _ = self.route(self.factory.get('/'))
+            self.assertEqual(used, ['replica1'])
+
+    def test_falls_back_to_primary(self):
+        self.lag.side_effect = DatabaseError
+        used, _ = self.route(self.factory.get('/'))
+        self.assertEqual(used, ['default'])
+        self.assertEqual(self.lag.call_count, 2)
+        self.route(self.factory.get('/'))
+        self.assertEqual(self.lag.call_count, 2)
+
+    def test_outside_request_uses_primary(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertFalse(self.router.allow_migrate('replica0', 'posts'))
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+
+
+@skipUnless(s.DATABASE_REPLICAS, 'реплики задаются через DB_REPLICAS')
+class ReplicaDatabaseTest(TransactionTestCase):
+    """Запуск: DB_REPLICAS=<тот же адрес> ./manage.py test core."""
+
+    databases = '__all__'
+
+    def setUp(self):
+        replicas.reset_health()
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.client.force_login(self.user)
+        self.replica = connections[s.DATABASE_REPLICAS[0]]
+
+    # Без параллельных запросов async-view все чтения идут из этого
+    # потока и видны CaptureQueriesContext.
+    @override_settings(ASYNC_PARALLEL_QUERIES=False)
+    def test_reads_and_read_your_writes(self):
+        with override_settings(DATABASE_REPLICAS=s.DATABASE_REPLICAS[:1]):
+            with CaptureQueriesContext(self.replica) as queries:
+                self.client.get(reverse('posts:index'))
+            self.assertTrue(queries)
+            response = self.client.post(
+                reverse('posts:post_create'), {'text': 'Новый пост'}
+            )
+            self.assertIn(s.REPLICA_PIN_COOKIE, response.cookies)
+            with CaptureQueriesContext(self.replica) as queries:
+                response = self.client.get(
+                    reverse('posts:profile', args=[self.user.username])
+                )
+            self.assertFalse(queries)
+            self.assertContains(response, 'Новый пост')
+
+
+class FakeConnection:
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.closed = False
+
+    def cursor(self):
+        if self.broken:
+            raise DatabaseError('server closed the connection')
+        return mock.Mock()
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def setUp(self):
+        self.pool = pooling.ConnectionPool(
+            'test_pool', size=2, timeout=0.05, check_idle=30
+        )
+
+    def test_reuses_returned_connection(self):
+        first = self.pool.checkout(FakeConnection)
+        self.pool.checkin(first)
+        self.assertIs(self.pool.checkout(FakeConnection), first)
+        stats = self.pool.stats()
+        self.assertEqual(stats['opened'], 1)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['saturation'], 0.5)
+
+    def test_waits_for_free_connection(self):
+        held = [self.pool.checkout(FakeConnection) for _ in range(2)]
+        self.pool.timeout = 1
+        timer = threading.Timer(0.01, self.pool.checkin, held[:1])
+        timer.start()
+        self.assertIs(self.pool.checkout(FakeConnection), held[0])
+        timer.join()
+
+    def test_timeout(self):
+        for _ in range(2):
+            self.pool.checkout(FakeConnection)
+        with self.assertRaises(pooling.PoolTimeout):
+            self.pool.checkout(FakeConnection)
+        self.assertEqual(self.pool.stats()['timeouts'], 1)
+        self.assertIn(
+            'yatube_db_pool_timeouts_total{alias="test_pool"} 1',
+            REGISTRY.render(),
+        )
+
+    def test_timeout_metric_is_written_outside_pool_lock(self):
+        for _ in range(2):
+            self.pool.checkout(FakeConnection)
+        acquired = []
+
+        def inc(*args):
+            # Другой поток, как Registry.render, должен получить пул.
+            thread = threading.Thread(target=lambda: acquired.append(
+                self.pool.condition.acquire(timeout=1)
+                and self.pool.condition.release() is None
+            ))
+            thread.start()
+            thread.join()
+
+        with mock.patch.object(pooling.POOL_TIMEOUTS, 'inc', inc):
+            with self.assertRaises(pooling.PoolTimeout):
+                self.pool.checkout(FakeConnection)
+        self.assertEqual(acquired, [True])
+
+    def test_gauges_are_collected_outside_registry_lock(self):
+        locked = []
+        stats = self.pool.stats
+
+        def checked_stats():
+            locked.append(REGISTRY.lock.locked())
+            return stats()
+
+        with mock.patch.dict(pooling._pools, {'test_pool': self.pool}), \
+                mock.patch.object(self.pool, 'stats', checked_stats):
+            REGISTRY.render()
+        self.assertTrue(locked)
+        self.assertNotIn(True, locked)
+
+    def test_discarded_connection_frees_slot(self):
+        broken = self.pool.checkout(FakeConnection)
+        self.pool.checkin(broken, discard=True)
+        self.assertTrue(broken.closed)
+        self.assertIsNot(self.pool.checkout(FakeConnection), broken)
+        self.assertEqual(self.pool.stats()['opened'], 1)
+
+    def test_idle_connection_is_checked(self):
+        self.pool.check_idle = 0
+        broken = self.pool.checkout(lambda: FakeConnection(broken=True))
+        self.pool.checkin(broken)
+        connection = self.pool.checkout(FakeConnection)
+        self.assertIsNot(connection, broken)
+        self.assertTrue(broken.closed)
+        self.assertEqual(self.pool.stats()['opened'], 1)
+
+    def test_changed_params_close_old_connections(self):
+        old = self.pool.checkout(FakeConnection, {'database': 'old'})
+        self.pool.checkin(old, params={'database': 'old'})
+        new = self.pool.checkout(FakeConnection, {'database': 'new'})
+        self.assertIsNot(new, old)
+        self.assertTrue(old.closed)
+        self.assertEqual(self.pool.stats()['opened'], 1)
+
+    def test_metrics(self):
+        with mock.patch.dict(pooling._pools, {'test_pool': self.pool}):
+            self.pool.checkout(FakeConnection)
+            metrics = REGISTRY.render()
+        self.assertIn('yatube_db_pool_in_use{alias="test_pool"} 1', metrics)
+        self.assertIn(
+            'yatube_db_pool_saturation{alias="test_pool"} 0.5', metrics
+        )
+        self.assertIn(
+            'yatube_db_pool_wait_seconds_count{alias="test_pool"}', metrics
+        )
+
+
+class IdleConnectionCheckTest(TransactionTestCase):
+    def test_broken_connection_is_closed(self):
+        connection = connections['default']
+        connection.ensure_connection()
+        connection.last_used = time.monotonic() - s.DB_HEALTH_CHECK_IDLE - 1
+        with mock.patch.object(connection, 'is_usable', return_value=False), \
+                mock.patch.object(connection, 'close') as close:
+            pooling.check_idle_connections()
+        close.assert_called_once_with()
+        pooling.mark_used()
+        self.assertLess(time.monotonic() - connection.last_used, 1)
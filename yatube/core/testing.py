@@ -0,0 +1,137 @@
+"""Бюджеты SQL-запросов для тестов.
+
+QUERY_BUDGETS — потолок числа запросов на один ответ для каждого
+именованного адреса posts.urls, users.urls и api.urls; ключ — имя для
+reverse(). Если новое поле или шаблон добавляют запрос, бюджет меняют
+здесь осознанно, вместе с изменением.
+
+QueryBudgetMixin.assertQueryBudget гоняет адрес при нескольких объёмах
+данных и размерах страницы и падает, если запросов больше бюджета или
+при том же размере страницы их число растёт с объёмом — так выглядит
+N+1.
+"""
+from contextlib import contextmanager
+
+from django.conf import settings as s
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLResolver
+
+VOLUMES = (1, 10, 30)
+PAGE_SIZES = (2, 10)
+
+QUERY_BUDGETS = {
+    # posts.urls
+    'posts:index': 2,
+    'posts:group_list': 3,
+    'posts:profile': 3,
+    'posts:post_detail': 4,
+    'posts:post_create': 11,
+    'posts:post_edit': 10,
+    'posts:add_comment': 7,
+    'posts:follow_index': 5,
+    # Подписка и отписка проверяют, не перешёл ли автор порог
+    # FEED_CELEBRITY_THRESHOLD (posts.feed.followers_changed).
+    'posts:profile_follow': 14,
+    'posts:profile_unfollow': 10,
+    # users.urls
+    'users:signup': 6,
+    'users:login': 9,
+    'users:logout': 4,
+    'users:password_change_form': 2,
+    'users:password_change_done': 2,
+    'users:password_reset_form': 1,
+    'users:password_reset_done': 0,
+    'users:password_reset_confirm': 5,
+    'users:password_reset_complete': 0,
+    # api.urls
+    'api-root': 0,
+    'authtoken': 5,
+    'export': 1,
+    'posts-list': 7,
+    'posts-detail': 8,
+    # Пакеты в тестах по три объекта; без INSERT ... RETURNING (SQLite)
+    # каждый вставляется отдельным запросом.
+    'posts-batch': 18,
+    'posts-sync': 2,
+    'comments-list': 5,
+    'comments-detail': 5,
+    'comments-batch': 7,
+    'comments-sync': 3,
+    'groups-list': 1,
+    'groups-detail': 1,
+    'search-list': 2,
+}
+
+
+def url_names(patterns, namespace=''):
+    """Имена всех адресов списка ``urlpatterns`` с пространствами имён."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = namespace
+            if pattern.namespace:
+                prefix += pattern.namespace + ':'
+            yield from url_names(pattern.url_patterns, prefix)
+        elif pattern.name:
+            yield namespace + pattern.name
+
+
+@contextmanager
+def rolled_back():
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+class QueryBudgetMixin:
+    """Для TestCase. Класс определяет ``grow(start, stop)``, который
+    добавляет объекты с номерами ``start``..``stop - 1``: посты,
+    комментарии, подписки — всё, что выводят проверяемые адреса."""
+
+    def count_queries(self, request, *args):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = request(*args)
+        return response, [query['sql'] for query in queries]
+
+    def assertQueryBudget(self, name, request, setup=None, paged=False):
+        """``request(page_size, *setup())`` выполняет запрос к адресу
+        ``name``; ``setup`` готовит для него свежие объекты вне замера,
+        ``paged`` включает перебор PAGE_SIZES. Данные, созданные по
+        ходу, откатываются."""
+        budget = QUERY_BUDGETS[name]
+        runs = []
+        with rolled_back():
+            grown = 0
+            for volume in VOLUMES:
+                self.grow(grown, volume)
+                grown = volume
+                for page_size in PAGE_SIZES if paged else (None,):
+                    args = setup() if setup else ()
+                    with override_settings(
+                        OBJECTS_PER_PAGE=page_size or s.OBJECTS_PER_PAGE
+                    ):
+                        response, queries = self.count_queries(
+                            request, page_size, *args
+                        )
+                    self.assertLess(
+                        response.status_code, 400, f'{name}: {response}'
+                    )
+                    runs.append((volume, page_size, queries))
+        first = {}
+        for volume, page_size, queries in runs:
+            first.setdefault(page_size, len(queries))
+            listing = '\n'.join(queries)
+            with self.subTest(name=name, volume=volume, page_size=page_size):
+                self.assertLessEqual(
+                    len(queries), budget,
+                    f'{name}: {len(queries)} запросов при бюджете '
+                    f'{budget}:\n{listing}',
+                )
+                self.assertLessEqual(
+                    len(queries), first[page_size],
+                    f'{name}: число запросов растёт с объёмом '
+                    f'({first[page_size]} → {len(queries)}):\n{listing}',
+                )
+        return runs
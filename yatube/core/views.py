@@ -1,4 +1,10 @@
+from django.conf import settings as s
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .metrics import REGISTRY
 
 
 def page_not_found(request, exception):
@@ -15,3 +21,22 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def _has_metrics_token(request):
+    scheme, _, token = request.META.get(
+        'HTTP_AUTHORIZATION', ''
+    ).partition(' ')
+    return bool(s.METRICS_TOKEN) and scheme == 'Bearer' and (
+        constant_time_compare(token, s.METRICS_TOKEN)
+    )
+
+
+def metrics(request):
+    if not s.METRICS_ENABLED:
+        raise Http404
+    if not request.user.is_staff and not _has_metrics_token(request):
+        raise PermissionDenied
+    return HttpResponse(
+        REGISTRY.render(), content_type='text/plain; version=0.0.4'
+    )
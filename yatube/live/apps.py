@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class LiveConfig(AppConfig):
+    name = 'live'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,182 @@
+"""ASGI-приложение потоков Server-Sent Events.
+
+Адреса под ``/events/`` обслуживаются здесь, всё остальное уходит в
+Django. Каждое подключение — подписка у брокера и одна корутина, без
+потока на клиента, поэтому один процесс держит тысячи подключений.
+
+- ``/events/posts/`` — все новые посты;
+- ``/events/group/<slug>/`` — посты группы;
+- ``/events/profile/<username>/`` — посты автора;
+- ``/events/follow/`` — посты авторов, на которых подписан пользователь;
+- ``/events/posts/<id>/`` — комментарии к посту.
+"""
+import asyncio
+import re
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings as s
+from django.contrib import auth
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from posts.models import Follow, Group, Post
+from .broker import get_broker
+
+HEADERS = [
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+]
+PING = b': ping\n\n'
+
+
+class Refused(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _posts(request):
+    return ['posts']
+
+
+def _group(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return [f'group:{group.slug}']
+
+
+def _profile(request, username):
+    author = get_object_or_404(auth.get_user_model(), username=username)
+    return [f'author:{author.username}']
+
+
+def _follow(request):
+    """Подписки читаются при подключении; новые подписки подхватит
+    переподключение клиента."""
+    request.session = import_module(s.SESSION_ENGINE).SessionStore(
+        request.COOKIES.get(s.SESSION_COOKIE_NAME)
+    )
+    user = auth.get_user(request)
+    if not user.is_authenticated:
+        raise Refused(403, 'Нужна авторизация')
+    usernames = Follow.objects.filter(user=user).values_list(
+        'author__username', flat=True
+    )
+    return [f'author:{username}' for username in usernames]
+
+
+def _comments(request, post_id):
+    post = get_object_or_404(Post, id=post_id)
+    return [f'post:{post.id}']
+
+
+ROUTES = [
+    (re.compile(r'^posts/$'), _posts),
+    (re.compile(r'^group/(?P<slug>[-\w]+)/$'), _group),
+    (re.compile(r'^profile/(?P<username>[\w.@+-]+)/$'), _profile),
+    (re.compile(r'^follow/$'), _follow),
+    (re.compile(r'^posts/(?P<post_id>\d+)/$'), _comments),
+]
+
+
+def resolve(request, path):
+    for pattern, handler in ROUTES:
+        match = pattern.match(path)
+        if match is None:
+            continue
+        try:
+            return handler(request, **match.groupdict())
+        except Http404:
+            raise Refused(404, 'Не найдено')
+    raise Refused(404, 'Не найдено')
+
+
+class EventStreamApp:
+    def __init__(self, application, prefix='/events/'):
+        self.application = application
+        self.prefix = prefix
+        self.connections = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith(
+            self.prefix
+        ):
+            return await self.application(scope, receive, send)
+        if scope['method'] != 'GET':
+            return await self.refuse(send, 405, 'Только GET')
+        if self.connections >= s.LIVE_MAX_CONNECTIONS:
+            return await self.refuse(send, 503, 'Слишком много подключений')
+        request = ASGIRequest(scope, None)
+        path = scope['path'][len(self.prefix):]
+        try:
+            channels = await sync_to_async(resolve)(request, path)
+        except Refused as error:
+            return await self.refuse(send, error.status, str(error))
+        self.connections += 1
+        try:
+            await self.stream(channels, receive, send)
+        finally:
+            self.connections -= 1
+
+    async def refuse(self, send, status, message):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'text/plain; charset=utf-8')],
+        })
+        await send({'type': 'http.response.body', 'body': message.encode()})
+
+    async def wait_disconnect(self, receive, subscription):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        # Сам None может вытесниться из полной очереди, флаг — нет.
+        subscription.closed = True
+        subscription.put(None)
+
+    def heartbeat(self, subscription):
+        """Комментарий-пинг, если за период ничего не отправлялось:
+        прокси не закрывают простаивающее соединение."""
+        if subscription.quiet:
+            subscription.put(PING)
+        subscription.quiet = True
+        return subscription.loop.call_later(
+            s.LIVE_HEARTBEAT, self.heartbeat, subscription
+        )
+
+    async def stream(self, channels, receive, send):
+        # Отключение и пинги приходят в ту же очередь, что и события,
+        # поэтому на событие приходится одно ожидание очереди.
+        broker = get_broker()
+        subscription = broker.subscribe(channels)
+        disconnected = asyncio.ensure_future(
+            self.wait_disconnect(receive, subscription)
+        )
+        timer = self.heartbeat(subscription)
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': HEADERS,
+            })
+            await send({
+                'type': 'http.response.body',
+                'body': f'retry: {s.LIVE_RETRY_MS}\n\n'.encode(),
+                'more_body': True,
+            })
+            while True:
+                # Всё, что накопилось, уходит одной записью в сокет.
+                messages = [await subscription.get(), *subscription.drain()]
+                if subscription.closed:
+                    break
+                subscription.quiet = False
+                await send({
+                    'type': 'http.response.body',
+                    'body': b''.join(messages),
+                    'more_body': True,
+                })
+        finally:
+            broker.unsubscribe(subscription)
+            timer.cancel()
+            disconnected.cancel()
@@ -0,0 +1,164 @@
+"""Брокеры событий для потоков SSE.
+
+Публикуют из синхронного кода Django (обработчики сигналов, любые
+потоки), а подписки живут в цикле событий ASGI-сервера. Сообщение —
+готовый кадр SSE в байтах: он кодируется один раз при публикации, а не
+для каждого подписчика.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings as s
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class Subscription:
+    """Очередь одного подключения. Медленный клиент теряет самые старые
+    события, а не задерживает публикацию для остальных."""
+
+    def __init__(self, channels, maxsize):
+        self.channels = frozenset(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self.quiet = True
+        self.closed = False
+
+    def put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def drain(self):
+        messages = []
+        while not self.queue.empty():
+            messages.append(self.queue.get_nowait())
+        return messages
+
+
+def _deliver(subscriptions, message):
+    for subscription in subscriptions:
+        subscription.put(message)
+
+
+class LocalBroker:
+    """Pub/sub внутри процесса: публикация и подписчики в одном процессе."""
+
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size or s.LIVE_QUEUE_SIZE
+        self.lock = threading.Lock()
+        self.channels = {}
+
+    def subscribe(self, channels):
+        subscription = Subscription(channels, self.queue_size)
+        with self.lock:
+            for channel in subscription.channels:
+                self.channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                subscribers = self.channels.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.channels[channel]
+
+    @property
+    def active(self):
+        """Есть ли кому доставлять: без подписчиков событие не собираем."""
+        return bool(self.channels)
+
+    def subscribers(self):
+        with self.lock:
+            return len(set().union(*self.channels.values()))
+
+    def publish(self, channels, message):
+        with self.lock:
+            targets = set().union(
+                *(self.channels.get(channel, ()) for channel in channels)
+            )
+        if not targets:
+            return 0
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        # Один вызов call_soon_threadsafe на цикл, а не на подписчика:
+        # тысячи подключений одного сервера будят его цикл один раз.
+        by_loop = defaultdict(list)
+        for subscription in targets:
+            by_loop[subscription.loop].append(subscription)
+        for loop, subscriptions in by_loop.items():
+            if loop is running:
+                _deliver(subscriptions, message)
+                continue
+            try:
+                loop.call_soon_threadsafe(_deliver, subscriptions, message)
+            except RuntimeError:
+                for subscription in subscriptions:
+                    self.unsubscribe(subscription)
+        return len(targets)
+
+
+class RedisBroker(LocalBroker):
+    """Pub/sub через Redis для нескольких процессов и серверов.
+
+    Все события идут одним каналом Redis, каждый процесс раздаёт их
+    своим подписчикам как LocalBroker.
+    """
+
+    def __init__(self, queue_size=None, url=None):
+        if redis is None:
+            raise ImproperlyConfigured('Для RedisBroker установите redis')
+        super().__init__(queue_size)
+        self.url = url or s.LIVE_REDIS_URL
+        self.client = redis.Redis.from_url(self.url)
+        self.listeners = {}
+
+    @property
+    def active(self):
+        return True
+
+    def subscribe(self, channels):
+        loop = asyncio.get_running_loop()
+        if loop not in self.listeners:
+            self.listeners[loop] = loop.create_task(self.listen())
+        return super().subscribe(channels)
+
+    def publish(self, channels, message):
+        self.client.publish(
+            s.LIVE_REDIS_CHANNEL,
+            json.dumps([list(channels), message.decode()]),
+        )
+
+    async def listen(self):
+        from redis import asyncio as aioredis
+
+        pubsub = aioredis.Redis.from_url(self.url).pubsub()
+        await pubsub.subscribe(s.LIVE_REDIS_CHANNEL)
+        async for item in pubsub.listen():
+            if item['type'] != 'message':
+                continue
+            channels, message = json.loads(item['data'])
+            super().publish(channels, message.encode())
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(s.LIVE_BROKER)()
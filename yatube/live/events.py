@@ -0,0 +1,68 @@
+"""События о новых постах и комментариях и каналы, в которые они идут.
+
+Каналы названы так же, как области кеша: ``posts``, ``group:<slug>``,
+``author:<username>`` и ``post:<id>`` для комментариев.
+"""
+import json
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from posts.models import Comment, Post
+from .broker import get_broker
+
+PREVIEW_LENGTH = 200
+
+
+def post_channels(username, group_slug=None):
+    channels = ['posts', f'author:{username}']
+    if group_slug:
+        channels.append(f'group:{group_slug}')
+    return channels
+
+
+def frame(event, data):
+    """Кадр SSE; ``sent`` нужен клиентам и стенду для замера задержки."""
+    payload = json.dumps(
+        {**data, 'sent': time.time()},
+        cls=DjangoJSONEncoder,
+        ensure_ascii=False,
+        separators=(',', ':'),
+    )
+    return (
+        f'id: {event}-{data["id"]}\nevent: {event}\ndata: {payload}\n\n'
+    ).encode()
+
+
+def publish_posts(posts):
+    broker = get_broker()
+    if not broker.active:
+        return
+    rows = Post.objects.filter(
+        id__in=[post.id for post in posts]
+    ).values_list('id', 'text', 'pub_date', 'author__username', 'group__slug')
+    for pk, text, pub_date, username, slug in rows:
+        broker.publish(post_channels(username, slug), frame('post', {
+            'id': pk,
+            'text': text[:PREVIEW_LENGTH],
+            'pub_date': pub_date,
+            'author': username,
+            'group': slug,
+        }))
+
+
+def publish_comments(comments):
+    broker = get_broker()
+    if not broker.active:
+        return
+    rows = Comment.objects.filter(
+        id__in=[comment.id for comment in comments]
+    ).values_list('id', 'post_id', 'text', 'created', 'author__username')
+    for pk, post_id, text, created, username in rows:
+        broker.publish([f'post:{post_id}'], frame('comment', {
+            'id': pk,
+            'post': post_id,
+            'text': text[:PREVIEW_LENGTH],
+            'created': created,
+            'author': username,
+        }))
@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from posts.models import Comment, Post
+from posts.signals import bulk_created
+from . import events
+
+
+@receiver(post_save, sender=Post)
+def publish_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: events.publish_posts([instance]))
+
+
+@receiver(post_save, sender=Comment)
+def publish_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: events.publish_comments([instance]))
+
+
+@receiver(bulk_created, sender=Post)
+def publish_created_posts(sender, objects, **kwargs):
+    transaction.on_commit(lambda: events.publish_posts(objects))
+
+
+@receiver(bulk_created, sender=Comment)
+def publish_created_comments(sender, objects, **kwargs):
+    transaction.on_commit(lambda: events.publish_comments(objects))
@@ -0,0 +1,15 @@
+from django import template
+from django.conf import settings as s
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/live.html')
+def live_updates(event, message, *path):
+    """Баннер «есть новое» по событиям ``event`` потока ``/events/<path>/``."""
+    return {
+        'enabled': s.LIVE_EVENTS,
+        'url': '/events/{}/'.format('/'.join(str(part) for part in path)),
+        'event': event,
+        'message': message,
+    }
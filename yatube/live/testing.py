@@ -0,0 +1,60 @@
+"""Клиент потоков SSE поверх ASGI-приложения без сети: для тестов и
+стенда ``benchmarks.live``."""
+import asyncio
+
+
+class StreamClient:
+    def __init__(self, app, path, headers=()):
+        self.incoming = asyncio.Queue()
+        self.sent = asyncio.Queue()
+        self.buffer = b''
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'root_path': '',
+            'query_string': b'',
+            'headers': [(b'host', b'testserver'), *headers],
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+        self.task = asyncio.ensure_future(
+            app(scope, self.incoming.get, self.sent.put)
+        )
+
+    async def start(self, timeout=5):
+        """Ждёт начала ответа и возвращает его статус."""
+        message = await asyncio.wait_for(self.sent.get(), timeout)
+        self.status = message['status']
+        self.headers = dict(message['headers'])
+        if self.status == 200:
+            await self.read(timeout)
+        return self.status
+
+    async def read(self, timeout=5):
+        message = await asyncio.wait_for(self.sent.get(), timeout)
+        self.buffer += message.get('body', b'')
+        return message
+
+    async def event(self, timeout=5):
+        """Следующее событие как (тип, данные JSON строкой)."""
+        while b'\n\n' not in self.buffer:
+            await self.read(timeout)
+        while True:
+            block, self.buffer = self.buffer.split(b'\n\n', 1)
+            fields = dict(
+                line.split(': ', 1)
+                for line in block.decode().splitlines()
+                if ': ' in line and not line.startswith(':')
+            )
+            if 'data' in fields:
+                return fields.get('event', 'message'), fields['data']
+            while b'\n\n' not in self.buffer:
+                await self.read(timeout)
+
+    async def close(self, timeout=5):
+        await self.incoming.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(self.task, timeout)
@@ -0,0 +1,155 @@
+import asyncio
+import json
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from .asgi import EventStreamApp
+from .broker import LocalBroker, get_broker
+from .testing import StreamClient
+
+User = get_user_model()
+
+
+async def django_stub(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': 204,
+                'headers': []})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+class EventStreamTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.other = Group.objects.create(
+            title='Другая', slug='other', description='Описание'
+        )
+        self.app = EventStreamApp(django_stub)
+
+    def create(self, model, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return model.objects.create(**fields)
+
+    def run_async(self, scenario):
+        async_to_sync(scenario)()
+
+    def test_post_reaches_matching_streams(self):
+        async def scenario():
+            streams = {
+                path: StreamClient(self.app, path)
+                for path in (
+                    '/events/posts/',
+                    '/events/group/group/',
+                    '/events/profile/author/',
+                    '/events/group/other/',
+                )
+            }
+            for client in streams.values():
+                self.assertEqual(await client.start(), 200)
+            post = await sync_to_async(self.create)(
+                Post, author=self.author, group=self.group, text='Новый пост'
+            )
+            for path in list(streams)[:3]:
+                event, data = await streams[path].event()
+                self.assertEqual(event, 'post')
+                payload = json.loads(data)
+                self.assertEqual(payload['id'], post.id)
+                self.assertEqual(payload['author'], 'author')
+                self.assertEqual(payload['group'], 'group')
+            with self.assertRaises(asyncio.TimeoutError):
+                await streams['/events/group/other/'].event(timeout=0.2)
+            for client in streams.values():
+                await client.close()
+
+        self.run_async(scenario)
+        self.assertFalse(get_broker().active)
+
+    def test_comment_stream(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+
+        async def scenario():
+            client = StreamClient(self.app, f'/events/posts/{post.id}/')
+            self.assertEqual(await client.start(), 200)
+            self.assertEqual(
+                client.headers[b'content-type'],
+                b'text/event-stream; charset=utf-8',
+            )
+            await sync_to_async(self.create)(
+                Comment, post=post, author=self.reader, text='Комментарий'
+            )
+            event, data = await client.event()
+            self.assertEqual(event, 'comment')
+            self.assertEqual(json.loads(data)['text'], 'Комментарий')
+            await client.close()
+
+        self.run_async(scenario)
+
+    def test_follow_stream(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        cookie = f'sessionid={self.client.cookies["sessionid"].value}'
+
+        async def scenario():
+            anonymous = StreamClient(self.app, '/events/follow/')
+            self.assertEqual(await anonymous.start(), 403)
+            client = StreamClient(
+                self.app, '/events/follow/', [(b'cookie', cookie.encode())]
+            )
+            self.assertEqual(await client.start(), 200)
+            await sync_to_async(self.create)(
+                Post, author=self.author, text='Для подписчиков'
+            )
+            event, data = await client.event()
+            self.assertEqual(json.loads(data)['text'], 'Для подписчиков')
+            await client.close()
+
+        self.run_async(scenario)
+
+    def test_routing(self):
+        async def scenario():
+            missing = StreamClient(self.app, '/events/group/missing/')
+            self.assertEqual(await missing.start(), 404)
+            page = StreamClient(self.app, '/')
+            self.assertEqual(await page.start(), 204)
+
+        self.run_async(scenario)
+
+
+class LocalBrokerTest(TestCase):
+    def test_slow_subscriber_drops_oldest(self):
+        broker = LocalBroker(queue_size=2)
+
+        async def scenario():
+            subscription = broker.subscribe(['posts', 'author:a'])
+            for index in range(3):
+                self.assertEqual(
+                    broker.publish(['posts', 'author:a'], b'%d' % index), 1
+                )
+            self.assertEqual(subscription.drain(), [b'1', b'2'])
+            self.assertEqual(subscription.dropped, 1)
+            broker.unsubscribe(subscription)
+
+        asyncio.run(scenario())
+        self.assertFalse(broker.active)
+
+
+class LiveBannerTest(TestCase):
+    @override_settings(LIVE_EVENTS=True)
+    def test_banner_subscribes_to_stream(self):
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        response = self.client.get(
+            reverse('posts:group_list', args=[group.slug])
+        )
+        self.assertContains(response, "EventSource('/events/group/group/')")
+
+    def test_banner_disabled_by_default(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'EventSource')
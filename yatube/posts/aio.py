@@ -0,0 +1,77 @@
+"""Помощники для async-view поверх синхронного ORM Django 3.2.
+
+Запросы и рендеринг уходят в потоки. Независимые запросы выполняются
+одновременно в пуле, каждый на соединении своего потока. Внутри
+открытой транзакции (ATOMIC_REQUESTS, тесты) так нельзя: другие
+соединения не видят её изменений. Тогда всё выполняется по очереди в
+потоке, который держит транзакцию.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings as s
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections, connection
+from django.shortcuts import render as render_sync
+
+
+def _in_transaction():
+    return connection.in_atomic_block
+
+
+async def parallel(request):
+    """Можно ли раздать запросы этого запроса по потокам пула."""
+    allowed = getattr(request, '_parallel_queries', None)
+    if allowed is None:
+        allowed = s.ASYNC_PARALLEL_QUERIES and not await sync_to_async(
+            _in_transaction
+        )()
+        request._parallel_queries = allowed
+    return allowed
+
+
+def _pooled(func):
+    """В потоках пула нет request_started/finished, поэтому устаревшие
+    и сломанные соединения закрываются до и после каждого вызова: с
+    пулом соединений (DB_POOL) поток не держит соединение без дела."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper, thread_sensitive=False)
+
+
+async def offload(request, func, *args, **kwargs):
+    """Выполняет синхронный ``func`` вне цикла событий."""
+    if await parallel(request):
+        return await _pooled(func)(*args, **kwargs)
+    return await sync_to_async(func)(*args, **kwargs)
+
+
+async def gather(request, *funcs):
+    """Результаты функций без аргументов, по возможности одновременно."""
+    if not await parallel(request):
+        return [await sync_to_async(func)() for func in funcs]
+    return await asyncio.gather(*(_pooled(func)() for func in funcs))
+
+
+async def render(request, template_name, context=None):
+    return await offload(request, render_sync, request, template_name, context)
+
+
+def login_required(view):
+    """``login_required`` для async-view: пользователь из сессии читается
+    в потоке, а не в цикле событий."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        authenticated = await offload(
+            request, lambda: request.user.is_authenticated
+        )
+        if not authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
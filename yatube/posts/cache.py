@@ -0,0 +1,347 @@
+import asyncio
+import hashlib
+import math
+import random
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings as s
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+from .aio import offload
+
+
+_lock_guard = threading.Lock()
+
+
+class Uncached:
+    """Результат, который нужно отдать, но не сохранять в кеш."""
+
+    def __init__(self, value):
+        self.value = value
+
+
+def _version_key(scope):
+    return f'version:{scope}'
+
+
+def get_versions(scopes):
+    """Текущие версии областей кеша: 'posts', 'group:<slug>' и т.д.
+
+    Версия — момент последнего изменения в наносекундах, поэтому после
+    вытеснения ключа версия не повторит старую и не поднимет
+    устаревшие записи.
+    """
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    now = time.time_ns()
+    cache.set_many(
+        {_version_key(scope): now for scope in scopes},
+        timeout=None,
+    )
+
+
+def make_key(prefix, *parts):
+    raw = ':'.join(str(part) for part in parts)
+    return f'{prefix}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def _is_fresh(entry, versions):
+    entry_versions, _, expires_at, delta = entry
+    if entry_versions != versions:
+        return False
+    # XFetch: чем дороже пересчёт и ближе срок, тем вероятнее, что
+    # запись будет пересчитана заранее одним из запросов.
+    early = delta * s.CACHE_EARLY_EXPIRATION_BETA * -math.log(
+        1 - random.random()
+    )
+    return time.time() + early < expires_at
+
+
+def _lookup(key, scopes):
+    return get_versions(scopes), cache.get(key)
+
+
+def _store(key, versions, value, timeout, delta):
+    cache.set(
+        key,
+        (versions, value, time.time() + timeout, delta),
+        timeout + s.CACHE_STALE_TIMEOUT,
+    )
+
+
+def get_or_compute(key, scopes, compute, timeout):
+    """Значение из кеша или результат ``compute()`` с защитой от давки.
+
+    Запись хранит версии областей, для которых она посчитана. Если версии
+    устарели или срок подходит к концу, пересчитывает только тот запрос,
+    который захватил блокировку, а остальные отдают прежнее значение.
+    Результат, обёрнутый в ``Uncached``, отдаётся без сохранения.
+    """
+    versions, entry = _lookup(key, scopes)
+    if entry is not None and _is_fresh(entry, versions):
+        return entry[1]
+    lock_key = f'lock:{key}'
+    locked = _acquire(lock_key)
+    if not locked:
+        if entry is not None:
+            return entry[1]
+        entry = _wait_for(key, versions)
+        if entry is not None:
+            return entry[1]
+    try:
+        started = time.time()
+        value = compute()
+        if isinstance(value, Uncached):
+            return value.value
+        _store(key, versions, value, timeout, time.time() - started)
+        return value
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+async def get_or_compute_async(key, scopes, compute, timeout):
+    """``get_or_compute`` для корутины ``compute``: обращения к кешу идут
+    в пул потоков, пересчёт — в цикле событий."""
+    def pooled(func):
+        return sync_to_async(func, thread_sensitive=False)
+
+    versions, entry = await pooled(_lookup)(key, scopes)
+    if entry is not None and _is_fresh(entry, versions):
+        return entry[1]
+    lock_key = f'lock:{key}'
+    locked = await pooled(_acquire)(lock_key)
+    if not locked:
+        if entry is not None:
+            return entry[1]
+        entry = await pooled(_wait_for)(key, versions)
+        if entry is not None:
+            return entry[1]
+    try:
+        started = time.time()
+        value = await compute()
+        if isinstance(value, Uncached):
+            return value.value
+        await pooled(_store)(key, versions, value, timeout,
+                             time.time() - started)
+        return value
+    finally:
+        if locked:
+            await pooled(cache.delete)(lock_key)
+
+
+def _acquire(lock_key):
+    # add() файлового кеша не атомарен, поэтому внутри процесса захват
+    # дополнительно сериализуется; между процессами полагаемся на add().
+    with _lock_guard:
+        return cache.add(lock_key, True, s.CACHE_LOCK_TIMEOUT)
+
+
+def _wait_for(key, versions):
+    """Ждёт, пока другой запрос досчитает холодную запись."""
+    deadline = time.time() + s.CACHE_LOCK_WAIT
+    while time.time() < deadline:
+        time.sleep(s.CACHE_LOCK_POLL)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == versions:
+            return entry
+    return None
+
+
+def validators(request, scopes, csrf=False):
+    """ETag и Last-Modified страницы без рендеринга.
+
+    Версии областей меняются при любой правке, удалении или изменении
+    счётчиков, поэтому служат валидатором точнее, чем max(pub_date).
+    Пользователь входит в ETag: шапка и формы у каждого свои. С
+    ``csrf`` для вошедших в него входит и CSRF-секрет: после нового
+    входа секрет другой, и страница с формой не должна отдаваться 304
+    со старым токеном. API это не нужно — клиенты с токеном без cookie
+    получали бы новый ETag на каждый запрос.
+    """
+    versions = get_versions(scopes)
+    parts = [0, *versions]
+    if request.user.is_authenticated:
+        parts[0] = request.user.pk
+    if csrf and request.user.is_authenticated:
+        # get_token заводит секрет, если его ещё нет, и отправит cookie с
+        # ответом — иначе первый же повторный запрос сменил бы ETag.
+        get_token(request)
+        parts.append(request.META['CSRF_COOKIE'])
+    raw = ':'.join(str(part) for part in parts)
+    etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+    return etag, max(versions) // 10 ** 9
+
+
+def _precondition(request, scopes, csrf=False):
+    """Валидаторы страницы и готовый ответ 304/412, если он уже ясен."""
+    etag, last_modified = validators(request, scopes, csrf)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    return etag, last_modified, response
+
+
+def _finish(request, response, etag, last_modified, max_age, vary):
+    pending = getattr(request, 'thumbnails_pending', False)
+    if response.status_code == 200 and not pending:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+    if pending or request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+    patch_vary_headers(response, vary)
+    return response
+
+
+def conditional_response(request, scopes, render, max_age=0,
+                         vary=('Cookie',), csrf=False):
+    """Отвечает 304 по If-None-Match/If-Modified-Since или вызывает
+    ``render()`` и проставляет валидаторы и Cache-Control.
+
+    Анонимным ответам разрешено публичное кеширование на ``max_age``
+    секунд, персональные всегда перепроверяются. ``csrf`` — для
+    HTML-страниц с формами, см. ``validators``.
+    """
+    etag, last_modified, response = _precondition(request, scopes, csrf)
+    if response is None:
+        response = render()
+    return _finish(request, response, etag, last_modified, max_age, vary)
+
+
+def _cacheable(request, response):
+    """Что положить в кеш страниц: тело и тип или ``Uncached``."""
+    if (
+        response.status_code != 200
+        or response.streaming
+        or getattr(request, 'thumbnails_pending', False)
+    ):
+        return Uncached(None)
+    return response.content, response['Content-Type']
+
+
+def _anonymous_response(request, view, args, kwargs, scopes):
+    """Страница для анонимного GET из кеша или свежеотрисованная."""
+    response = None
+
+    def render():
+        nonlocal response
+        response = view(request, *args, **kwargs)
+        return _cacheable(request, response)
+
+    cached = get_or_compute(
+        make_key('page', request.get_full_path()),
+        scopes,
+        render,
+        s.PAGE_CACHE_TIMEOUT,
+    )
+    if response is not None:
+        return response
+    content, content_type = cached
+    return HttpResponse(content, content_type=content_type)
+
+
+async def _anonymous_response_async(request, view, args, kwargs, scopes):
+    response = None
+
+    async def render():
+        nonlocal response
+        response = await view(request, *args, **kwargs)
+        return _cacheable(request, response)
+
+    cached = await get_or_compute_async(
+        make_key('page', request.get_full_path()),
+        scopes,
+        render,
+        s.PAGE_CACHE_TIMEOUT,
+    )
+    if response is not None:
+        return response
+    content, content_type = cached
+    return HttpResponse(content, content_type=content_type)
+
+
+def cached_page(scopes):
+    """Условные GET для всех и кеш страницы для анонимных.
+
+    ``scopes(**kwargs)`` получает аргументы view и возвращает области,
+    от которых зависит страница; пустой список отключает оба механизма.
+    Срок публичного кеширования берётся из CACHE_CONTROL_MAX_AGE по
+    имени view. Для async-view обёртка тоже асинхронная: поток не
+    простаивает, пока view ждёт своих запросов.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            return _cached_async_page(view, scopes)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+            page_scopes = scopes(**kwargs)
+            if not page_scopes:
+                return view(request, *args, **kwargs)
+
+            def render():
+                if request.user.is_authenticated:
+                    return view(request, *args, **kwargs)
+                return _anonymous_response(
+                    request, view, args, kwargs, page_scopes
+                )
+
+            return conditional_response(
+                request, page_scopes, render,
+                max_age=s.CACHE_CONTROL_MAX_AGE.get(view.__name__, 0),
+                csrf=True,
+            )
+        return wrapper
+    return decorator
+
+
+def _cached_async_page(view, scopes):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return await view(request, *args, **kwargs)
+        page_scopes = await offload(request, scopes, **kwargs)
+        if not page_scopes:
+            return await view(request, *args, **kwargs)
+        etag, last_modified, response = await offload(
+            request, _precondition, request, page_scopes, True
+        )
+        if response is None and request.user.is_authenticated:
+            response = await view(request, *args, **kwargs)
+        elif response is None:
+            response = await _anonymous_response_async(
+                request, view, args, kwargs, page_scopes
+            )
+        return _finish(
+            request, response, etag, last_modified,
+            s.CACHE_CONTROL_MAX_AGE.get(view.__name__, 0), ('Cookie',),
+        )
+    return wrapper
+
+
+def post_scopes(post_id, author_username, group_slug=None):
+    scopes = [f'post:{post_id}', f'author:{author_username}']
+    if group_slug:
+        scopes.append(f'group:{group_slug}')
+    return scopes
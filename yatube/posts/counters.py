@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from . import feed
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_user(user_id, field, delta):
+    updated = _change(UserStats.objects.filter(user_id=user_id), field, delta)
+    if not updated and delta > 0:
+        reconcile(User.objects.filter(id=user_id))
+    if field == 'followers_count':
+        feed.followers_changed(user_id)
+
+
+def posts_count(user):
+    """Число постов из UserStats или подсчётом, если строки ещё нет.
+
+    Строку не создаёт сигнал для пользователей из bulk_create, loaddata
+    и raw-сохранений; её доставит ``reconcile``, а страница не падает.
+    """
+    try:
+        return user.stats.posts_count
+    except UserStats.DoesNotExist:
+        return Post.objects.filter(author_id=user.pk).count()
+
+
+def change_post(post_id, field, delta):
+    _change(Post.objects.filter(id=post_id), field, delta)
+
+
+def _count(queryset, key):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{key: OuterRef('pk')}).order_by().values(
+                key
+            ).annotate(total=Count('pk')).values('total')
+        ),
+        Value(0),
+    )
+
+
+USER_COUNTERS = {
+    'posts_count': (Post.objects.all(), 'author'),
+    'followers_count': (Follow.objects.all(), 'author'),
+    'following_count': (Follow.objects.all(), 'user'),
+}
+
+POST_COUNTERS = {
+    'comments_count': (Comment.objects.all(), 'post'),
+}
+
+
+def _reconcile(queryset, counters):
+    fixed = {}
+    for field, (source, key) in counters.items():
+        actual = _count(source, key)
+        drifted = queryset.annotate(actual=actual).exclude(
+            **{field: F('actual')}
+        )
+        fixed[field] = queryset.filter(
+            pk__in=drifted.values('pk')
+        ).update(**{field: actual})
+    return fixed
+
+
+def reconcile(users=None, posts=None):
+    """Пересчитывает счётчики и возвращает число исправленных строк.
+
+    По умолчанию проверяются все пользователи и все посты; недостающие
+    строки UserStats создаются.
+    """
+    if users is None:
+        users = User.objects.all()
+    if posts is None:
+        posts = Post.objects.all()
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=user_id) for user_id in users.filter(
+            stats__isnull=True
+        ).values_list('id', flat=True).iterator()),
+        ignore_conflicts=True,
+    )
+    fixed = _reconcile(
+        UserStats.objects.filter(user__in=users.values('id')),
+        USER_COUNTERS,
+    )
+    fixed.update(_reconcile(posts, POST_COUNTERS))
+    return fixed
@@ -0,0 +1,244 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings as s
+from django.db import connections, transaction
+from django.db.models import Q
+
+from .models import FeedEntry, Follow, Post, PostQuerySet, UserStats
+from .utils import KeysetPaginator, MergedKeysetPaginator
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+class FeedEntryPaginator(KeysetPaginator):
+    """Листает записи ленты, но отдаёт сами посты."""
+
+    def __init__(self, entries, per_page):
+        super().__init__(
+            entries.select_related('post__author', 'post__group').only(
+                'pub_date',
+                'post',
+                *(f'post__{field}' for field in PostQuerySet.CARD_FIELDS),
+            ),
+            per_page,
+            keys=('pub_date', 'post_id'),
+        )
+
+    def position(self, post):
+        return post.pub_date, post.id
+
+    def fetch(self, position, reverse):
+        return [entry.post for entry in super().fetch(position, reverse)]
+
+
+def _bulk_insert(entries):
+    FeedEntry.objects.bulk_create(
+        entries,
+        batch_size=s.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def is_celebrity(author_id):
+    """Посты таких авторов не раскладываются по лентам, а читаются на лету."""
+    return UserStats.objects.filter(
+        user_id=author_id, celebrity=True
+    ).exists()
+
+
+def followed_celebrities(user):
+    return list(
+        Follow.objects.filter(
+            user=user, author__stats__celebrity=True
+        ).values_list('author_id', flat=True)
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам всех подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        FeedEntry(
+            user_id=user_id,
+            post_id=post.id,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers.iterator(chunk_size=s.FEED_BATCH_SIZE)
+    )
+
+
+def fan_out_many(posts):
+    """Раскладывает пачку постов одним запросом подписок на всех авторов."""
+    authors = {post.author_id for post in posts}
+    celebrities = set(UserStats.objects.filter(
+        user_id__in=authors, celebrity=True
+    ).values_list('user_id', flat=True))
+    followers = {}
+    for author_id, user_id in Follow.objects.filter(
+        author_id__in=authors - celebrities
+    ).values_list('author_id', 'user_id').iterator():
+        followers.setdefault(author_id, []).append(user_id)
+    _bulk_insert(
+        FeedEntry(
+            user_id=user_id,
+            post_id=post.id,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for post in posts
+        for user_id in followers.get(post.author_id, ())
+    )
+
+
+def backfill(user_id, author_id):
+    """Переносит в ленту подписчика уже опубликованные посты автора."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).order_by().values_list('id', 'pub_date')
+    _bulk_insert(
+        FeedEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts.iterator(chunk_size=s.FEED_BATCH_SIZE)
+    )
+
+
+def should_switch():
+    """Условие на UserStats: автору пора сменить режим ленты."""
+    return Q(
+        celebrity=False,
+        followers_count__gte=s.FEED_CELEBRITY_THRESHOLD,
+    ) | Q(
+        celebrity=True,
+        followers_count__lt=s.FEED_CELEBRITY_THRESHOLD
+        * s.FEED_CELEBRITY_RELEASE,
+    )
+
+
+def followers_changed(author_id):
+    """Ставит перестройку лент в очередь, если автор пересёк порог.
+
+    Сама перестройка — это все записи автора во всех лентах, поэтому в
+    запрос подписки она не входит: ``switch`` выполняется после коммита
+    в пуле потоков.
+    """
+    if UserStats.objects.filter(user_id=author_id).filter(
+        should_switch()
+    ).exists():
+        transaction.on_commit(lambda: submit(author_id))
+
+
+def switch(author_id):
+    """Переводит автора между раскладкой и чтением на лету.
+
+    Ставший популярным читается на лету, и его разложенные записи дали
+    бы дубли. Переставший — снова раскладывается: подписчики получают
+    все его посты, в том числе вышедшие, пока он был популярен. Записи
+    и флаг меняются в одной транзакции, так что лента не видит
+    промежуточного состояния.
+    """
+    with transaction.atomic():
+        stats = UserStats.objects.select_for_update().filter(
+            should_switch(), user_id=author_id
+        ).first()
+        if stats is None:
+            return False
+        if stats.celebrity:
+            followers = Follow.objects.filter(
+                author_id=author_id
+            ).values_list('user_id', flat=True)
+            posts = list(Post.objects.filter(
+                author_id=author_id
+            ).order_by().values_list('id', 'pub_date'))
+            _bulk_insert(
+                FeedEntry(
+                    user_id=user_id,
+                    post_id=post_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+                for user_id in followers.iterator(
+                    chunk_size=s.FEED_BATCH_SIZE
+                )
+                for post_id, pub_date in posts
+            )
+        else:
+            FeedEntry.objects.filter(author_id=author_id).delete()
+        UserStats.objects.filter(user_id=author_id).update(
+            celebrity=not stats.celebrity
+        )
+    return True
+
+
+def switch_all():
+    """Меняет режим всем, кому пора; возвращает число авторов."""
+    return sum(
+        switch(author_id) for author_id in UserStats.objects.filter(
+            should_switch()
+        ).values_list('user_id', flat=True)
+    )
+
+
+def _switch_in_thread(author_id):
+    try:
+        switch(author_id)
+    finally:
+        connections.close_all()
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.error(
+            'Не удалось перестроить ленты', exc_info=future.exception()
+        )
+
+
+def submit(author_id):
+    """Перестраивает ленты в пуле; при FEED_WORKERS = 0 — сразу."""
+    global _executor
+    if not s.FEED_WORKERS:
+        switch(author_id)
+        return None
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=s.FEED_WORKERS)
+    future = _executor.submit(_switch_in_thread, author_id)
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты посты автора, от которого пользователь отписался."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def feed_page(request, user):
+    """Лента подписок: разложенные записи плюс посты популярных авторов.
+
+    Посты обычных авторов уже лежат в FeedEntry, посты популярных
+    (UserStats.celebrity) выбираются при чтении и вливаются в страницу
+    слиянием по (pub_date, id).
+    """
+    per_page = s.OBJECTS_PER_PAGE
+    pushed = FeedEntryPaginator(FeedEntry.objects.filter(user=user), per_page)
+    celebrities = followed_celebrities(user)
+    if not celebrities:
+        return pushed.get_page(request.GET.get('cursor'))
+    pulled = KeysetPaginator(
+        Post.objects.for_cards().filter(author_id__in=celebrities),
+        per_page,
+    )
+    merged = MergedKeysetPaginator([pushed, pulled], per_page)
+    return merged.get_page(request.GET.get('cursor'))
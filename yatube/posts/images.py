@@ -0,0 +1,111 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings as s
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from . import thumbnails, variants
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def process(name):
+    """Готовит всё, что нужно шаблонам для картинки поста.
+
+    Выполняется в воркере: создаёт миниатюры и адаптивные варианты и
+    записывает описание вариантов в посты с этой картинкой.
+    """
+    from .models import Post
+
+    thumbnails.generate(name)
+    Post.objects.filter(image=name).update(
+        image_variants=variants.build(name)
+    )
+    return name
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=s.IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+    return _executor
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.error(
+            'Не удалось обработать картинку', exc_info=future.exception()
+        )
+
+
+def submit(names):
+    """Отправляет пачку картинок в пул; при IMAGE_WORKERS = 0 — сразу."""
+    if not s.IMAGE_WORKERS:
+        for name in names:
+            process(name)
+        return []
+    executor = get_executor()
+    futures = [executor.submit(process, name) for name in names]
+    for future in futures:
+        future.add_done_callback(_log_failure)
+    return futures
+
+
+def is_ready(post):
+    return bool(
+        post.image_variants
+        and all(thumbnails.lookup(post.image, preset)
+                for preset in s.THUMBNAIL_PRESETS)
+    )
+
+
+def schedule(post):
+    """Ставит обработку картинки в очередь после коммита транзакции."""
+    if not post.image or is_ready(post):
+        return
+    name = post.image.name
+    transaction.on_commit(lambda: submit([name]))
+
+
+def replace(post, previous_name, previous_variants):
+    """До сохранения поста: если картинка сменилась, варианты прежней
+    сбрасываются в том же save(), а их файлы удаляются после коммита."""
+    if (post.image.name or '') == previous_name:
+        return
+    post.image_variants = {}
+    if previous_name:
+        transaction.on_commit(
+            lambda: discard(previous_name, previous_variants)
+        )
+
+
+def discard(name, image_variants, storage=default_storage):
+    """Удаляет файлы вариантов картинки, если она больше ни у кого."""
+    from .models import Post
+
+    if Post.objects.filter(image=name).exists():
+        return
+    for items in image_variants.values():
+        for item in items:
+            storage.delete(item['name'])
+
+
+def shutdown():
+    """Дожидается обработки всех отправленных в пул картинок."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
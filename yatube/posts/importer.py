@@ -0,0 +1,377 @@
+"""Пакетный импорт постов и комментариев из NDJSON и CSV.
+
+Записи читаются потоком, авторы и группы разрешаются пачками через
+кэши, строки вставляются ``bulk_insert`` (или ``COPY`` в PostgreSQL)
+без сигналов на каждую строку. Всё, что обычно делают обработчики
+post_save, выполняется один раз на пачку получателями
+``signals.bulk_created``.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import counters
+from .export import parse_moment
+from .models import Comment, Group, Post
+from .signals import bulk_created
+
+User = get_user_model()
+
+
+class BulkImportError(ValueError):
+    pass
+
+
+def open_source(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_records(stream, fmt):
+    """Итератор словарей из потока NDJSON или CSV."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def guess_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'csv' if name.endswith('.csv') else 'ndjson'
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now_add, чтобы сохранить даты из источника."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+class LookupCache:
+    """Кэш «ключ → id», который дозапрашивает недостающие ключи пачкой."""
+
+    def __init__(self, queryset, key):
+        self.queryset = queryset
+        self.key = key
+        self.ids = {}
+
+    def load(self, keys):
+        missing = {key for key in keys if key and key not in self.ids}
+        if missing:
+            self.ids.update(
+                self.queryset.filter(**{f'{self.key}__in': missing})
+                .values_list(self.key, 'id')
+            )
+            for key in missing - self.ids.keys():
+                self.ids[key] = None
+
+    def get(self, key):
+        return self.ids.get(key)
+
+
+def allocate_ids(model, objs):
+    """Назначает id из последовательности до вставки: COPY не
+    возвращает id новых строк (только PostgreSQL)."""
+    pending = [obj for obj in objs if obj.pk is None]
+    if not pending:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+            'FROM generate_series(1, %s)',
+            [model._meta.db_table, model._meta.pk.column, len(pending)],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    for obj, pk in zip(pending, ids):
+        obj.pk = pk
+
+
+def bulk_insert(model, objs, batch_size=None):
+    """bulk_create, после которого у всех объектов есть id.
+
+    Django 3.2 получает id из пакетной вставки только там, где есть
+    INSERT ... RETURNING для нескольких строк (PostgreSQL). На остальных
+    базах строки вставляются по одной тем же запросом, что и в save(),
+    но без сигналов: id назначает сама база, поэтому параллельные
+    вставки не сталкиваются.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        model.objects.bulk_create(objs, batch_size=batch_size)
+        return
+    meta = model._meta
+    for obj in objs:
+        fields = [
+            field for field in meta.local_concrete_fields
+            if obj.pk is not None or field is not meta.auto_field
+        ]
+        rows = model._base_manager._insert(
+            [obj], fields=fields, returning_fields=meta.db_returning_fields,
+            using=connection.alias,
+        )
+        for value, field in zip(rows[0], meta.db_returning_fields):
+            setattr(obj, field.attname, value)
+        obj._state.adding = False
+        obj._state.db = connection.alias
+
+
+def copy_value(value):
+    """Поле CSV для COPY: NULL — пустое поле без кавычек, всё остальное,
+    включая пустую строку, в кавычках, иначе COPY прочтёт его как NULL."""
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def copy_insert(model, objs):
+    """Вставляет строки командой COPY FROM STDIN (только PostgreSQL)."""
+    fields = model._meta.concrete_fields
+    buffer = io.StringIO()
+    for obj in objs:
+        buffer.write(','.join(
+            copy_value(
+                field.get_db_prep_save(field.pre_save(obj, True), connection)
+            )
+            for field in fields
+        ) + '\n')
+    buffer.seek(0)
+    columns = ', '.join(
+        connection.ops.quote_name(field.column) for field in fields
+    )
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(
+            f'COPY {connection.ops.quote_name(model._meta.db_table)} '
+            f'({columns}) FROM STDIN WITH (FORMAT csv)',
+            buffer,
+        )
+
+
+class Importer:
+    def __init__(self, kind, batch_size=1000, create_authors=False,
+                 use_copy=False, explicit_ids=False):
+        if kind not in ('posts', 'comments'):
+            raise BulkImportError(f'Неизвестный тип импорта: {kind}')
+        if use_copy and connection.vendor != 'postgresql':
+            raise BulkImportError('COPY доступен только в PostgreSQL')
+        self.kind = kind
+        self.model = Post if kind == 'posts' else Comment
+        self.batch_size = batch_size
+        self.create_authors = create_authors
+        self.use_copy = use_copy
+        self.authors = LookupCache(User.objects.all(), 'username')
+        self.groups = LookupCache(Group.objects.all(), 'slug')
+        self.posts = LookupCache(Post.objects.all(), 'id')
+        self.imported = 0
+        self.skipped = 0
+        # Были ли id из источника; переживает продолжение с контрольной
+        # точки, чтобы finish() сдвинул последовательность и тогда.
+        self.explicit_ids = explicit_ids
+
+    def resolve(self, batch):
+        usernames = {record.get('author_username') for record in batch}
+        self.authors.load(usernames)
+        if self.create_authors:
+            missing = [
+                name for name in usernames
+                if name and self.authors.get(name) is None
+            ]
+            User.objects.bulk_create(
+                [User(username=name, password=make_password(None))
+                 for name in missing],
+                ignore_conflicts=True,
+            )
+            for name in missing:
+                del self.authors.ids[name]
+            self.authors.load(missing)
+            # bulk_create не шлёт post_save, и строки UserStats, без
+            # которой не обходится страница автора, нет: её создаёт
+            # reconcile вместе с верными счётчиками.
+            if missing:
+                counters.reconcile(
+                    users=User.objects.filter(username__in=missing),
+                    posts=Post.objects.none(),
+                )
+        if self.kind == 'posts':
+            self.groups.load(record.get('group_slug') for record in batch)
+        else:
+            self.posts.load(
+                int(record['post_id']) for record in batch
+                if str(record.get('post_id') or '').isdigit()
+            )
+
+    def build(self, record):
+        author_id = self.authors.get(record.get('author_username'))
+        if author_id is None or not record.get('text'):
+            return None
+        pk = record.get('id') or None
+        if pk is not None:
+            pk = int(pk)
+        if self.kind == 'posts':
+            group_slug = record.get('group_slug')
+            group_id = self.groups.get(group_slug) if group_slug else None
+            if group_slug and group_id is None:
+                return None
+            return Post(
+                pk=pk,
+                text=record['text'],
+                author_id=author_id,
+                group_id=group_id,
+                image=record.get('image') or '',
+                pub_date=self.moment(record.get('pub_date')),
+            )
+        post_id = str(record.get('post_id') or '')
+        if not post_id.isdigit() or self.posts.get(int(post_id)) is None:
+            return None
+        return Comment(
+            pk=pk,
+            text=record['text'],
+            author_id=author_id,
+            post_id=int(post_id),
+            created=self.moment(record.get('created')),
+        )
+
+    def without_collisions(self, objs):
+        """Отбрасывает записи, чей id из источника уже занят в базе или
+        повторяется в пачке: получатели bulk_created не должны видеть
+        строки, которые не вставлены."""
+        ids = {obj.pk for obj in objs if obj.pk is not None}
+        if not ids:
+            return objs
+        taken = set(
+            self.model.objects.filter(pk__in=ids)
+            .values_list('pk', flat=True)
+        )
+        kept = []
+        for obj in objs:
+            if obj.pk is not None:
+                if obj.pk in taken:
+                    self.skipped += 1
+                    continue
+                taken.add(obj.pk)
+            kept.append(obj)
+        return kept
+
+    def moment(self, value):
+        if not value:
+            return timezone.now()
+        return parse_moment(value)
+
+    def write(self, batch):
+        self.resolve(batch)
+        objs = []
+        for record in batch:
+            try:
+                obj = self.build(record)
+            except ValueError:
+                obj = None
+            if obj is None:
+                self.skipped += 1
+            else:
+                objs.append(obj)
+        objs = self.without_collisions(objs)
+        if not objs:
+            return
+        date_field = self.model._meta.get_field(
+            'pub_date' if self.kind == 'posts' else 'created'
+        )
+        explicit = [obj for obj in objs if obj.pk is not None]
+        generated = [obj for obj in objs if obj.pk is None]
+        with transaction.atomic(), explicit_dates(date_field):
+            # Сначала строки с id из источника и сдвиг последовательности,
+            # потом остальные: иначе выданный базой id столкнётся с уже
+            # вставленным — в этой пачке или в следующих.
+            if explicit:
+                self.insert(explicit)
+                self.reset_sequence()
+                self.explicit_ids = True
+            if generated:
+                self.insert(generated)
+            bulk_created.send(sender=self.model, objects=objs)
+        self.imported += len(objs)
+
+    def insert(self, objs):
+        if self.use_copy:
+            allocate_ids(self.model, objs)
+            copy_insert(self.model, objs)
+        else:
+            bulk_insert(self.model, objs, self.batch_size)
+
+    def finish(self):
+        """Сдвигает последовательность, если в импорте были id из
+        источника."""
+        if self.explicit_ids:
+            self.reset_sequence()
+
+    def reset_sequence(self):
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [self.model]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def run(self, records, skip=0, checkpoint=None, progress=None):
+        """Импортирует записи пачками, сохраняя число обработанных."""
+        started = time.monotonic()
+        done = 0
+        batch = []
+        for record in records:
+            done += 1
+            if done <= skip:
+                continue
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = []
+                self.checkpoint(checkpoint, done)
+                if progress:
+                    progress(self, done, time.monotonic() - started)
+        if batch:
+            self.write(batch)
+            self.checkpoint(checkpoint, done)
+        self.finish()
+        return time.monotonic() - started
+
+    def checkpoint(self, path, done):
+        if not path:
+            return
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as output:
+            json.dump({
+                'kind': self.kind,
+                'done': done,
+                'explicit_ids': self.explicit_ids,
+            }, output)
+        os.replace(temporary, path)
+
+
+def read_checkpoint(path, kind):
+    """Состояние из контрольной точки: ``done`` и ``explicit_ids``."""
+    if not path or not os.path.exists(path):
+        return {'done': 0, 'explicit_ids': False}
+    with open(path) as source:
+        state = json.load(source)
+    if state.get('kind') != kind:
+        raise BulkImportError(f'Контрольная точка относится к {state["kind"]}')
+    return {
+        'done': state['done'],
+        'explicit_ids': state.get('explicit_ids', False),
+    }
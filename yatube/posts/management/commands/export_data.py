@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает посты, комментарии или подписки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(export.EXPORTS))
+        parser.add_argument(
+            '--format', dest='fmt', default='ndjson',
+            choices=sorted(export.FORMATS),
+        )
+        parser.add_argument('--since', help='Начало периода, ISO 8601')
+        parser.add_argument('--until', help='Конец периода, ISO 8601')
+        parser.add_argument('--group', help='Слаг группы')
+        parser.add_argument('--author', help='Имя пользователя автора')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument(
+            '--output', '-o', help='Файл для записи, по умолчанию stdout'
+        )
+
+    def handle(self, *args, **options):
+        filters = {
+            name: options[name]
+            for name in ('since', 'until', 'group', 'author')
+            if options[name]
+        }
+        try:
+            blocks = export.stream(
+                options['kind'], options['fmt'], options['gzip'], **filters
+            )
+        except export.ExportError as error:
+            raise CommandError(error)
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for block in blocks:
+                    output.write(block)
+            return
+        output = getattr(self.stdout._out, 'buffer', None)
+        if output is None and options['gzip']:
+            raise CommandError('Для --gzip укажите --output')
+        for block in blocks:
+            if output is None:
+                self.stdout._out.write(block.decode())
+            else:
+                output.write(block)
+        (output or self.stdout).flush()
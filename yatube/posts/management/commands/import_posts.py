@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import images
+from posts.importer import (
+    BulkImportError, Importer, guess_format, open_source, read_checkpoint,
+    read_records,
+)
+
+
+class Command(BaseCommand):
+    help = 'Пакетно импортирует посты или комментарии из NDJSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON или CSV, можно .gz')
+        parser.add_argument(
+            '--kind', default='posts', choices=('posts', 'comments')
+        )
+        parser.add_argument(
+            '--format', dest='fmt', choices=('ndjson', 'csv'),
+            help='По умолчанию определяется по расширению',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--create-authors', action='store_true',
+            help='Создавать неизвестных авторов без пароля',
+        )
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='Вставлять командой COPY (только PostgreSQL)',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки; импорт продолжится с неё',
+        )
+
+    def progress(self, importer, done, elapsed):
+        if self.verbosity >= 2:
+            self.stdout.write(
+                f'обработано {done}, {importer.imported / elapsed:.0f} строк/с'
+            )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        try:
+            state = read_checkpoint(options['checkpoint'], options['kind'])
+            skip = state['done']
+            importer = Importer(
+                options['kind'],
+                batch_size=options['batch_size'],
+                create_authors=options['create_authors'],
+                use_copy=options['copy'],
+                explicit_ids=state['explicit_ids'],
+            )
+            fmt = options['fmt'] or guess_format(options['path'])
+            with open_source(options['path']) as source:
+                elapsed = importer.run(
+                    read_records(source, fmt),
+                    skip=skip,
+                    checkpoint=options['checkpoint'],
+                    progress=self.progress,
+                )
+        except (BulkImportError, OSError, ValueError) as error:
+            raise CommandError(error)
+        images.shutdown()
+        rate = importer.imported / elapsed if elapsed else 0
+        if skip:
+            self.stdout.write(f'Пропущено по контрольной точке: {skip}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано: {importer.imported}, '
+            f'отброшено: {importer.skipped}, '
+            f'за {elapsed:.2f} с ({rate:.0f} строк/с)'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import sync
+
+
+class Command(BaseCommand):
+    help = 'Удаляет надгробия, по которым уже нельзя синхронизироваться'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help='Срок хранения, по умолчанию SYNC_TOMBSTONE_DAYS',
+        )
+
+    def handle(self, *args, **options):
+        removed = sync.prune(options['days'])
+        self.stdout.write(f'Удалено надгробий: {removed}')
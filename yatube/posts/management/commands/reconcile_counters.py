@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок'
+
+    def handle(self, *args, **options):
+        fixed = reconcile()
+        for field, rows in fixed.items():
+            self.stdout.write(f'{field}: исправлено строк {rows}')
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены'))
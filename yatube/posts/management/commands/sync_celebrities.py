@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.feed import switch_all
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает ленты авторов, пересёкших порог популярности'
+
+    def handle(self, *args, **options):
+        switched = switch_all()
+        self.stdout.write(f'Авторов перестроено: {switched}')
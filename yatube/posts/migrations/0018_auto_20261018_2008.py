@@ -0,0 +1,81 @@
+# Generated by Django 3.2 on 2026-10-18 20:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count(model, key):
+    # Отдельный подзапрос на каждую связь, как counters._count: три
+    # Count в одном annotate перемножают посты и подписки пользователя.
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{key: OuterRef('pk')}).order_by().values(
+                key
+            ).annotate(total=Count('pk')).values('total')
+        ),
+        Value(0),
+    )
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserStats = apps.get_model('posts', 'UserStats')
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    Comment = apps.get_model('posts', 'Comment')
+    users = User.objects.annotate(
+        total_posts=count(Post, 'author'),
+        total_followers=count(Follow, 'author'),
+        total_following=count(Follow, 'user'),
+    ).values_list(
+        'id', 'total_posts', 'total_followers', 'total_following'
+    )
+    UserStats.objects.bulk_create(
+        (
+            UserStats(
+                user_id=user_id,
+                posts_count=posts_count,
+                followers_count=followers_count,
+                following_count=following_count,
+            )
+            for user_id, posts_count, followers_count, following_count
+            in users.iterator()
+        ),
+        batch_size=1000,
+    )
+    Post.objects.filter(
+        id__in=Comment.objects.values('post_id')
+    ).update(comments_count=count(Comment, 'post'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0017_auto_20261018_2005'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'Счётчики пользователя',
+                'verbose_name_plural': 'Счётчики пользователей',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
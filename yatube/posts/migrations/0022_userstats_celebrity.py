@@ -0,0 +1,27 @@
+# Generated by Django 3.2 on 2026-10-18 20:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_celebrities(apps, schema_editor):
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gte=settings.FEED_CELEBRITY_THRESHOLD
+    ).update(celebrity=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='celebrity',
+            field=models.BooleanField(default=False, verbose_name='Лента читается на лету'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,53 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, router, transaction
+from django.utils import timezone
 
 User = get_user_model()
 
 
+class AtomicSaveMixin:
+    """Сохраняет строку и обработчики post_save в одной транзакции."""
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписок',
+    )
+    celebrity = models.BooleanField(
+        default=False,
+        verbose_name='Лента читается на лету',
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
 class Group(models.Model):
     title = models.CharField(
         max_length=200,
@@ -21,7 +65,30 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    CARD_FIELDS = (
+        'id',
+        'text',
+        'pub_date',
+        'image',
+        'image_variants',
+        'author',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'group',
+        'group__slug',
+    )
+
+    def for_cards(self):
+        """Только то, что нужно карточке поста в лентах, одним запросом."""
+        return self.select_related('author', 'group').only(*self.CARD_FIELDS)
+
+    def for_api(self):
+        return self.select_related('author')
+
+
+class Post(AtomicSaveMixin, models.Model):
     text = models.TextField(
         help_text='Введите текст поста',
         verbose_name='Текст поста',
@@ -50,17 +117,51 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты картинки',
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Комментариев',
+    )
+    updated = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['updated', 'id'],
+                name='post_updated_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
-class Comment(models.Model):
+class Comment(AtomicSaveMixin, models.Model):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -79,14 +180,28 @@ class Comment(models.Model):
         auto_now_add=True,
         help_text='Дата публикации комментария',
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        help_text='Дата изменения комментария',
+    )
 
     class Meta:
         ordering = ('-created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-created'],
+                name='comment_post_created_idx',
+            ),
+            models.Index(
+                fields=['post', 'updated', 'id'],
+                name='comment_post_updated_idx',
+            ),
+        ]
 
 
-class Follow(models.Model):
+class Follow(AtomicSaveMixin, models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -105,3 +220,81 @@ class Follow(models.Model):
                 name='unique_follow'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date', '-post')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.constraints.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_user_author_idx',
+            ),
+        ]
+
+
+class Tombstone(models.Model):
+    """След удалённого поста или комментария для инкрементной синхронизации."""
+
+    POST = 'post'
+    COMMENT = 'comment'
+    KINDS = (
+        (POST, 'Пост'),
+        (COMMENT, 'Комментарий'),
+    )
+
+    kind = models.CharField(max_length=16, choices=KINDS)
+    object_id = models.PositiveIntegerField()
+    post_id = models.PositiveIntegerField(
+        help_text='Пост, к которому относился удалённый объект',
+    )
+    deleted = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Удалённый объект'
+        verbose_name_plural = 'Удалённые объекты'
+        indexes = [
+            models.Index(
+                fields=['kind', 'deleted', 'id'],
+                name='tombstone_kind_deleted_idx',
+            ),
+            models.Index(
+                fields=['kind', 'post_id', 'deleted', 'id'],
+                name='tombstone_post_deleted_idx',
+            ),
+        ]
@@ -0,0 +1,287 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from . import cache, counters, feed, images
+from .models import Comment, Follow, Group, Post, Tombstone, UserStats
+
+NAME_FIELDS = {'username', 'first_name', 'last_name'}
+
+# Отправляются пакетными операциями (импорт, batch API) вместо post_save
+# для каждой строки. objects — список сохранённых объектов с id,
+# fields у bulk_updated — имена изменённых полей.
+bulk_created = Signal()
+bulk_updated = Signal()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_post(instance.post_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    counters.change_user(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def schedule_image_processing(sender, instance, raw=False, **kwargs):
+    if not raw:
+        images.schedule(instance)
+
+
+@receiver(post_delete, sender=Post)
+def discard_image_variants(sender, instance, **kwargs):
+    if instance.image:
+        name, image_variants = instance.image.name, instance.image_variants
+        transaction.on_commit(lambda: images.discard(name, image_variants))
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_feed(sender, instance, **kwargs):
+    feed.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def bury_post(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        kind=Tombstone.POST, object_id=instance.pk, post_id=instance.pk
+    )
+
+
+@receiver(post_delete, sender=Comment)
+def bury_comment(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        kind=Tombstone.COMMENT,
+        object_id=instance.pk,
+        post_id=instance.post_id,
+    )
+
+
+def _post_scopes(post):
+    group_slug = post.group.slug if post.group_id else None
+    return ['posts', *cache.post_scopes(
+        post.id, post.author.username, group_slug
+    )]
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_post(sender, instance, raw=False, **kwargs):
+    """Области кеша и картинка поста до правки — одним запросом."""
+    if instance.pk is None or raw:
+        return
+    previous = Post.objects.filter(pk=instance.pk).values_list(
+        'author__username', 'group__slug', 'image', 'image_variants'
+    ).first()
+    if previous is not None:
+        username, slug, image, image_variants = previous
+        instance._previous_scopes = cache.post_scopes(
+            instance.pk, username, slug
+        )
+        images.replace(instance, image, image_variants)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        scopes = _post_scopes(instance)
+        scopes.extend(getattr(instance, '_previous_scopes', ()))
+        cache.bump(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache.bump(f'post:{instance.post_id}')
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, raw=False, **kwargs):
+    if instance.pk is not None and not raw:
+        instance._previous_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, raw=False, **kwargs):
+    """Название группы есть в карточках главной, а удаление обнуляет
+    group у постов одним UPDATE без сигналов Post, поэтому вместе с
+    группой устаревает и главная."""
+    if raw:
+        return
+    scopes = {'posts', 'groups', f'group:{instance.slug}'}
+    previous = getattr(instance, '_previous_slug', None)
+    if previous:
+        scopes.add(f'group:{previous}')
+    cache.bump(*scopes)
+
+
+@receiver(pre_delete, sender=Group)
+def touch_group_posts(sender, instance, **kwargs):
+    """SET_NULL обнулит group у постов без сигналов и без ``updated``:
+    отмечаем их заранее, чтобы дельта синхронизации их отдала."""
+    Post.objects.filter(group=instance).update(updated=timezone.now())
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache.bump(f'author:{instance.author.username}')
+
+
+def _names_changed(instance, update_fields, raw):
+    return not raw and instance.pk is not None and (
+        update_fields is None or NAME_FIELDS & set(update_fields)
+    )
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_username(sender, instance, update_fields=None, raw=False,
+                      **kwargs):
+    if _names_changed(instance, update_fields, raw):
+        instance._previous_username = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user(sender, instance, created=False, update_fields=None,
+                    raw=False, **kwargs):
+    """Имя автора выводится на страницах групп его постов и на
+    страницах постов, которые он комментировал."""
+    if not _names_changed(instance, update_fields, raw):
+        return
+    scopes = {'posts', 'users', f'author:{instance.username}'}
+    if created:
+        cache.bump(*scopes)
+        return
+    previous = getattr(instance, '_previous_username', None)
+    if previous:
+        scopes.add(f'author:{previous}')
+    scopes.update(
+        f'group:{slug}' for slug in Post.objects.filter(
+            author=instance, group__isnull=False
+        ).values_list('group__slug', flat=True).distinct()
+    )
+    scopes.update(
+        f'post:{post_id}' for post_id in Comment.objects.filter(
+            author=instance
+        ).values_list('post_id', flat=True).distinct()
+    )
+    cache.bump(*scopes)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def touch_renamed_author(sender, instance, created=False, update_fields=None,
+                         raw=False, **kwargs):
+    """Автор в API выводится по username: после переименования его
+    посты и комментарии должны снова попасть в дельту синхронизации."""
+    if created or not _names_changed(instance, update_fields, raw):
+        return
+    previous = getattr(instance, '_previous_username', None)
+    if previous is None or previous == instance.username:
+        return
+    now = timezone.now()
+    Post.objects.filter(author=instance).update(updated=now)
+    Comment.objects.filter(author=instance).update(updated=now)
+
+
+def _bump_posts(posts):
+    scopes = {'posts'}
+    for post in posts:
+        scopes.add(f'post:{post.id}')
+        scopes.update(getattr(post, '_previous_scopes', ()))
+    for username, slug in Post.objects.filter(
+        id__in=[post.id for post in posts]
+    ).values_list('author__username', 'group__slug').distinct():
+        scopes.add(f'author:{username}')
+        if slug:
+            scopes.add(f'group:{slug}')
+    cache.bump(*scopes)
+
+
+@receiver(bulk_created, sender=Post)
+def process_created_posts(sender, objects, **kwargs):
+    author_ids = {post.author_id for post in objects}
+    counters.reconcile(
+        users=get_user_model().objects.filter(id__in=author_ids),
+        posts=Post.objects.none(),
+    )
+    feed.fan_out_many(objects)
+    names = sorted({post.image.name for post in objects if post.image})
+    if names:
+        transaction.on_commit(lambda: images.submit(names))
+    _bump_posts(objects)
+
+
+@receiver(bulk_created, sender=Comment)
+def process_created_comments(sender, objects, **kwargs):
+    post_ids = {comment.post_id for comment in objects}
+    counters.reconcile(
+        users=get_user_model().objects.none(),
+        posts=Post.objects.filter(id__in=post_ids),
+    )
+    cache.bump(*(f'post:{post_id}' for post_id in post_ids))
+
+
+@receiver(bulk_updated, sender=Post)
+def invalidate_updated_posts(sender, objects, **kwargs):
+    _bump_posts(objects)
+
+
+@receiver(bulk_updated, sender=Comment)
+def invalidate_updated_comments(sender, objects, **kwargs):
+    cache.bump(*{f'post:{comment.post_id}' for comment in objects})
@@ -0,0 +1,126 @@
+"""Инкрементная синхронизация: что изменилось и что удалено после токена.
+
+Токен хранит две позиции «время, id»: последнюю отданную изменённую
+строку и последнее отданное надгробие. Обе выборки идут по индексам
+``(updated, id)`` и ``(deleted, id)``, поэтому цена опроса растёт с
+числом изменений, а не с размером таблицы.
+"""
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.conf import settings as s
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Tombstone
+
+Changes = namedtuple('Changes', 'changed deleted token has_more')
+
+
+class SyncError(ValueError):
+    pass
+
+
+class TokenExpired(SyncError):
+    pass
+
+
+def _position(position):
+    return None if position is None else [position[0].isoformat(), position[1]]
+
+
+def encode_token(changed, deleted):
+    payload = json.dumps(
+        [_position(changed), _position(deleted)], separators=(',', ':')
+    )
+    return urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Возвращает пару позиций (changed, deleted); changed может быть None."""
+    try:
+        padding = '=' * (-len(token) % 4)
+        changed, deleted = json.loads(
+            urlsafe_b64decode((token + padding).encode())
+        )
+        positions = [
+            None if position is None
+            else (datetime.fromisoformat(position[0]), int(position[1]))
+            for position in (changed, deleted)
+        ]
+    except (binascii.Error, TypeError, ValueError, IndexError):
+        raise SyncError('Неверный токен синхронизации')
+    if positions[1] is None:
+        raise SyncError('Неверный токен синхронизации')
+    return positions
+
+
+def seek(queryset, field, position):
+    if position is None:
+        return queryset
+    value, pk = position
+    return queryset.filter(
+        Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk})
+    )
+
+
+def horizon():
+    """Строки моложе этой отметки ещё не отдаются: транзакция, начатая
+    раньше, может закоммитить более раннее время изменения позже."""
+    return timezone.now() - timedelta(seconds=s.SYNC_SETTLE_SECONDS)
+
+
+def changes(queryset, tombstones, token=None, limit=100, field='updated'):
+    """Изменённые объекты и id удалённых после ``token``.
+
+    Без токена отдаётся всё содержимое ``queryset`` и ни одного
+    надгробия: клиенту, у которого ещё ничего нет, нечего удалять.
+    """
+    until = horizon()
+    if token:
+        changed, deleted = decode_token(token)
+        expiry = timezone.now() - timedelta(days=s.SYNC_TOMBSTONE_DAYS)
+        if deleted[0] < expiry:
+            raise TokenExpired(
+                'Токен устарел, нужна полная синхронизация'
+            )
+    else:
+        changed, deleted = None, (until, 0)
+    rows = list(
+        seek(queryset.filter(**{f'{field}__lte': until}), field, changed)
+        .order_by(field, 'id')[:limit + 1]
+    )
+    stones = list(
+        seek(tombstones.filter(deleted__lte=until), 'deleted', deleted)
+        .order_by('deleted', 'id')
+        .values_list('deleted', 'id', 'object_id')[:limit + 1]
+    )
+    has_more = len(rows) > limit or len(stones) > limit
+    exhausted = len(stones) <= limit
+    rows, stones = rows[:limit], stones[:limit]
+    if rows:
+        changed = (getattr(rows[-1], field), rows[-1].id)
+    if stones:
+        deleted = stones[-1][:2]
+    if exhausted:
+        # Надгробий до горизонта больше нет: двигаем позицию, чтобы токен
+        # не устарел у клиента, которому долго нечего удалять.
+        deleted = max(deleted, (until, 0))
+    return Changes(
+        rows,
+        [object_id for _, _, object_id in stones],
+        encode_token(changed, deleted),
+        has_more,
+    )
+
+
+def prune(days=None):
+    """Удаляет надгробия старше срока жизни токена."""
+    if days is None:
+        days = s.SYNC_TOMBSTONE_DAYS
+    return Tombstone.objects.filter(
+        deleted__lt=timezone.now() - timedelta(days=days)
+    ).delete()[0]
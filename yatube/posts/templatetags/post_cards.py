@@ -0,0 +1,67 @@
+from django import template
+from django.conf import settings as s
+from django.templatetags.static import static
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .. import images, thumbnails, variants
+from ..cache import Uncached, get_or_compute, make_key, post_scopes
+
+register = template.Library()
+
+
+def _mark_pending(context):
+    request = context.get('request')
+    if request is not None:
+        request.thumbnails_pending = True
+
+
+@register.simple_tag
+def thumbnail_placeholder():
+    return static(s.THUMBNAIL_PLACEHOLDER)
+
+
+@register.filter
+def variant_sources(image_variants):
+    """<source> для <picture> из описания вариантов Post.image_variants."""
+    return variants.sources(image_variants or {})
+
+
+@register.simple_tag(takes_context=True)
+def ready_thumbnail(context, post, preset):
+    """Готовая миниатюра или None, пока картинку обрабатывает воркер."""
+    if not post.image:
+        return None
+    if not images.is_ready(post):
+        _mark_pending(context)
+    return thumbnails.lookup(post.image, preset)
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post, show_author=True, show_group=True):
+    """Карточка поста, общая для главной, группы, профиля и подписок."""
+    group_slug = post.group.slug if post.group_id else None
+
+    def render():
+        thumb = thumbnails.lookup(post.image, 'card') if post.image else None
+        html = str(render_to_string(
+            'posts/includes/post_card.html',
+            {
+                'post': post,
+                'thumb': thumb,
+                'show_author': show_author,
+                'show_group': show_group,
+            },
+        ))
+        if post.image and not images.is_ready(post):
+            _mark_pending(context)
+            return Uncached(html)
+        return html
+
+    html = get_or_compute(
+        make_key('card', post.id, int(show_author), int(show_group)),
+        post_scopes(post.id, post.author.username, group_slug),
+        render,
+        s.CARD_CACHE_TIMEOUT,
+    )
+    return mark_safe(html)
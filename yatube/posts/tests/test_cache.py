@@ -0,0 +1,110 @@
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from ..cache import bump, get_or_compute
+
+
+class StampedeProtectionMixin:
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='value', delay=0):
+        def inner():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+        return inner
+
+    def test_fresh_value_is_not_recomputed(self):
+        get_or_compute('key', ['scope'], self.compute(), 60)
+        self.assertEqual(
+            get_or_compute('key', ['scope'], self.compute('new'), 60),
+            'value',
+        )
+        self.assertEqual(self.calls, 1)
+
+    def test_bump_triggers_recompute(self):
+        get_or_compute('key', ['scope'], self.compute(), 60)
+        bump('scope')
+        self.assertEqual(
+            get_or_compute('key', ['scope'], self.compute('new'), 60),
+            'new',
+        )
+        self.assertIsNone(cache.get('lock:key'))
+
+    def test_stale_value_is_served_while_locked(self):
+        get_or_compute('key', ['scope'], self.compute(), 60)
+        bump('scope')
+        cache.add('lock:key', True)
+        self.assertEqual(
+            get_or_compute('key', ['scope'], self.compute('new'), 60),
+            'value',
+        )
+        self.assertEqual(self.calls, 1)
+
+    def test_probabilistic_early_expiration(self):
+        get_or_compute('key', ['scope'], self.compute(delay=0.1), 1)
+        with mock.patch('posts.cache.random.random', return_value=0):
+            get_or_compute('key', ['scope'], self.compute('new'), 1)
+        self.assertEqual(self.calls, 1)
+        with mock.patch(
+            'posts.cache.random.random', return_value=1 - 1e-9
+        ):
+            self.assertEqual(
+                get_or_compute('key', ['scope'], self.compute('new'), 1),
+                'new',
+            )
+        self.assertEqual(self.calls, 2)
+
+    def test_cold_key_is_computed_once(self):
+        results = []
+
+        def worker():
+            results.append(get_or_compute(
+                'key', ['scope'], self.compute(delay=0.2), 60
+            ))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(self.calls, 1)
+
+    @override_settings(CACHE_LOCK_WAIT=0.1)
+    def test_cold_key_is_computed_when_lock_holder_is_gone(self):
+        cache.add('lock:key', True)
+        self.assertEqual(
+            get_or_compute('key', ['scope'], self.compute(), 60),
+            'value',
+        )
+
+
+class LocMemStampedeTest(StampedeProtectionMixin, SimpleTestCase):
+    pass
+
+
+class FileBasedStampedeTest(StampedeProtectionMixin, SimpleTestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.override = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.'
+                           'FileBasedCache',
+                'LOCATION': self.cache_dir,
+            }
+        })
+        self.override.enable()
+        super().setUp()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
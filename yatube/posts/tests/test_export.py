@@ -0,0 +1,141 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from yatube.asgi import application
+
+from .. import export
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {index}',
+                group=cls.group if index % 2 else None,
+            )
+            for index in range(5)
+        ]
+        Comment.objects.create(
+            author=cls.reader, post=cls.posts[1], text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def call(self, *args):
+        out = StringIO()
+        call_command('export_data', *args, stdout=out)
+        return out.getvalue()
+
+    def test_ndjson_posts(self):
+        lines = self.call('posts').splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(
+            [record['id'] for record in records],
+            [post.id for post in self.posts],
+        )
+        self.assertEqual(records[0]['text'], 'Пост 0')
+        self.assertEqual(records[0]['author_username'], 'author')
+
+    def test_csv_comments(self):
+        rows = list(csv.reader(StringIO(self.call(
+            'comments', '--format', 'csv'
+        ))))
+        self.assertEqual(rows[0], export.header('comments'))
+        self.assertEqual(rows[1][2], 'Комментарий')
+
+    def test_filters(self):
+        lines = self.call('posts', '--group', 'group').splitlines()
+        self.assertEqual(len(lines), 2)
+        tomorrow = (timezone.now() + timedelta(days=1)).date().isoformat()
+        self.assertEqual(self.call('posts', '--since', tomorrow), '')
+        lines = self.call('follows', '--author', 'author').splitlines()
+        self.assertEqual(json.loads(lines[0])['user_username'], 'reader')
+
+    def test_invalid_filters(self):
+        with self.assertRaises(CommandError):
+            self.call('follows', '--since', '2020-01-01')
+        with self.assertRaises(CommandError):
+            self.call('posts', '--until', 'вчера')
+
+    def test_gzip_output_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.ndjson.gz')
+            self.call('posts', '--gzip', '--output', path)
+            with gzip.open(path, 'rt', encoding='utf-8') as dump:
+                self.assertEqual(len(dump.read().splitlines()), 5)
+
+    def test_api_is_staff_only(self):
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        response = client.get('/api/v1/export/posts/')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_api_streams_export_under_asgi(self):
+        admin = User.objects.create_user(username='admin', is_staff=True)
+        token = Token.objects.create(user=admin)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'},
+            'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': '/api/v1/export/posts/', 'root_path': '',
+            'query_string': b'', 'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {token.key}'.encode()),
+            ],
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        async_to_sync(application)(scope, receive, send)
+        self.assertEqual(messages[0]['status'], HTTPStatus.OK)
+        body = b''.join(message.get('body', b'') for message in messages[1:])
+        self.assertEqual(
+            [json.loads(line)['id'] for line in body.decode().splitlines()],
+            [post.id for post in self.posts],
+        )
+
+    def test_api_streams_export(self):
+        admin = User.objects.create_user(username='admin', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.get(
+            '/api/v1/export/comments/', {'type': 'csv', 'gzip': '1'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertIn('Комментарий', body.decode())
+        response = client.get('/api/v1/export/follows/', {'group': 'x'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = client.get('/api/v1/export/users/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,188 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from search.utils import search_page
+from ..importer import Importer
+from ..models import Comment, FeedEntry, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(IMAGE_WORKERS=0)
+class ImportPostsTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(content)
+        return path
+
+    def ndjson(self, name, records):
+        return self.write(name, ''.join(
+            json.dumps(record, ensure_ascii=False) + '\n'
+            for record in records
+        ))
+
+    def call(self, *args):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_posts', *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_posts(self):
+        path = self.ndjson('posts.ndjson', [
+            {'text': 'Импортированный пост', 'author_username': 'author',
+             'group_slug': 'group', 'pub_date': '2015-03-01T10:00:00+00:00'},
+            {'text': 'Второй пост', 'author_username': 'author'},
+            {'text': 'Чужой пост', 'author_username': 'nobody'},
+            {'text': 'Пост без группы', 'author_username': 'author',
+             'group_slug': 'missing'},
+        ])
+        output = self.call(path, '--batch-size', '1')
+        self.assertIn('Импортировано: 2, отброшено: 2', output)
+        self.assertIn('строк/с', output)
+        post = Post.objects.get(text='Импортированный пост')
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.group, self.group)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 2)
+        self.assertEqual(FeedEntry.objects.filter(user=self.reader).count(), 2)
+        found = search_page('импортированный')
+        self.assertEqual([item.id for item in found], [post.id])
+
+    def test_create_authors(self):
+        path = self.ndjson('posts.ndjson', [
+            {'text': 'Пост', 'author_username': 'newcomer'},
+        ])
+        self.call(path, '--create-authors')
+        user = User.objects.get(username='newcomer')
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(user.stats.posts_count, 1)
+
+    def test_create_comment_authors(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        path = self.ndjson('comments.ndjson', [
+            {'post_id': post.id, 'text': 'Комментарий',
+             'author_username': 'newcomer'},
+        ])
+        self.call(path, '--kind', 'comments', '--create-authors')
+        user = User.objects.get(username='newcomer')
+        self.assertEqual(user.stats.posts_count, 0)
+
+    def test_import_comments_csv(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        path = self.write(
+            'comments.csv',
+            'post_id,text,created,author_username\n'
+            f'{post.id},Первый,2016-01-01,reader\n'
+            f'{post.id},Второй,,reader\n'
+            '999999,Сирота,,reader\n',
+        )
+        output = self.call(path, '--kind', 'comments')
+        self.assertIn('Импортировано: 2, отброшено: 1', output)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        comment = Comment.objects.get(text='Первый')
+        self.assertEqual(comment.created.year, 2016)
+
+    def test_checkpoint_resumes_import(self):
+        path = self.ndjson('posts.ndjson', [
+            {'text': f'Пост {index}', 'author_username': 'author'}
+            for index in range(5)
+        ])
+        checkpoint = os.path.join(self.directory.name, 'state.json')
+        with open(checkpoint, 'w') as state:
+            json.dump({'kind': 'posts', 'done': 3}, state)
+        output = self.call(path, '--checkpoint', checkpoint)
+        self.assertIn('Пропущено по контрольной точке: 3', output)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            ['Пост 3', 'Пост 4'],
+        )
+        with open(checkpoint) as state:
+            self.assertEqual(json.load(state)['done'], 5)
+
+    def test_checkpoint_remembers_explicit_ids(self):
+        path = self.ndjson('posts.ndjson', [
+            {'id': 1000 + index, 'text': f'Пост {index}',
+             'author_username': 'author'}
+            for index in range(2)
+        ])
+        checkpoint = os.path.join(self.directory.name, 'state.json')
+        with mock.patch.object(Importer, 'reset_sequence') as reset:
+            self.call(path, '--batch-size', '1', '--checkpoint', checkpoint)
+        # По разу после каждой пачки с id и в конце.
+        self.assertEqual(reset.call_count, 3)
+        with open(checkpoint) as state:
+            self.assertTrue(json.load(state)['explicit_ids'])
+        with mock.patch.object(Importer, 'reset_sequence') as reset:
+            self.call(path, '--checkpoint', checkpoint)
+        reset.assert_called_once_with()
+
+    def test_export_round_trip_keeps_ids(self):
+        post = Post.objects.create(author=self.author, text='Исходный')
+        out = StringIO()
+        call_command('export_data', 'posts', stdout=out)
+        path = self.write('posts.ndjson', out.getvalue())
+        post_id = post.id
+        post.delete()
+        self.call(path)
+        self.assertEqual(Post.objects.get(id=post_id).text, 'Исходный')
+
+    def test_existing_ids_are_skipped(self):
+        existing = Post.objects.create(author=self.author, text='Старый')
+        path = self.ndjson('posts.ndjson', [
+            {'id': pk, 'text': text, 'author_username': 'author'}
+            for pk, text in ((existing.id, 'Коллизия'),
+                             (existing.id + 1, 'Новый'),
+                             (existing.id + 1, 'Повтор'))
+        ])
+        output = self.call(path)
+        self.assertIn('Импортировано: 1, отброшено: 2', output)
+        existing.refresh_from_db()
+        self.assertEqual(existing.text, 'Старый')
+        self.assertEqual(Post.objects.get(id=existing.id + 1).text, 'Новый')
+        self.assertEqual(FeedEntry.objects.filter(user=self.reader).count(), 2)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 2)
+        self.assertEqual(list(search_page('коллизия')), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY — только PostgreSQL')
+    def test_copy_keeps_empty_strings(self):
+        path = self.ndjson('posts.ndjson', [
+            {'text': 'Пост без картинки', 'author_username': 'author'},
+            {'text': 'Пост "в кавычках",\nс переносом',
+             'author_username': 'author', 'group_slug': 'group'},
+        ])
+        output = self.call(path, '--copy')
+        self.assertIn('Импортировано: 2, отброшено: 0', output)
+        post = Post.objects.get(text='Пост без картинки')
+        self.assertEqual(post.image, '')
+        self.assertIsNone(post.group)
+        self.assertTrue(Post.objects.filter(
+            text='Пост "в кавычках",\nс переносом', group=self.group
+        ).exists())
+
+    def test_invalid_arguments(self):
+        path = self.ndjson('posts.ndjson', [])
+        with self.assertRaises(CommandError):
+            self.call(path, '--copy')
+        with self.assertRaises(CommandError):
+            self.call(os.path.join(self.directory.name, 'missing.ndjson'))
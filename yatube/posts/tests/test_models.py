@@ -1,7 +1,12 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -64,3 +69,66 @@ class PostModelTest(TestCase):
                     self.post._meta.get_field(value).verbose_name,
                     expected
                 )
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.follower = User.objects.create_user(username='follower')
+        self.post = Post.objects.create(author=self.author, text='text')
+
+    def assertStats(self, user, **expected):
+        user.stats.refresh_from_db()
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(user.stats, field), value)
+
+    def test_post_counter(self):
+        self.assertStats(self.author, posts_count=1)
+        Post.objects.create(author=self.author, text='second')
+        self.assertStats(self.author, posts_count=2)
+        self.post.delete()
+        self.assertStats(self.author, posts_count=1)
+
+    def test_comment_counter(self):
+        comment = Comment.objects.create(
+            post=self.post, author=self.follower, text='comment'
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_follow_counters(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertStats(self.author, followers_count=1, following_count=0)
+        self.assertStats(self.follower, followers_count=0, following_count=1)
+        Follow.objects.filter(user=self.follower).delete()
+        self.assertStats(self.author, followers_count=0)
+        self.assertStats(self.follower, following_count=0)
+
+    def test_reconcile_fixes_drift(self):
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        UserStats.objects.filter(user=self.follower).delete()
+        Comment.objects.bulk_create(
+            [Comment(post=self.post, author=self.follower, text='bulk')]
+        )
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertStats(self.author, posts_count=1)
+        self.assertStats(self.follower, posts_count=0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertIn('posts_count: исправлено строк 1', out.getvalue())
+
+    def test_pages_without_stats_row(self):
+        UserStats.objects.filter(user=self.author).delete()
+        cache.clear()
+        for url in (
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.context['count'], 1)
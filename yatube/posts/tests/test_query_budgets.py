@@ -0,0 +1,343 @@
+import importlib
+from itertools import count
+
+from django.contrib.auth.tokens import default_token_generator
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.test import APIClient
+
+from core.testing import QUERY_BUDGETS, QueryBudgetMixin, url_names
+from ..models import Comment, Follow, Group, Post
+from .test_views import PostFixtures, User
+
+PASSWORD = 'budget-password-1'
+
+
+def get(client, name, **kwargs):
+    return lambda page_size: client.get(reverse(name, kwargs=kwargs))
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']
+)
+class QueryBudgetTest(PostFixtures, QueryBudgetMixin, TestCase):
+    """Каждый адрес posts, users и api укладывается в свой бюджет
+    запросов, и бюджет не зависит от объёма данных."""
+
+    def setUp(self):
+        super().setUp()
+        self.user.email = 'test_user@example.com'
+        self.user.save()
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(self.user)
+        self.staff_client = APIClient()
+        self.staff_client.force_authenticate(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        self.comment = Comment.objects.create(
+            post=self.post, author=self.user, text='comment'
+        )
+        self.numbers = count()
+
+    def grow(self, start, stop):
+        for number in range(start, stop):
+            author = User.objects.create_user(username=f'budget_{number}')
+            Follow.objects.create(user=self.second_user, author=author)
+            Post.objects.create(
+                author=author, text=f'budget post {number}', group=self.group
+            )
+            Post.objects.create(
+                author=self.user, text=f'own post {number}', group=self.group
+            )
+            Comment.objects.create(
+                post=self.post, author=author, text=f'comment {number}'
+            )
+            Group.objects.create(
+                slug=f'budget-{number}', title='budget', description='budget'
+            )
+
+    def fresh_user(self, **kwargs):
+        return User.objects.create_user(
+            username=f'fresh_{next(self.numbers)}', password=PASSWORD,
+            **kwargs,
+        )
+
+    def fresh_post(self):
+        return (Post.objects.create(author=self.user, text='fresh'),)
+
+    def fresh_comment(self):
+        return (Comment.objects.create(
+            post=self.post, author=self.user, text='fresh'
+        ),)
+
+    def test_registry_covers_every_url(self):
+        for module in ('posts.urls', 'users.urls', 'api.urls'):
+            urls = importlib.import_module(module)
+            prefix = f'{urls.app_name}:' if hasattr(urls, 'app_name') else ''
+            for name in url_names(urls.urlpatterns, prefix):
+                with self.subTest(name=name):
+                    self.assertIn(name, QUERY_BUDGETS)
+
+    def test_posts_pages(self):
+        self.assertQueryBudget(
+            'posts:index', get(self.client, 'posts:index'), paged=True
+        )
+        self.assertQueryBudget(
+            'posts:group_list',
+            get(self.client, 'posts:group_list', slug=self.group.slug),
+            paged=True,
+        )
+        self.assertQueryBudget(
+            'posts:profile',
+            get(self.client, 'posts:profile', username=self.user.username),
+            paged=True,
+        )
+        self.assertQueryBudget(
+            'posts:post_detail',
+            get(self.client, 'posts:post_detail', post_id=self.post.id),
+        )
+        self.assertQueryBudget(
+            'posts:follow_index',
+            get(self.second_client, 'posts:follow_index'),
+            paged=True,
+        )
+        self.assertQueryBudget(
+            'posts:post_create',
+            get(self.authorized_client, 'posts:post_create'),
+        )
+        self.assertQueryBudget(
+            'posts:post_edit',
+            get(self.authorized_client, 'posts:post_edit',
+                post_id=self.post.id),
+        )
+
+    def test_posts_writes(self):
+        self.assertQueryBudget(
+            'posts:post_create',
+            lambda page_size: self.authorized_client.post(
+                reverse('posts:post_create'),
+                {'text': 'new post', 'group': self.group.id},
+            ),
+        )
+        self.assertQueryBudget(
+            'posts:post_edit',
+            lambda page_size: self.authorized_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+                {'text': 'edited post', 'group': self.group.id},
+            ),
+        )
+        self.assertQueryBudget(
+            'posts:add_comment',
+            lambda page_size: self.second_client.post(
+                reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+                {'text': 'new comment'},
+            ),
+        )
+        self.assertQueryBudget(
+            'posts:profile_follow',
+            lambda page_size, author: self.second_client.get(reverse(
+                'posts:profile_follow', kwargs={'username': author.username}
+            )),
+            setup=lambda: (self.fresh_user(),),
+        )
+
+        def followed():
+            author = self.fresh_user()
+            Follow.objects.create(user=self.second_user, author=author)
+            return (author,)
+
+        self.assertQueryBudget(
+            'posts:profile_unfollow',
+            lambda page_size, author: self.second_client.get(reverse(
+                'posts:profile_unfollow', kwargs={'username': author.username}
+            )),
+            setup=followed,
+        )
+
+    def test_users_pages(self):
+        for name in ('users:signup', 'users:login',
+                     'users:password_reset_form', 'users:password_reset_done',
+                     'users:password_reset_complete'):
+            self.assertQueryBudget(name, get(self.client, name))
+        for name in ('users:password_change_form',
+                     'users:password_change_done'):
+            self.assertQueryBudget(name, get(self.authorized_client, name))
+        self.assertQueryBudget(
+            'users:password_reset_confirm',
+            get(
+                self.client, 'users:password_reset_confirm',
+                uidb64=urlsafe_base64_encode(force_bytes(self.user.pk)),
+                token=default_token_generator.make_token(self.user),
+            ),
+        )
+
+    def test_users_writes(self):
+        self.assertQueryBudget(
+            'users:signup',
+            lambda page_size, number: self.client.post(
+                reverse('users:signup'),
+                {'username': f'signup_{number}', 'password1': PASSWORD,
+                 'password2': PASSWORD},
+            ),
+            setup=lambda: (next(self.numbers),),
+        )
+
+        def logged_in():
+            client = Client()
+            client.force_login(self.fresh_user())
+            return (client,)
+
+        self.assertQueryBudget(
+            'users:login',
+            lambda page_size, user: Client().post(
+                reverse('users:login'),
+                {'username': user.username, 'password': PASSWORD},
+            ),
+            setup=lambda: (self.fresh_user(),),
+        )
+        self.assertQueryBudget(
+            'users:logout',
+            lambda page_size, client: client.get(reverse('users:logout')),
+            setup=logged_in,
+        )
+        self.assertQueryBudget(
+            'users:password_reset_form',
+            lambda page_size: self.client.post(
+                reverse('users:password_reset_form'),
+                {'email': self.user.email},
+            ),
+        )
+
+    def test_api_reads(self):
+        def api_get(name, **kwargs):
+            return lambda page_size: self.api_client.get(
+                reverse(name, kwargs=kwargs),
+                {'limit': page_size} if page_size else {},
+            )
+
+        def export(page_size):
+            response = self.staff_client.get(
+                reverse('export', kwargs={'kind': 'posts'})
+            )
+            b''.join(response.streaming_content)
+            return response
+
+        self.assertQueryBudget('api-root', api_get('api-root'))
+        self.assertQueryBudget('export', export)
+        for name in ('posts-list', 'posts-sync', 'groups-list'):
+            self.assertQueryBudget(name, api_get(name), paged=True)
+        for name in ('comments-list', 'comments-sync'):
+            self.assertQueryBudget(
+                name, api_get(name, post_id=self.post.id), paged=True
+            )
+        self.assertQueryBudget(
+            'posts-detail', api_get('posts-detail', pk=self.post.id)
+        )
+        self.assertQueryBudget(
+            'comments-detail',
+            api_get(
+                'comments-detail', post_id=self.post.id, pk=self.comment.id
+            ),
+        )
+        self.assertQueryBudget(
+            'groups-detail', api_get('groups-detail', pk=self.group.id)
+        )
+        self.assertQueryBudget(
+            'search-list',
+            lambda page_size: self.api_client.get(
+                reverse('search-list'), {'q': 'post'}
+            ),
+        )
+
+    def test_api_writes(self):
+        client = self.api_client
+        comments = reverse('comments-list', kwargs={'post_id': self.post.id})
+        comments_batch = reverse(
+            'comments-batch', kwargs={'post_id': self.post.id}
+        )
+
+        def comment_detail(comment):
+            return reverse(
+                'comments-detail',
+                kwargs={'post_id': self.post.id, 'pk': comment.id},
+            )
+
+        self.assertQueryBudget(
+            'authtoken',
+            lambda page_size, user: APIClient().post(
+                reverse('authtoken'),
+                {'username': user.username, 'password': PASSWORD},
+            ),
+            setup=lambda: (self.fresh_user(),),
+        )
+        self.assertQueryBudget(
+            'posts-list',
+            lambda page_size: client.post(
+                reverse('posts-list'), {'text': 'api post'}
+            ),
+        )
+        self.assertQueryBudget(
+            'posts-detail',
+            lambda page_size, post: client.patch(
+                reverse('posts-detail', kwargs={'pk': post.id}),
+                {'text': 'patched'},
+            ),
+            setup=self.fresh_post,
+        )
+        self.assertQueryBudget(
+            'posts-detail',
+            lambda page_size, post: client.delete(
+                reverse('posts-detail', kwargs={'pk': post.id})
+            ),
+            setup=self.fresh_post,
+        )
+        self.assertQueryBudget(
+            'posts-batch',
+            lambda page_size: client.post(
+                reverse('posts-batch'), [{'text': 'batch'}] * 3,
+                format='json',
+            ),
+        )
+        self.assertQueryBudget(
+            'posts-batch',
+            lambda page_size, *posts: client.patch(
+                reverse('posts-batch'),
+                [{'id': post.id, 'text': 'batch'} for post in posts],
+                format='json',
+            ),
+            setup=lambda: sum((self.fresh_post() for _ in range(3)), ()),
+        )
+        self.assertQueryBudget(
+            'posts-batch',
+            lambda page_size, *posts: client.delete(
+                reverse('posts-batch'), [post.id for post in posts],
+                format='json',
+            ),
+            setup=lambda: sum((self.fresh_post() for _ in range(3)), ()),
+        )
+        self.assertQueryBudget(
+            'comments-list',
+            lambda page_size: client.post(comments, {'text': 'api comment'}),
+        )
+        self.assertQueryBudget(
+            'comments-detail',
+            lambda page_size, comment: client.patch(
+                comment_detail(comment), {'text': 'patched'}
+            ),
+            setup=self.fresh_comment,
+        )
+        self.assertQueryBudget(
+            'comments-detail',
+            lambda page_size, comment: client.delete(
+                comment_detail(comment)
+            ),
+            setup=self.fresh_comment,
+        )
+        self.assertQueryBudget(
+            'comments-batch',
+            lambda page_size: client.post(
+                comments_batch, [{'text': 'batch'}] * 3, format='json'
+            ),
+        )
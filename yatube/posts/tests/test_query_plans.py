@@ -0,0 +1,116 @@
+import re
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SQLITE_SCAN = re.compile(r'^SCAN (TABLE )?\w+(?! USING)( AS \w+)?$')
+SQLITE_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+class QueryPlanTest(TestCase):
+    """Каждый запрос горячих страниц должен идти по индексу.
+
+    Запросы страниц перехватываются и прогоняются через EXPLAIN; тест
+    падает, если план читает таблицу целиком и затем сортирует её.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='test_user')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            slug='test_group',
+            description='test group description',
+            title='test group title'
+        )
+        Follow.objects.create(user=self.reader, author=self.user)
+        for number in range(15):
+            self.post = Post.objects.create(
+                author=self.user,
+                text=f'test post text {number}',
+                group=self.group,
+            )
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='comment'
+        )
+        self.client.force_login(self.reader)
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(self.reader)
+
+    @contextmanager
+    def capture_selects(self):
+        queries = []
+
+        def wrapper(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(wrapper):
+            yield queries
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql, params)
+                plan = [row[0] for row in cursor.fetchall()]
+                cursor.execute('RESET enable_seqscan')
+                return plan
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def is_scan_and_sort(self, plan):
+        if connection.vendor == 'postgresql':
+            text = '\n'.join(plan)
+            return 'Seq Scan' in text and 'Sort Key' in text
+        scans = any(SQLITE_SCAN.match(line) for line in plan)
+        return scans and any(SQLITE_SORT in line for line in plan)
+
+    def assertIndexedPlans(self, url, client=None):
+        cache.clear()
+        with self.capture_selects() as queries:
+            response = (client or self.client).get(url)
+        self.assertLess(response.status_code, 400)
+        self.assertTrue(queries)
+        for sql, params in queries:
+            plan = self.explain(sql, params)
+            with self.subTest(url=url, sql=sql):
+                self.assertFalse(
+                    self.is_scan_and_sort(plan),
+                    'Полный просмотр с сортировкой:\n' + '\n'.join(plan),
+                )
+        return response
+
+    def test_html_views_use_indexes(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            response = self.assertIndexedPlans(url)
+            next_cursor = getattr(
+                response.context.get('page_obj'), 'next_cursor', None
+            )
+            if next_cursor:
+                self.assertIndexedPlans(url + f'?cursor={next_cursor}')
+
+    def test_api_views_use_indexes(self):
+        urls = [
+            reverse('posts-list'),
+            reverse('comments-list', kwargs={'post_id': self.post.id}),
+            reverse('groups-list'),
+        ]
+        for url in urls:
+            self.assertIndexedPlans(url, self.api_client)
@@ -1,19 +1,35 @@
-from math import ceil
+import os
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
 
 from django import forms
 from django.conf import settings as s
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import connection
+from asgiref.sync import async_to_sync
+from django.db.backends.signals import connection_created
+from django.test import (
+    AsyncClient, Client, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Group, Post, Follow
+from .. import images, thumbnails, variants
+from ..models import Comment, FeedEntry, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
 
-class PostViewTest(TestCase):
+class PostFixtures:
+    """Два автора, две группы, четыре поста (один с картинкой) и
+    подписка second_user на user."""
+
     def setUp(self):
         self.small_image = (
             b'\x47\x49\x46\x38\x39\x61\x01\x00'
@@ -71,6 +87,8 @@ class PostViewTest(TestCase):
         Follow.objects.create(user=self.second_user, author=self.user)
         cache.clear()
 
+
+class PostViewTest(PostFixtures, TestCase):
     def test_pages_uses_correct_template(self):
         templates_pages_names = {
             reverse('posts:index'): 'posts/index.html',
@@ -229,6 +247,27 @@ class PostViewTest(TestCase):
                     response_another_user.context['page_obj']
                 )
 
+    def test_follow_index_receives_new_posts(self):
+        new_post = Post.objects.create(
+            author=self.user,
+            text='new post for followers',
+        )
+        response = self.second_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+
+    def test_unfollow_removes_posts_from_feed(self):
+        self.second_client.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={
+                    'username': self.user.username,
+                }
+            )
+        )
+        response = self.second_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+        self.assertFalse(FeedEntry.objects.filter(user=self.second_user))
+
     def test_follow_link(self):
         Follow.objects.filter(author=self.second_user, user=self.user).delete()
         self.authorized_client.get(
@@ -264,6 +303,91 @@ class PostViewTest(TestCase):
         )
 
 
+@override_settings(FEED_CELEBRITY_THRESHOLD=2, FEED_WORKERS=0)
+class HybridFeedTest(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader')
+        self.client.force_login(self.reader)
+        self.fan = User.objects.create_user(username='fan')
+        self.author = User.objects.create_user(username='author')
+        self.celebrity = User.objects.create_user(username='celebrity')
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=self.reader, author=self.celebrity)
+            Follow.objects.create(user=self.fan, author=self.celebrity)
+        self.posts = []
+        for number in range(s.OBJECTS_PER_PAGE + 2):
+            self.posts.append(Post.objects.create(
+                author=(self.author, self.celebrity)[number % 2],
+                text=f'hybrid feed post {number}',
+            ))
+        self.posts.reverse()
+
+    def test_celebrity_posts_are_not_pushed(self):
+        self.assertFalse(
+            FeedEntry.objects.filter(author=self.celebrity).exists()
+        )
+        self.assertTrue(FeedEntry.objects.filter(author=self.author).exists())
+
+    def test_feed_merges_pushed_and_pulled_posts(self):
+        url = reverse('posts:follow_index')
+        first_page = self.client.get(url).context['page_obj']
+        self.assertEqual(
+            list(first_page),
+            self.posts[:s.OBJECTS_PER_PAGE]
+        )
+        second_page = self.client.get(
+            url + f'?cursor={first_page.next_cursor}'
+        ).context['page_obj']
+        self.assertEqual(
+            list(second_page),
+            self.posts[s.OBJECTS_PER_PAGE:]
+        )
+
+    def test_author_dropping_below_threshold_is_pushed(self):
+        # fan подписался, когда автор стал популярным, и все посты
+        # вышли после этого: в его ленте пока ничего нет.
+        self.assertFalse(FeedEntry.objects.filter(user=self.fan).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.filter(
+                user=self.reader, author=self.celebrity
+            ).delete()
+        self.assertEqual(
+            set(FeedEntry.objects.filter(user=self.fan)
+                .values_list('post_id', flat=True)),
+            set(Post.objects.filter(author=self.celebrity)
+                .values_list('id', flat=True)),
+        )
+
+    def test_author_reaching_threshold_is_pulled(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Follow.objects.create(user=self.fan, author=self.author)
+            # Ленты перестраиваются только после коммита.
+            self.assertTrue(
+                FeedEntry.objects.filter(author=self.author).exists()
+            )
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(FeedEntry.objects.filter(author=self.author).exists())
+        self.test_feed_merges_pushed_and_pulled_posts()
+
+    @override_settings(FEED_CELEBRITY_RELEASE=0.5)
+    def test_author_between_thresholds_keeps_mode(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Follow.objects.filter(
+                user=self.fan, author=self.celebrity
+            ).delete()
+            Follow.objects.create(user=self.fan, author=self.celebrity)
+        self.assertEqual(callbacks, [])
+        self.assertTrue(UserStats.objects.get(user=self.celebrity).celebrity)
+
+    def test_command_switches_missed_authors(self):
+        UserStats.objects.filter(user=self.author).update(followers_count=2)
+        out = StringIO()
+        call_command('sync_celebrities', stdout=out)
+        self.assertIn('Авторов перестроено: 1', out.getvalue())
+        self.assertFalse(FeedEntry.objects.filter(author=self.author).exists())
+
+
 class PaginatorViewsTest(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='test_user')
@@ -278,22 +402,29 @@ class PaginatorViewsTest(TestCase):
                 text='test post text(Да, фантазия у меня есть)',
                 group=self.group,
             )
-        self.last_page = ceil(Post.objects.count() / s.OBJECTS_PER_PAGE)
         self.objects_last_page = Post.objects.count() % s.OBJECTS_PER_PAGE
         cache.clear()
 
+    def get_next_page(self, url, response=None):
+        response = response or self.client.get(url)
+        return self.client.get(
+            url + f'?cursor={response.context["page_obj"].next_cursor}'
+        )
+
     def test_homepage_first_page_contains_ten_records(self):
         response = self.client.get(reverse('posts:index'))
         self.assertEqual(len(response.context['page_obj']), s.OBJECTS_PER_PAGE)
+        self.assertTrue(response.context['page_obj'].has_next())
+        self.assertFalse(response.context['page_obj'].has_previous())
 
     def test_homepage_last_page_contains_correct_records(self):
-        response = self.client.get(
-            reverse('posts:index') + f'?page={self.last_page}'
-        )
+        response = self.get_next_page(reverse('posts:index'))
         self.assertEqual(
             len(response.context['page_obj']),
             self.objects_last_page
         )
+        self.assertFalse(response.context['page_obj'].has_next())
+        self.assertTrue(response.context['page_obj'].has_previous())
 
     def test_group_page_first_page_contains_ten_records(self):
         response = self.client.get(
@@ -307,14 +438,471 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(len(response.context['page_obj']), s.OBJECTS_PER_PAGE)
 
     def test_group_page_second_page_contains_correct_count_of_records(self):
-        response = self.client.get(
+        response = self.get_next_page(
             reverse(
                 'posts:group_list', kwargs={
                     'slug': self.group.slug
                 }
-            ) + f'?page={self.last_page}'
+            )
         )
         self.assertEqual(
             len(response.context['page_obj']),
             self.objects_last_page
         )
+
+    def test_previous_cursor_returns_first_page(self):
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        first_page = list(response.context['page_obj'])
+        response = self.get_next_page(url, response)
+        response = self.client.get(
+            url + f'?cursor={response.context["page_obj"].previous_cursor}'
+        )
+        self.assertEqual(list(response.context['page_obj']), first_page)
+
+    def test_pages_do_not_overlap(self):
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        first_page = set(response.context['page_obj'])
+        second_page = set(
+            self.get_next_page(url, response).context['page_obj']
+        )
+        self.assertFalse(first_page & second_page)
+        self.assertEqual(
+            len(first_page | second_page),
+            Post.objects.count()
+        )
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.client.get(reverse('posts:index') + '?cursor=broken')
+        self.assertEqual(len(response.context['page_obj']), s.OBJECTS_PER_PAGE)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+class QueryCountTest(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            slug='query_group',
+            description='query group description',
+            title='query group title'
+        )
+        for number in range(12):
+            author = User.objects.create_user(
+                username=f'author_{number}',
+                first_name='Имя',
+                last_name=f'Фамилия {number}',
+            )
+            group = Group.objects.create(
+                slug=f'group_{number}',
+                description='group description',
+                title='group title',
+            )
+            post = Post.objects.create(
+                author=author,
+                text=f'post text {number}',
+                group=(self.group, group)[number % 2],
+            )
+            Follow.objects.create(user=self.reader, author=author)
+        self.author = author
+        self.post = post
+        for number in range(5):
+            commentator = User.objects.create_user(
+                username=f'commentator_{number}'
+            )
+            Comment.objects.create(
+                post=post,
+                author=commentator,
+                text=f'comment {number}',
+            )
+        self.client.force_login(self.reader)
+
+    def count_queries(self, url, per_page):
+        cache.clear()
+        with override_settings(OBJECTS_PER_PAGE=per_page):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+        return len(queries)
+
+    def test_list_pages_do_constant_number_of_queries(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse(
+                'posts:profile', kwargs={'username': self.author.username}
+            ),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.count_queries(url, 1),
+                    self.count_queries(url, 10),
+                )
+
+    def test_post_detail_does_not_query_per_comment(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        queries = self.count_queries(url, 10)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.reader, text='more')
+            for _ in range(10)
+        )
+        self.assertEqual(self.count_queries(url, 10), queries)
+
+
+class CacheInvalidationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test_user')
+        self.group = Group.objects.create(
+            slug='test_group',
+            description='test group description',
+            title='test group title'
+        )
+        self.post = Post.objects.create(
+            author=self.user,
+            text='cached post text',
+            group=self.group,
+        )
+        cache.clear()
+
+    def get_text(self, url):
+        return self.client.get(url).content.decode('utf-8')
+
+    def test_new_post_invalidates_pages(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        ]
+        for url in urls:
+            self.get_text(url)
+        Post.objects.create(
+            author=self.user,
+            text='fresh post text',
+            group=self.group,
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertIn('fresh post text', self.get_text(url))
+
+    def test_anonymous_page_is_served_from_cache(self):
+        url = reverse('posts:index')
+        self.get_text(url)
+        Post.objects.filter(id=self.post.id).update(text='silent update')
+        self.assertIn('cached post text', self.get_text(url))
+
+    def test_comment_invalidates_post_detail(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.get_text(url)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='new comment text'
+        )
+        self.assertIn('new comment text', self.get_text(url))
+
+    def test_author_rename_invalidates_cards(self):
+        url = reverse('posts:index')
+        self.get_text(url)
+        self.user.first_name = 'Новое'
+        self.user.last_name = 'Имя'
+        self.user.save()
+        self.assertIn('Новое Имя', self.get_text(url))
+
+    def test_post_edit_invalidates_previous_group(self):
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.assertIn('cached post text', self.get_text(url))
+        self.post.group = None
+        self.post.save()
+        self.assertNotIn('cached post text', self.get_text(url))
+
+    def test_group_change_invalidates_index_and_detail(self):
+        index = reverse('posts:index')
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.assertIn('/group/test_group/', self.get_text(index))
+        self.assertIn('test group title', self.get_text(detail))
+        self.group.title = 'renamed group title'
+        self.group.slug = 'moved_group'
+        self.group.save()
+        for url in (index, detail):
+            with self.subTest(url=url):
+                self.assertIn('/group/moved_group/', self.get_text(url))
+        self.assertIn('renamed group title', self.get_text(detail))
+
+    def test_group_delete_invalidates_index_and_detail(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ]
+        for url in urls:
+            self.assertIn('/group/test_group/', self.get_text(url))
+        self.group.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotIn('/group/test_group/', self.get_text(url))
+
+    def test_slug_change_invalidates_old_group_page(self):
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.assertIn('cached post text', self.get_text(url))
+        self.group.slug = 'moved_group'
+        self.group.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_username_change_invalidates_old_profile(self):
+        url = reverse('posts:profile', kwargs={'username': 'test_user'})
+        self.assertIn('cached post text', self.get_text(url))
+        self.user.username = 'renamed_user'
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(IMAGE_WORKERS=0)
+class ThumbnailPipelineTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.user = User.objects.create_user(username='test_user')
+        self.uploaded = SimpleUploadedFile(
+            name='small.gif',
+            content=(
+                b'\x47\x49\x46\x38\x39\x61\x01\x00'
+                b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+                b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+                b'\x00\x00\x01\x00\x01\x00\x00\x02'
+                b'\x02\x4c\x01\x00\x3b'
+            ),
+            content_type='image/gif'
+        )
+        cache.clear()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_pending_thumbnail_renders_placeholder(self):
+        post = Post.objects.create(
+            author=self.user, text='text', image=self.uploaded
+        )
+        with mock.patch('sorl.thumbnail.base.ThumbnailBackend.'
+                        '_create_thumbnail') as create:
+            response = self.client.get(reverse('posts:index'))
+            detail = self.client.get(
+                reverse('posts:post_detail', kwargs={'post_id': post.id})
+            )
+        create.assert_not_called()
+        for page in (response, detail):
+            self.assertContains(page, s.THUMBNAIL_PLACEHOLDER)
+
+    def test_thumbnail_is_generated_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                author=self.user, text='text', image=self.uploaded
+            )
+        self.assertIsNotNone(thumbnails.lookup(post.image, 'card'))
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, s.THUMBNAIL_PLACEHOLDER)
+        self.assertContains(response, '/media/cache/')
+
+    def test_responsive_variants_are_rendered(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                author=self.user, text='text', image=self.uploaded
+            )
+        post.refresh_from_db()
+        formats = variants.supported_formats()
+        self.assertEqual(list(post.image_variants), formats)
+        for items in post.image_variants.values():
+            self.assertEqual(
+                [item['width'] for item in items],
+                list(s.IMAGE_VARIANT_WIDTHS),
+            )
+        response = self.client.get(reverse('posts:index'))
+        for image_format in formats:
+            with self.subTest(image_format=image_format):
+                self.assertContains(
+                    response,
+                    f'type="{variants.MIME_TYPES[image_format]}"',
+                )
+        self.assertContains(response, '/media/variants/')
+
+    def variant_files(self, post):
+        return [
+            os.path.join(self.media_root, item['name'])
+            for items in post.image_variants.values() for item in items
+        ]
+
+    def test_replaced_image_drops_old_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                author=self.user, text='text', image=self.uploaded
+            )
+        post.refresh_from_db()
+        old_files = self.variant_files(post)
+        self.assertTrue(all(map(os.path.exists, old_files)))
+        self.uploaded.seek(0)
+        with mock.patch.object(images, 'submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                post.image = SimpleUploadedFile(
+                    'other.gif', self.uploaded.read(), 'image/gif'
+                )
+                post.save()
+        submit.assert_called_once_with([post.image.name])
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, {})
+        self.assertFalse(any(map(os.path.exists, old_files)))
+
+    def test_deleted_post_drops_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                author=self.user, text='text', image=self.uploaded
+            )
+        post.refresh_from_db()
+        files = self.variant_files(post)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertFalse(any(map(os.path.exists, files)))
+
+    def test_same_stem_images_keep_own_variants(self):
+        posts = []
+        for name in ('photo.gif', 'photo.png'):
+            self.uploaded.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                posts.append(Post.objects.create(
+                    author=self.user, text='text', image=SimpleUploadedFile(
+                        name, self.uploaded.read(), 'image/gif'
+                    ),
+                ))
+        for post in posts:
+            post.refresh_from_db()
+        first, second = map(self.variant_files, posts)
+        self.assertFalse(set(first) & set(second))
+        with self.captureOnCommitCallbacks(execute=True):
+            posts[0].delete()
+        self.assertTrue(all(map(os.path.exists, second)))
+
+
+class ConditionalRequestTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test_user')
+        self.post = Post.objects.create(author=self.user, text='text')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_unchanged_page_is_not_modified(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'test_user'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ]
+        for client in (self.client, self.authorized_client):
+            for url in urls:
+                with self.subTest(url=url):
+                    response = client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    response = client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                    self.assertEqual(response.status_code, 304)
+
+    def test_change_produces_new_validator(self):
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(author=self.user, text='new')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_validators_are_per_user(self):
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_login_gets_fresh_csrf_token(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.get(url)
+        etag = response['ETag']
+        client.logout()
+        client.force_login(self.user)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        token = response.context['csrf_token']
+        response = client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'comment', 'csrfmiddlewaretoken': token},
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_cache_control_policy(self):
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn(
+            f'max-age={s.CACHE_CONTROL_MAX_AGE["index"]}',
+            response['Cache-Control'],
+        )
+        self.assertTrue(response.has_header('Last-Modified'))
+        response = self.authorized_client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+
+class AsyncViewsTest(TransactionTestCase):
+    """Вне транзакции независимые запросы async-view идут в пул потоков."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.client = AsyncClient()
+        self.client.force_login(self.reader)
+
+    def get(self, url):
+        threads = set()
+
+        def record(sender, connection, **kwargs):
+            threads.add(threading.get_ident())
+
+        async def fetch():
+            return await self.client.get(url)
+
+        connection_created.connect(record)
+        try:
+            response = async_to_sync(fetch)()
+        finally:
+            connection_created.disconnect(record)
+        return response, threads
+
+    def test_read_views_run_queries_in_pool(self):
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('posts:follow_index'),
+        ):
+            with self.subTest(url=url):
+                response, threads = self.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Пост')
+                self.assertTrue(response.asgi_request._parallel_queries)
+                self.assertTrue(threads)
+                self.assertNotIn(threading.get_ident(), threads)
+
+    def test_missing_objects(self):
+        response, _ = self.get(reverse('posts:group_list', args=['nope']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_anonymous_page_cache(self):
+        self.client = AsyncClient()
+        first, _ = self.get(reverse('posts:index'))
+        self.assertIn('public', first['Cache-Control'])
+        second, threads = self.get(reverse('posts:index'))
+        self.assertEqual(threads, set())
+        self.assertEqual(second.content, first.content)
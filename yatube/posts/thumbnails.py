@@ -0,0 +1,38 @@
+from django.conf import settings as s
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+
+class ThumbnailLookup(ThumbnailBackend):
+    """Находит готовую миниатюру, никогда не создавая её."""
+
+    def get_ready(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+lookup_backend = ThumbnailLookup()
+
+
+def lookup(image, preset):
+    geometry, options = s.THUMBNAIL_PRESETS[preset]
+    return lookup_backend.get_ready(image, geometry, **options)
+
+
+def generate(name):
+    """Создаёт все миниатюры из THUMBNAIL_PRESETS для файла в хранилище."""
+    for geometry, options in s.THUMBNAIL_PRESETS.values():
+        get_thumbnail(name, geometry, **options)
+    return name
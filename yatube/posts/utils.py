@@ -1,9 +1,164 @@
+import binascii
+import heapq
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from operator import itemgetter
+
 from django.conf import settings as s
-from django.core.paginator import Paginator
+from django.db.models import Q
+
+
+def encode_cursor(position, reverse=False):
+    value, pk = position
+    payload = json.dumps(
+        [value.isoformat(), pk, int(reverse)],
+        separators=(',', ':'),
+    )
+    return urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Возвращает ((value, pk), reverse) или None для битого курсора."""
+    if not cursor:
+        return None
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        value, pk, reverse = json.loads(
+            urlsafe_b64decode((cursor + padding).encode())
+        )
+        return (datetime.fromisoformat(value), int(pk)), bool(reverse)
+    except (binascii.Error, TypeError, ValueError):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, object_list, cursor, has_next, has_previous,
+                 next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<KeysetPage {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __contains__(self, item):
+        return item in self.object_list
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+
+class KeysetPaginator:
+    """Постраничный вывод по ключу (поле даты, id) без COUNT и OFFSET.
+
+    Каждая страница выбирается одним запросом вида
+    ``WHERE (date, id) < (..) ORDER BY date DESC, id DESC LIMIT n + 1``,
+    поэтому стоимость не зависит от глубины листания.
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id')):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.keys = keys
+
+    def position(self, obj):
+        return tuple(getattr(obj, key) for key in self.keys)
+
+    def seek(self, queryset, position, reverse):
+        value, pk = position
+        value_key, pk_key = self.keys
+        lookup = 'gt' if reverse else 'lt'
+        return queryset.filter(
+            Q(**{f'{value_key}__{lookup}': value})
+            | Q(**{value_key: value, f'{pk_key}__{lookup}': pk})
+        )
+
+    def order(self, queryset, reverse):
+        prefix = '' if reverse else '-'
+        return queryset.order_by(*(prefix + key for key in self.keys))
+
+    def fetch(self, position, reverse):
+        queryset = self.object_list
+        if position is not None:
+            queryset = self.seek(queryset, position, reverse)
+        return list(self.order(queryset, reverse)[:self.per_page + 1])
+
+    def get_page(self, cursor):
+        decoded = decode_cursor(cursor)
+        if decoded is None:
+            cursor, position, reverse = None, None, False
+        else:
+            position, reverse = decoded
+        rows = self.fetch(position, reverse)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        if not rows:
+            return KeysetPage(rows, cursor, False, False, None, None)
+        next_cursor = previous_cursor = None
+        if has_next:
+            next_cursor = encode_cursor(self.position(rows[-1]))
+        if has_previous:
+            previous_cursor = encode_cursor(
+                self.position(rows[0]), reverse=True
+            )
+        return KeysetPage(
+            rows, cursor, has_next, has_previous, next_cursor, previous_cursor
+        )
+
+
+class MergedKeysetPaginator(KeysetPaginator):
+    """Склеивает несколько источников с общим ключом k-way слиянием."""
+
+    def __init__(self, paginators, per_page):
+        super().__init__(None, per_page)
+        self.paginators = paginators
+
+    def position(self, obj):
+        return self.paginators[0].position(obj)
+
+    def fetch(self, position, reverse):
+        runs = [
+            [(source.position(obj), obj)
+             for obj in source.fetch(position, reverse)]
+            for source in self.paginators
+        ]
+        rows, seen = [], set()
+        merged = heapq.merge(*runs, key=itemgetter(0), reverse=not reverse)
+        for key, obj in merged:
+            if key in seen:
+                continue
+            seen.add(key)
+            rows.append(obj)
+            if len(rows) > self.per_page:
+                break
+        return rows
 
 
-def paginator(request, post_list):
-    paginator_ = Paginator(post_list, s.OBJECTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator_.get_page(page_number)
+def paginator(request, post_list, keys=('pub_date', 'id')):
+    paginator_ = KeysetPaginator(post_list, s.OBJECTS_PER_PAGE, keys)
+    page_obj = paginator_.get_page(request.GET.get('cursor'))
     return page_obj
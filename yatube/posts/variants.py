@@ -0,0 +1,99 @@
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings as s
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+
+
+def supported_formats():
+    """Форматы из IMAGE_VARIANT_FORMATS, которые умеет кодировать Pillow.
+
+    WebP и AVIF зависят от того, с какими библиотеками собран Pillow,
+    JPEG остаётся запасным вариантом всегда.
+    """
+    Image.init()
+    formats = [
+        image_format for image_format in s.IMAGE_VARIANT_FORMATS
+        if image_format in Image.SAVE
+    ]
+    if 'JPEG' not in formats:
+        formats.append('JPEG')
+    return formats
+
+
+def variant_name(name, width, image_format):
+    """Имя варианта: хеш полного имени в хранилище различает
+    ``photo.jpg`` и ``photo.png`` или одноимённые файлы в разных
+    каталогах, чтобы посты не перезаписывали и не удаляли чужие
+    варианты."""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    digest = hashlib.md5(name.encode()).hexdigest()[:8]
+    return f'variants/{stem}_{digest}_{width}.{image_format.lower()}'
+
+
+def encode(image, width, image_format):
+    height = round(width * s.IMAGE_VARIANT_RATIO[1] / s.IMAGE_VARIANT_RATIO[0])
+    resized = ImageOps.fit(
+        image, (width, height), Image.LANCZOS, centering=(0.5, 0.5)
+    )
+    if resized.mode not in ('RGB', 'L'):
+        resized = resized.convert('RGB')
+    buffer = BytesIO()
+    resized.save(
+        buffer,
+        image_format,
+        quality=s.IMAGE_VARIANT_QUALITY[image_format],
+        optimize=image_format == 'JPEG',
+    )
+    return buffer.getvalue()
+
+
+def build(name, storage=default_storage):
+    """Создаёт все варианты картинки и возвращает их описание.
+
+    Исходник декодируется один раз, затем кодируется во все ширины
+    IMAGE_VARIANT_WIDTHS и поддерживаемые форматы::
+
+        {'WEBP': [{'width': 480, 'name': ..., 'bytes': ...}, ...], ...}
+    """
+    with storage.open(name) as source:
+        image = Image.open(source)
+        image.load()
+    variants = {}
+    for image_format in supported_formats():
+        for width in s.IMAGE_VARIANT_WIDTHS:
+            data = encode(image, width, image_format)
+            target = variant_name(name, width, image_format)
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(data))
+            variants.setdefault(image_format, []).append({
+                'width': width,
+                'name': target,
+                'bytes': len(data),
+            })
+    return variants
+
+
+def sources(variants, storage=default_storage):
+    """Элементы <source> для <picture>: сначала более компактные форматы."""
+    return [
+        {
+            'type': MIME_TYPES[image_format],
+            'srcset': ', '.join(
+                f'{storage.url(item["name"])} {item["width"]}w'
+                for item in variants[image_format]
+            ),
+        }
+        for image_format in MIME_TYPES
+        if variants.get(image_format)
+    ]
@@ -1,67 +1,107 @@
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
 
+from . import aio, counters
+from .cache import cached_page, post_scopes
+from .feed import feed_page
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Comment, Follow, Group, Post, User
 from .utils import paginator
 
 
-def index(request):
-    post_list = Post.objects.all()
-    page_obj = paginator(request, post_list)
+def post_page_scopes(post_id):
+    found = Post.objects.filter(id=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if found is None:
+        return []
+    return post_scopes(post_id, *found)
+
+
+@cached_page(lambda: ['posts'])
+async def index(request):
+    page_obj = await aio.offload(
+        request, paginator, request, Post.objects.for_cards()
+    )
     context = {
         'page_obj': page_obj,
     }
-    return render(request, 'posts/index.html', context)
+    return await aio.render(request, 'posts/index.html', context)
 
 
-def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = paginator(request, post_list)
+@cached_page(lambda slug: [f'group:{slug}'])
+async def group_posts(request, slug):
+    group, page_obj = await aio.gather(
+        request,
+        lambda: get_object_or_404(Group, slug=slug),
+        lambda: paginator(
+            request, Post.objects.for_cards().filter(group__slug=slug)
+        ),
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
     }
-    return render(request, 'posts/group_list.html', context)
+    return await aio.render(request, 'posts/group_list.html', context)
 
 
-def profile(request, username):
-    user = get_object_or_404(User, username=username)
-    post_list = user.posts.all()
-    count = post_list.count()
-    page_obj = paginator(request, post_list)
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
+@cached_page(lambda username: [f'author:{username}'])
+async def profile(request, username):
+    def following():
+        return request.user.is_authenticated and Follow.objects.filter(
             user=request.user,
-            author=user
+            author__username=username,
         ).exists()
-    else:
-        following = False
+
+    def author():
+        user = get_object_or_404(
+            User.objects.select_related('stats'), username=username
+        )
+        return user, counters.posts_count(user)
+
+    (user, count), following, page_obj = await aio.gather(
+        request,
+        author,
+        following,
+        lambda: paginator(
+            request,
+            Post.objects.for_cards().filter(author__username=username),
+        ),
+    )
     context = {
         'author': user,
         'count': count,
         'following': following,
         'page_obj': page_obj,
     }
-    return render(request, 'posts/profile.html', context)
+    return await aio.render(request, 'posts/profile.html', context)
 
 
-def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    title = post.text[:30]
-    author = post.author
-    count = author.posts.count()
-    comments = post.comments.all()
+@cached_page(post_page_scopes)
+async def post_detail(request, post_id):
+    def post_with_count():
+        post = get_object_or_404(
+            Post.objects.select_related('author__stats', 'group'),
+            id=post_id,
+        )
+        return post, counters.posts_count(post.author)
+
+    (post, count), comments = await aio.gather(
+        request,
+        post_with_count,
+        lambda: list(
+            Comment.objects.filter(post_id=post_id).select_related('author')
+        ),
+    )
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
-        'title': title,
+        'title': post.text[:30],
         'comments': comments,
         'count': count,
         'form': form,
     }
-    return render(request, 'posts/post_detail.html', context)
+    return await aio.render(request, 'posts/post_detail.html', context)
 
 
 @login_required
@@ -119,15 +159,13 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
-@login_required
-def follow_index(request):
-    user = request.user
-    post_list = Post.objects.filter(author__following__user=user)
-    page_obj = paginator(request, post_list)
+@aio.login_required
+async def follow_index(request):
+    page_obj = await aio.offload(request, feed_page, request, request.user)
     context = {
         'page_obj': page_obj,
     }
-    return render(request, 'posts/follow.html', context)
+    return await aio.render(request, 'posts/follow.html', context)
 
 
 @login_required
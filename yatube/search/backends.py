@@ -0,0 +1,156 @@
+"""Поисковые бэкенды: tsvector в PostgreSQL и инвертированный индекс."""
+import math
+import re
+from collections import Counter
+
+from django.conf import settings as s
+from django.contrib.postgres.search import (
+    SearchHeadline, SearchQuery, SearchRank, SearchVector,
+)
+from django.db import connection, transaction
+from django.db.models import (
+    Case, Count, F, FloatField, Sum, TextField, Value, When,
+)
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from posts.models import Post
+from .models import SearchDocument, SearchTerm
+from .text import WORD, stem, stems
+
+START_SEL = '\x02'
+STOP_SEL = '\x03'
+
+
+def render_headline(headline):
+    """Экранирует фрагмент и превращает маркеры совпадений в <mark>."""
+    html = escape(headline)
+    html = html.replace(START_SEL, '<mark>').replace(STOP_SEL, '</mark>')
+    return mark_safe(html)
+
+
+class PostgresBackend:
+    def index(self, post):
+        comments = ' '.join(post.comments.values_list('text', flat=True))
+        vector = (
+            SearchVector(
+                Value(post.text, output_field=TextField()),
+                weight='A', config=s.SEARCH_CONFIG,
+            )
+            + SearchVector(
+                Value(comments, output_field=TextField()),
+                weight='B', config=s.SEARCH_CONFIG,
+            )
+        )
+        SearchDocument.objects.update_or_create(
+            post_id=post.pk, defaults={'vector': vector}
+        )
+
+    def search(self, queryset, query):
+        search_query = SearchQuery(
+            query, config=s.SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(
+            search_document__vector=search_query
+        ).annotate(
+            rank=SearchRank(F('search_document__vector'), search_query),
+            headline=SearchHeadline(
+                'text', search_query, config=s.SEARCH_CONFIG,
+                start_sel=START_SEL, stop_sel=STOP_SEL,
+                max_words=s.SEARCH_HEADLINE_WORDS,
+            ),
+        ).order_by('-rank', '-id')
+
+    def add_headlines(self, posts, query):
+        for post in posts:
+            post.headline = render_headline(post.headline)
+
+
+class InvertedIndexBackend:
+    """Запасной поиск: термы хранятся в таблице, ранг — tf-idf."""
+
+    def terms(self, text):
+        """Основы слов, обрезанные по длине колонки до подсчёта весов:
+        иначе два длинных терма с общим началом дали бы одинаковые пары
+        (терм, пост)."""
+        max_length = SearchTerm._meta.get_field('term').max_length
+        return [term[:max_length] for term in stems(text)]
+
+    def index(self, post):
+        weights = Counter()
+        for term in self.terms(post.text):
+            weights[term] += 1.0
+        for text in post.comments.values_list('text', flat=True):
+            for term in self.terms(text):
+                weights[term] += s.SEARCH_COMMENT_WEIGHT
+        with transaction.atomic():
+            SearchTerm.objects.filter(post_id=post.pk).delete()
+            SearchTerm.objects.bulk_create(
+                SearchTerm(term=term, post_id=post.pk, weight=weight)
+                for term, weight in weights.items()
+            )
+
+    def idf(self, terms):
+        # Число документов — число постов: проиндексирован каждый, а
+        # подсчёт различных post_id в термах прошёл бы по всей таблице.
+        total = Post.objects.count()
+        frequencies = dict(
+            SearchTerm.objects.filter(term__in=terms)
+            .values_list('term')
+            .annotate(Count('post_id'))
+        )
+        return {
+            term: math.log(1 + total / frequencies[term])
+            for term in terms if term in frequencies
+        }
+
+    def search(self, queryset, query):
+        terms = set(self.terms(query))
+        idf = self.idf(terms)
+        if not terms or len(idf) < len(terms):
+            return queryset.none()
+        rank = Sum(Case(
+            *(When(search_terms__term=term,
+                   then=F('search_terms__weight') * weight)
+              for term, weight in idf.items()),
+            output_field=FloatField(),
+        ))
+        return queryset.filter(
+            search_terms__term__in=terms
+        ).annotate(
+            matched=Count('search_terms__term', distinct=True),
+            rank=rank,
+        ).filter(matched=len(terms)).order_by('-rank', '-id')
+
+    def headline(self, text, terms):
+        parts = re.split(f'({WORD.pattern})', text)
+        words = list(range(1, len(parts), 2))
+        hits = [index for index in words if stem(parts[index]) in terms]
+        for index in hits:
+            parts[index] = START_SEL + parts[index] + STOP_SEL
+        start = max(0, words.index(hits[0]) - 3) if hits else 0
+        window = words[start:start + s.SEARCH_HEADLINE_WORDS]
+        if not window:
+            return text
+        first, last = window[0], window[-1]
+        fragment = ''.join(parts[first:last + 1])
+        if first == words[0]:
+            fragment = parts[0] + fragment
+        else:
+            fragment = '… ' + fragment
+        if last == words[-1]:
+            fragment += parts[-1]
+        else:
+            fragment += ' …'
+        return fragment
+
+    def add_headlines(self, posts, query):
+        terms = set(stems(query))
+        for post in posts:
+            post.headline = render_headline(self.headline(post.text, terms))
+
+
+def get_backend():
+    if connection.vendor == 'postgresql':
+        return PostgresBackend()
+    return InvertedIndexBackend()
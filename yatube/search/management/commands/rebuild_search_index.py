@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from search.backends import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс постов и комментариев'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        posts = Post.objects.only('id', 'text').order_by('id')
+        indexed = 0
+        for post in posts.iterator():
+            backend.index(post)
+            indexed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {indexed}'
+        ))
@@ -0,0 +1,87 @@
+# Generated by Django 3.2 on 2026-10-18 20:18
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+from search.text import stems
+
+POSTGRES_INDEX = '''
+CREATE INDEX search_document_vector_idx
+    ON search_searchdocument USING gin (vector);
+INSERT INTO search_searchdocument (post_id, vector)
+SELECT post.id,
+       setweight(to_tsvector('russian', post.text), 'A')
+       || setweight(to_tsvector(
+              'russian', coalesce(string_agg(comment.text, ' '), '')
+          ), 'B')
+  FROM posts_post post
+  LEFT JOIN posts_comment comment ON comment.post_id = post.id
+ GROUP BY post.id;
+'''
+
+
+def build_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_INDEX)
+        return
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    SearchTerm = apps.get_model('search', 'SearchTerm')
+    comments = {}
+    for post_id, text in Comment.objects.values_list('post_id', 'text'):
+        comments.setdefault(post_id, []).append(text)
+    for post_id, text in Post.objects.values_list('id', 'text').iterator():
+        weights = {}
+        for term in stems(text):
+            term = term[:64]
+            weights[term] = weights.get(term, 0) + 1.0
+        for comment in comments.get(post_id, ()):
+            for term in stems(comment):
+                term = term[:64]
+                weights[term] = weights.get(term, 0) + 0.4
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term, post_id=post_id, weight=weight)
+            for term, weight in weights.items()
+        )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('posts', '0020_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='posts.post')),
+                ('vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+            ],
+            options={
+                'verbose_name': 'Поисковый документ',
+                'verbose_name_plural': 'Поисковые документы',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.FloatField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.post')),
+            ],
+            options={
+                'verbose_name': 'Поисковый терм',
+                'verbose_name_plural': 'Поисковые термы',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='search_term_post_unique'),
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
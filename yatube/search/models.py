@@ -0,0 +1,42 @@
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models
+
+from posts.models import Post
+
+
+class SearchDocument(models.Model):
+    """tsvector поста и его комментариев для PostgreSQL."""
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+    )
+    vector = SearchVectorField(null=True)
+
+    class Meta:
+        verbose_name = 'Поисковый документ'
+        verbose_name_plural = 'Поисковые документы'
+
+
+class SearchTerm(models.Model):
+    """Строка инвертированного индекса для баз без полнотекстового поиска."""
+
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+    )
+    weight = models.FloatField()
+
+    class Meta:
+        verbose_name = 'Поисковый терм'
+        verbose_name_plural = 'Поисковые термы'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('term', 'post'),
+                name='search_term_post_unique',
+            ),
+        ]
@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from posts.models import Comment, Post
+from posts.signals import bulk_created, bulk_updated
+from .utils import reindex_many, schedule_reindex
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        schedule_reindex(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    schedule_reindex(instance.post_id)
+
+
+@receiver(bulk_created, sender=Post)
+def index_created_posts(sender, objects, **kwargs):
+    post_ids = [post.id for post in objects]
+    transaction.on_commit(lambda: reindex_many(post_ids))
+
+
+@receiver(bulk_created, sender=Comment)
+def index_created_comments(sender, objects, **kwargs):
+    post_ids = {comment.post_id for comment in objects}
+    transaction.on_commit(lambda: reindex_many(post_ids))
+
+
+@receiver(bulk_updated, sender=Post)
+def index_updated_posts(sender, objects, fields, **kwargs):
+    if 'text' in fields:
+        index_created_posts(sender, objects)
+
+
+@receiver(bulk_updated, sender=Comment)
+def index_updated_comments(sender, objects, fields, **kwargs):
+    if 'text' in fields:
+        index_created_comments(sender, objects)
@@ -0,0 +1,139 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from posts.models import Comment, Post
+from .models import SearchTerm
+from .text import stem
+
+User = get_user_model()
+
+
+class StemmerTest(TestCase):
+    def test_word_forms_share_stem(self):
+        forms = {
+            'кошка': 'кошки',
+            'программы': 'программа',
+            'ёлки': 'елка',
+            'собаками': 'собака',
+        }
+        for first, second in forms.items():
+            with self.subTest(word=first):
+                self.assertEqual(stem(first), stem(second))
+
+    def test_latin_words_are_lowercased(self):
+        self.assertEqual(stem('Django'), 'django')
+
+
+@override_settings(OBJECTS_PER_PAGE=2)
+class SearchViewTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='search_user')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cats = Post.objects.create(
+                author=self.user, text='Рыжие кошки спят на солнце'
+            )
+            self.dogs = Post.objects.create(
+                author=self.user, text='Собаки гоняют кошку по двору'
+            )
+            self.other = Post.objects.create(
+                author=self.user, text='Про программирование'
+            )
+
+    def search(self, query, page=None):
+        params = {'q': query}
+        if page:
+            params['page'] = page
+        return self.client.get(reverse('search:search'), params)
+
+    def test_finds_word_forms(self):
+        response = self.search('кошка')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTemplateUsed(response, 'search/results.html')
+        found = {post.id for post in response.context['page_obj']}
+        self.assertEqual(found, {self.cats.id, self.dogs.id})
+
+    def test_all_terms_must_match(self):
+        response = self.search('рыжая кошка')
+        found = [post.id for post in response.context['page_obj']]
+        self.assertEqual(found, [self.cats.id])
+
+    def test_headline_is_escaped_and_highlighted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(
+                author=self.user, text='<script>зебра</script>'
+            )
+        response = self.search('зебра')
+        self.assertContains(response, '&lt;script&gt;<mark>зебра</mark>')
+        self.assertNotContains(response, '<script>зебра')
+
+    def test_post_text_ranks_above_comments(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(
+                author=self.user, post=self.other, text='кошки тоже'
+            )
+        response = self.search('программирование')
+        self.assertEqual(response.context['page_obj'][0].id, self.other.id)
+        response = self.search('кошки')
+        found = [post.id for post in response.context['page_obj']]
+        self.assertNotIn(self.other.id, found)
+        response = self.search('кошки', page=2)
+        found = [post.id for post in response.context['page_obj']]
+        self.assertEqual(found, [self.other.id])
+
+    def test_edit_reindexes_post(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.text = 'Теперь про кошку'
+            self.other.save()
+        self.assertFalse(
+            SearchTerm.objects.filter(
+                post=self.other, term=stem('программирование')
+            ).exists()
+        )
+        self.assertEqual(len(self.search('программирование').context[
+            'page_obj']), 0)
+        response = self.search('кошки')
+        found = [post.id for post in response.context['page_obj']]
+        self.assertIn(self.other.id, found)
+
+    def test_deleted_comment_is_removed_from_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            comment = Comment.objects.create(
+                author=self.user, post=self.cats, text='енот'
+            )
+        self.assertEqual(len(self.search('енот').context['page_obj']), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            comment.delete()
+        self.assertEqual(len(self.search('енот').context['page_obj']), 0)
+
+    def test_long_terms_with_common_prefix(self):
+        prefix = 'a' * 70
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                author=self.user, text=f'{prefix}x {prefix}y'
+            )
+        found = self.search(prefix + 'z').context['page_obj']
+        self.assertEqual([item.id for item in found], [post.id])
+        self.assertEqual(
+            SearchTerm.objects.get(post=post, term=prefix[:64]).weight, 2
+        )
+
+    def test_empty_query(self):
+        response = self.search('')
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_api_search(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/v1/search/', {'q': 'кошки'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.data['has_next'] is False)
+        results = response.data['results']
+        self.assertEqual(
+            {item['id'] for item in results}, {self.cats.id, self.dogs.id}
+        )
+        self.assertIn('<mark>', results[0]['headline'])
+        self.assertGreater(results[0]['rank'], 0)
@@ -0,0 +1,115 @@
+"""Токенизация и упрощённый стеммер Snowball для русского языка."""
+import re
+
+WORD = re.compile(r'\w+', re.UNICODE)
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ('ся', 'сь')
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+
+def _strip(word, endings, preceded_by=None):
+    for ending in sorted(endings, key=len, reverse=True):
+        if not word.endswith(ending):
+            continue
+        stem = word[:-len(ending)]
+        if preceded_by and not stem.endswith(preceded_by):
+            continue
+        return stem
+    return None
+
+
+def _strip_grouped(word, groups):
+    first, second = groups
+    return _strip(word, first, ('а', 'я')) or _strip(word, second)
+
+
+def _regions(word):
+    """Возвращает начало RV и R2 по правилам Snowball."""
+    rv = r1 = r2 = len(word)
+    for index, char in enumerate(word):
+        if char in VOWELS:
+            rv = index + 1
+            break
+    for index in range(1, len(word)):
+        if word[index - 1] in VOWELS and word[index] not in VOWELS:
+            r1 = index + 1
+            break
+    for index in range(r1 + 1, len(word)):
+        if word[index - 1] in VOWELS and word[index] not in VOWELS:
+            r2 = index + 1
+            break
+    return rv, r2
+
+
+def _step1(rv):
+    stem = _strip_grouped(rv, PERFECTIVE_GERUND)
+    if stem is not None:
+        return stem
+    rv = _strip(rv, REFLEXIVE) or rv
+    adjective = _strip(rv, ADJECTIVE)
+    if adjective is not None:
+        return _strip_grouped(adjective, PARTICIPLE) or adjective
+    stem = _strip_grouped(rv, VERB)
+    if stem is not None:
+        return stem
+    stem = _strip(rv, NOUN)
+    return rv if stem is None else stem
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not re.search('[а-я]', word):
+        return word
+    rv_start, r2_start = _regions(word)
+    prefix, rv = word[:rv_start], word[rv_start:]
+    rv = _step1(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    r2 = max(0, r2_start - rv_start)
+    if len(rv) > r2:
+        derivational = _strip(rv[r2:], DERIVATIONAL)
+        if derivational is not None:
+            rv = rv[:r2] + derivational
+    superlative = _strip(rv, SUPERLATIVE)
+    if superlative is not None:
+        rv = superlative
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    elif rv.endswith('ь'):
+        rv = rv[:-1]
+    return prefix + rv
+
+
+def tokenize(text):
+    return WORD.findall(text.lower())
+
+
+def stems(text):
+    return [stem(word) for word in tokenize(text)]
@@ -0,0 +1,76 @@
+from django.conf import settings as s
+from django.db import transaction
+
+from posts.models import Post
+from .backends import get_backend
+
+
+class SearchPage:
+    def __init__(self, object_list, number, has_next):
+        self.object_list = object_list
+        self.number = number
+        self.has_next_page = has_next
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+def normalize_query(query):
+    return ' '.join(query.split())[:s.SEARCH_MAX_QUERY_LENGTH]
+
+
+def search_page(query, number=1, per_page=None):
+    """Страница ранжированных результатов без подсчёта общего числа."""
+    per_page = per_page or s.OBJECTS_PER_PAGE
+    try:
+        number = max(1, int(number))
+    except (TypeError, ValueError):
+        number = 1
+    if not query:
+        return SearchPage([], 1, False)
+    backend = get_backend()
+    queryset = backend.search(Post.objects.for_cards(), query)
+    offset = (number - 1) * per_page
+    rows = list(queryset[offset:offset + per_page + 1])
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    backend.add_headlines(rows, query)
+    return SearchPage(rows, number, has_next)
+
+
+def reindex(post_id):
+    post = Post.objects.filter(pk=post_id).only('id', 'text').first()
+    if post is not None:
+        get_backend().index(post)
+
+
+def reindex_many(post_ids):
+    backend = get_backend()
+    for post in Post.objects.filter(pk__in=post_ids).only('id', 'text'):
+        backend.index(post)
+
+
+def schedule_reindex(post_id):
+    """Переиндексирует пост после фиксации текущей транзакции."""
+    transaction.on_commit(lambda: reindex(post_id))
@@ -0,0 +1,13 @@
+from django.shortcuts import render
+
+from .utils import normalize_query, search_page
+
+
+def search(request):
+    query = normalize_query(request.GET.get('q', ''))
+    page_obj = search_page(query, request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'search/results.html', context)
@@ -0,0 +1,11 @@
+import os
+
+from core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+django_application = get_asgi_application()
+
+from live.asgi import EventStreamApp  # noqa: E402
+
+application = EventStreamApp(django_application)
@@ -11,7 +11,8 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 SECRET_KEY = 'm9h15a-293i_=$$#oha)1^4yitugj94apbq623mb^%*7&6f4xg'
 
-DEBUG = True
+# В продакшене DEBUG=0: вместе с ним отключается и debug_toolbar.
+DEBUG = os.getenv('DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -32,13 +33,17 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'search.apps.SearchConfig',
+    'live.apps.LiveConfig',
     'sorl.thumbnail',
-    'debug_toolbar',
     'rest_framework',
+    'rest_framework.authtoken',
     'api',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,9 +51,12 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 
 
@@ -71,6 +79,11 @@ TEMPLATES = [
 
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+ASGI_APPLICATION = 'yatube.asgi.application'
+
+# Async-view раздают независимые запросы по потокам пула, каждый со
+# своим соединением с БД; False выполняет их по очереди.
+ASYNC_PARALLEL_QUERIES = True
 
 DATABASES = {
     'default': {
@@ -81,7 +94,48 @@ DATABASES = {
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT')
     }
-} 
+}
+
+# Соединения (core.connections). Без пула соединение потока живёт
+# DB_CONN_MAX_AGE секунд между запросами. С DB_POOL=1 соединения
+# возвращаются в пул процесса после каждого запроса, поэтому
+# CONN_MAX_AGE = 0; пул открывает не больше DB_POOL_SIZE соединений на
+# базу и ждёт свободного не дольше DB_POOL_TIMEOUT секунд. Соединение,
+# простоявшее дольше DB_HEALTH_CHECK_IDLE секунд, проверяется перед
+# использованием.
+DB_POOL = os.getenv('DB_POOL', '') == '1'
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '20'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+DB_HEALTH_CHECK_IDLE = 30
+DATABASES['default']['CONN_MAX_AGE'] = (
+    0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', '60'))
+)
+if DB_POOL:
+    DATABASES['default']['ENGINE'] = 'core.backends.' + (
+        DATABASES['default']['ENGINE'].rsplit('.', 1)[-1]
+    )
+
+# Реплики для чтения (core.replicas): DB_REPLICAS — хосты PostgreSQL
+# через запятую, для SQLite — пути к файлам. В тестах реплики зеркалят
+# default. Реплика, отставшая больше REPLICA_MAX_LAG секунд, не
+# используется; клиент, который что-то записал, REPLICA_PIN_SECONDS
+# читает только из default.
+DATABASE_REPLICAS = []
+for number, location in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(','))):
+    alias = f'replica{number}'
+    key = 'NAME' if 'sqlite' in DATABASES['default']['ENGINE'] else 'HOST'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        key: location,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+REPLICA_MAX_LAG = 5
+REPLICA_LAG_CHECK_INTERVAL = 5
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = 'primary_pin'
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -114,7 +168,14 @@ REST_FRAMEWORK = {
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
-    ]
+    ],
+
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.ApiCursorPagination',
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.fast.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 
@@ -140,3 +201,110 @@ DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Метрики запросов (core.metrics), по умолчанию выключены. Счётчик
+# ответов ведётся всегда, а число и время SQL и полная задержка
+# замеряются для доли METRICS_SAMPLE_RATE запросов и пишутся в лог
+# yatube.metrics. Время шаблонов требует подмены Template.render и
+# включается отдельно, METRICS_TEMPLATES. /metrics/ отдаётся персоналу
+# и сборщику с заголовком «Authorization: Bearer <METRICS_TOKEN>»; по
+# адресу не проверяется — за nginx все запросы приходят с 127.0.0.1.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '') == '1'
+METRICS_TEMPLATES = os.getenv('METRICS_TEMPLATES', '') == '1'
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', '0.1'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+FEED_BATCH_SIZE = 1000
+# Автор, набравший FEED_CELEBRITY_THRESHOLD подписчиков, читается в
+# лентах на лету, а вернётся в раскладку, только опустившись ниже доли
+# FEED_CELEBRITY_RELEASE от порога: без зазора подписка и отписка на
+# границе каждый раз перестраивали бы ленты. Перестройка идёт после
+# коммита в FEED_WORKERS потоках (0 — сразу); пропущенное доделывает
+# команда sync_celebrities.
+FEED_CELEBRITY_THRESHOLD = 10000
+FEED_CELEBRITY_RELEASE = 0.9
+FEED_WORKERS = 1
+
+# Кеш. Версии областей posts.cache, кеш страниц и блокировка от давки
+# рассчитаны на один кеш для всех воркеров: CACHE_BACKEND и
+# CACHE_LOCATION задают общий, например memcached. В LocMemCache у
+# каждого процесса свой кеш и bump() одного воркера не виден другим,
+# поэтому страницы и карточки тогда живут не дольше LOCAL_CACHE_TIMEOUT
+# секунд; больший срок с ним не пропустит проверка core.E001.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+SHARED_CACHE = not CACHES['default']['BACKEND'].endswith('.LocMemCache')
+LOCAL_CACHE_TIMEOUT = 20
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6 if SHARED_CACHE else LOCAL_CACHE_TIMEOUT
+CARD_CACHE_TIMEOUT = 60 * 60 * 24 if SHARED_CACHE else LOCAL_CACHE_TIMEOUT
+CACHE_STALE_TIMEOUT = 60 * 10
+CACHE_EARLY_EXPIRATION_BETA = 1.0
+CACHE_LOCK_TIMEOUT = 30
+CACHE_LOCK_WAIT = 2
+CACHE_LOCK_POLL = 0.05
+
+THUMBNAIL_PRESETS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+THUMBNAIL_PLACEHOLDER = 'img/placeholder.svg'
+
+IMAGE_WORKERS = 2
+IMAGE_VARIANT_WIDTHS = (480, 960, 1440)
+IMAGE_VARIANT_RATIO = (960, 339)
+IMAGE_VARIANT_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+IMAGE_VARIANT_QUALITY = {
+    'AVIF': 60,
+    'WEBP': 75,
+    'JPEG': 82,
+}
+
+SEARCH_CONFIG = 'russian'
+SEARCH_COMMENT_WEIGHT = 0.4
+SEARCH_HEADLINE_WORDS = 35
+SEARCH_MAX_QUERY_LENGTH = 200
+
+EXPORT_CHUNK_SIZE = 2000
+
+API_BATCH_MAX_SIZE = 500
+
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+API_FAST_SERIALIZATION = True
+
+# Изменения моложе SYNC_SETTLE_SECONDS в дельту ещё не попадают, чтобы
+# не пропустить поздно закоммиченные транзакции: время изменения
+# ставится при записи, а видна строка после коммита. Значение должно
+# быть больше самой долгой пишущей транзакции — пачки импорта, пакетных
+# запросов API, перестройки лент; минута с запасом покрывает их ценой
+# такой же задержки дельты. Токен старше SYNC_TOMBSTONE_DAYS не
+# принимается: надгробия к тому времени удалены.
+SYNC_SETTLE_SECONDS = 60
+SYNC_TOMBSTONE_DAYS = 30
+
+# Потоки /events/ обслуживает только yatube.asgi, поэтому страницы
+# подключаются к ним, лишь когда LIVE_EVENTS включён. LocalBroker
+# работает внутри одного процесса; для нескольких процессов нужен
+# live.broker.RedisBroker.
+LIVE_EVENTS = os.getenv('LIVE_EVENTS', '') == '1'
+LIVE_BROKER = os.getenv('LIVE_BROKER', 'live.broker.LocalBroker')
+LIVE_REDIS_URL = os.getenv('LIVE_REDIS_URL', 'redis://localhost:6379/0')
+LIVE_REDIS_CHANNEL = 'yatube:events'
+LIVE_QUEUE_SIZE = 100
+LIVE_HEARTBEAT = 15
+LIVE_RETRY_MS = 3000
+LIVE_MAX_CONNECTIONS = 10000
+
+# Сколько секунд анонимный ответ можно отдавать из браузерного кеша и
+# прокси без перепроверки; остальные ответы перепроверяются по ETag.
+CACHE_CONTROL_MAX_AGE = {
+    'index': 30,
+    'group_posts': 60,
+    'profile': 60,
+    'post_detail': 60,
+}